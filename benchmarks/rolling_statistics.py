@@ -0,0 +1,92 @@
+# Copyright (c) 2017, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Benchmark of RollingStatistics against per-window numpy statistics on six hours of RR interval like data.
+Not part of the unit tests, run from the repository root:
+
+    PYTHONPATH=. python benchmarks/rolling_statistics.py
+"""
+
+import datetime
+import time
+
+import numpy as np
+import pytz
+
+from cerebralcortex.data_processor.signalprocessing.rolling import RollingStatistics
+from cerebralcortex.data_processor.signalprocessing.window import WindowPlan
+from cerebralcortex.kernel.datatypes.datapoint import DataPoint
+
+
+def rr_data():
+    """
+    One RR interval like sample per second for six hours, with a ten minute gap
+    """
+    tz = pytz.timezone('US/Central')
+    random = np.random.RandomState(7)
+    start = datetime.datetime.fromtimestamp(1484929600.25, tz=tz)
+    seconds = np.concatenate((np.arange(0, 10000), np.arange(10600, 21600)))
+    values = 0.8 + 0.1 * random.randn(len(seconds))
+    return [DataPoint.from_tuple(start + datetime.timedelta(seconds=int(s)), v) for s, v in zip(seconds, values)]
+
+
+def per_window(data, firsts, ends):
+    result = []
+    for first, end in zip(firsts, ends):
+        window = np.array([dp.sample for dp in data[first:end]])
+        if len(window) == 0:
+            continue
+        result.append([np.mean(window), np.var(window), np.median(window),
+                       0.5 * (np.percentile(window, 75) - np.percentile(window, 25)),
+                       np.percentile(window, 80), np.percentile(window, 20)])
+    return np.array(result)
+
+
+def main():
+    data = rr_data()
+    for window_size, window_offset in [(60.0, 60.0), (60.0, 30.0), (120.0, 5.0)]:
+        plan = WindowPlan.from_data([data], window_size, window_offset)
+        firsts, ends = plan.bucket(data)
+
+        start = time.time()
+        expected = per_window(data, firsts, ends)
+        per_window_time = time.time() - start
+
+        start = time.time()
+        samples = np.array([dp.sample for dp in data])
+        stats = RollingStatistics(samples, firsts, ends, quantiles=(20, 80))
+        rolling_time = time.time() - start
+
+        nonempty = stats.count > 0
+        exact = np.array_equal(stats.median[nonempty], expected[:, 2]) and \
+            np.allclose(stats.mean[nonempty], expected[:, 0], rtol=0, atol=1e-12)
+
+        print('window %5.0fs offset %4.0fs: %5d windows, per window %.3fs, rolling %.3fs (%.1fx), matches %s' %
+              (window_size, window_offset, len(expected), per_window_time, rolling_time,
+               per_window_time / rolling_time, exact))
+
+
+if __name__ == '__main__':
+    main()
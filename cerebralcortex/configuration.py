@@ -22,8 +22,25 @@
 # OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
+from datetime import tzinfo
+
+import pytz
 import yaml
 
+# Timezone of studies whose configuration does not name one
+DEFAULT_TIME_ZONE = 'US/Central'
+
+
+def study_time_zone(config: dict = None) -> tzinfo:
+    """
+    Timezone used to present the timestamps of a study, configured as study: time_zone: <tz database name>.
+    Timestamps are stored and aligned as epoch microseconds, the timezone only applies to datetimes built from them.
+    :param config: loaded configuration, e.g. Configuration(filepath).config
+    :return: pytz timezone
+    """
+    study = (config or {}).get('study') or {}
+    return pytz.timezone(study.get('time_zone') or DEFAULT_TIME_ZONE)
+
 
 class Configuration:
     def __init__(self, filepath: str = None):
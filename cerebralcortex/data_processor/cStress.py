@@ -38,6 +38,13 @@ def fix_two_joins(nested_data):
     return key, base_value + new_value
 
 
+def stream_key(ds: dict):
+    """
+    Join key of a loaded record: the participant, plus the chunk start when recordings are streamed in chunks
+    """
+    return ds['participant'], ds.get('chunk')
+
+
 def cStress(rdd: RDD) -> RDD:
 
     # TODO: TWH Temporary
@@ -48,20 +55,15 @@ def cStress(rdd: RDD) -> RDD:
 
     # Timestamp correct datastreams
     ecg_corrected = rdd.map(lambda ds: (
-    ds['participant'], timestamp_correct(datastream=ds['ecg'], sampling_frequency=ecg_sampling_frequency)))
+    stream_key(ds), timestamp_correct(datastream=ds['ecg'], sampling_frequency=ecg_sampling_frequency)))
     rip_corrected = rdd.map(lambda ds: (
-    ds['participant'], timestamp_correct(datastream=ds['rip'], sampling_frequency=rip_sampling_frequency)))
-
-    accelx_corrected = rdd.map(lambda ds: (
-    ds['participant'], timestamp_correct(datastream=ds['accelx'], sampling_frequency=accel_sampling_frequency)))
-    accely_corrected = rdd.map(lambda ds: (
-    ds['participant'], timestamp_correct(datastream=ds['accely'], sampling_frequency=accel_sampling_frequency)))
-    accelz_corrected = rdd.map(lambda ds: (
-    ds['participant'], timestamp_correct(datastream=ds['accelz'], sampling_frequency=accel_sampling_frequency)))
+    stream_key(ds), timestamp_correct(datastream=ds['rip'], sampling_frequency=rip_sampling_frequency)))
 
-    accel_group = accelx_corrected.join(accely_corrected).join(accelz_corrected).map(fix_two_joins)
-    accel = accel_group.map(lambda ds: (ds[0], autosense_sequence_align(datastreams=[ds[1][0], ds[1][1], ds[1][2]],
-                                                                        sampling_frequency=accel_sampling_frequency)))
+    # The three axes arrive together, so they are aligned into one 3-channel stream and corrected once
+    accel = rdd.map(lambda ds: (
+    stream_key(ds), timestamp_correct(datastream=autosense_sequence_align(
+        datastreams=[ds['accelx'], ds['accely'], ds['accelz']], sampling_frequency=accel_sampling_frequency),
+        sampling_frequency=accel_sampling_frequency)))
 
     # Accelerometer Feature Computation
     accel_features = accel.map(lambda ds: (ds[0], accelerometer_features(ds[1], window_length=10.0)))
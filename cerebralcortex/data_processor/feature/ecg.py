@@ -26,10 +26,15 @@ from typing import List
 import numpy as np
 import scipy.signal as signal
 
-from cerebralcortex.data_processor.signalprocessing.window import window_sliding
+from cerebralcortex.data_processor.signalprocessing.rolling import RollingStatistics
+from cerebralcortex.data_processor.signalprocessing.window import WindowPlan, window_bounds
 from cerebralcortex.kernel.datatypes.datapoint import DataPoint
 from cerebralcortex.kernel.datatypes.datastream import DataStream
 
+# Names of the feature streams returned by ecg_feature_computation, in order
+ECG_FEATURES = ('rr_variance', 'rr_vlf', 'rr_hf', 'rr_lf', 'rr_lf_hf', 'rr_mean', 'rr_median', 'rr_quartile',
+				'rr_80', 'rr_20', 'rr_heart_rate')
+
 
 def lomb(data: List[DataPoint],
 		 low_frequency: float,
@@ -78,7 +83,8 @@ def ecg_feature_computation(datastream: DataStream,
 							low_rate_hf: float = 0.15,
 							high_rate_hf: float = 0.4,
 							low_rate_lf: float = 0.04,
-							high_rate_lf: float = 0.15):
+							high_rate_lf: float = 0.15,
+							window_plan: WindowPlan = None):
 	"""
 	ECG Feature Implementation. The frequency ranges for High, Low and Very low heart rate variability values are
 	derived from the following paper:
@@ -94,6 +100,7 @@ def ecg_feature_computation(datastream: DataStream,
 	:param datastream: DataStream
 	:param window_size: float
 	:param window_offset: float
+	:param window_plan: windows shared with other feature computations, the windows of window_sliding when None
 	:return: ECG Feature DataStreams
 	"""
 
@@ -103,10 +110,6 @@ def ecg_feature_computation(datastream: DataStream,
 	if len(datastream.data) == 0:
 		return None
 
-	# perform windowing of datastream
-
-	window_data = window_sliding(datastream.data, window_size, window_offset)
-
 	# initialize each ecg feature array
 
 	rr_variance_data = []
@@ -121,15 +124,30 @@ def ecg_feature_computation(datastream: DataStream,
 	rr_LF_HF_data = []
 	rr_heart_rate_data = []
 
+	# perform windowing of datastream, then statistics of all windows in one pass over the RR intervals
+
+	if window_plan is None:
+		bounds = list(window_bounds(datastream.data, window_size, window_offset))
+		keys = [key for key, _, _ in bounds]
+		firsts = np.array([first for _, first, _ in bounds], dtype=np.int64)
+		ends = np.array([end for _, _, end in bounds], dtype=np.int64)
+	else:
+		firsts, ends = window_plan.bucket(datastream.data)
+		keys = None
+
+	samples = np.array([i.sample for i in datastream.data], dtype=np.float64)
+	rr_stats = RollingStatistics(samples, firsts, ends, quantiles=(20, 80))
+	heart_rate_stats = RollingStatistics(60 / samples, firsts, ends, quantiles=())
+
 	# iterate over each window and calculate features
 
-	for key, value in window_data.items():
-		starttime, endtime = key
-		reference_data = np.array([i.sample for i in value])
+	for index in np.flatnonzero(ends > firsts):
+		value = datastream.data[firsts[index]:ends[index]]
+		starttime, endtime = window_plan.key(index) if keys is None else keys[index]
 
 		rr_variance_data.append(DataPoint.from_tuple(start_time=starttime,
 													 end_time=endtime,
-													 sample=np.var(reference_data)))
+													 sample=rr_stats.var[index]))
 
 		power, frequency = lomb(data=value, low_frequency=low_frequency, high_frequency=high_frequency)
 
@@ -157,21 +175,18 @@ def ecg_feature_computation(datastream: DataStream,
 			rr_LF_HF_data.append(DataPoint.from_tuple(start_time=starttime, end_time=endtime, sample=0))
 
 		rr_mean_data.append(
-			DataPoint.from_tuple(start_time=starttime, end_time=endtime, sample=np.mean(reference_data)))
+			DataPoint.from_tuple(start_time=starttime, end_time=endtime, sample=rr_stats.mean[index]))
 		rr_median_data.append(
-			DataPoint.from_tuple(start_time=starttime, end_time=endtime, sample=np.median(reference_data)))
+			DataPoint.from_tuple(start_time=starttime, end_time=endtime, sample=rr_stats.median[index]))
 		rr_quartile_deviation_data.append(DataPoint.from_tuple(start_time=starttime,
 															   end_time=endtime,
-															   sample=(0.5 * (
-																   np.percentile(reference_data, 75) - np.percentile(
-																	   reference_data,
-																	   25)))))
+															   sample=rr_stats.quartile_deviation[index]))
 		rr_80percentile_data.append(
-			DataPoint.from_tuple(start_time=starttime, end_time=endtime, sample=np.percentile(reference_data, 80)))
+			DataPoint.from_tuple(start_time=starttime, end_time=endtime, sample=rr_stats.quantile(80)[index]))
 		rr_20percentile_data.append(
-			DataPoint.from_tuple(start_time=starttime, end_time=endtime, sample=np.percentile(reference_data, 20)))
+			DataPoint.from_tuple(start_time=starttime, end_time=endtime, sample=rr_stats.quantile(20)[index]))
 		rr_heart_rate_data.append(
-			DataPoint.from_tuple(start_time=starttime, end_time=endtime, sample=np.median(60 / reference_data)))
+			DataPoint.from_tuple(start_time=starttime, end_time=endtime, sample=heart_rate_stats.median[index]))
 
 	rr_variance = DataStream.from_datastream([datastream])
 	rr_variance.data = rr_variance_data
@@ -26,6 +26,14 @@ from typing import Tuple
 from cerebralcortex.kernel.datatypes.datapoint import DataPoint
 from cerebralcortex.kernel.datatypes.datastream import DataStream
 
+# Names of the feature streams returned by rip_feature_computation, in order
+RIP_FEATURES = ('inspiration_duration', 'expiration_duration', 'respiration_duration', 'inspiration_expiration_ratio',
+                'stretch', 'upper_stretch', 'lower_stretch', 'delta_previous_inspiration_duration',
+                'delta_previous_expiration_duration', 'delta_previous_respiration_duration',
+                'delta_previous_stretch_duration', 'delta_next_inspiration_duration', 'delta_next_expiration_duration',
+                'delta_next_respiration_duration', 'delta_next_stretch_duration', 'neighbor_ratio_expiration',
+                'neighbor_ratio_stretch')
+
 
 def rip_feature_computation(peaks_datastream: DataStream,
                             valleys_datastream: DataStream) -> Tuple[DataStream]:
@@ -23,6 +23,8 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 from typing import Tuple
 
+from cerebralcortex.data_processor.signalprocessing.rolling import RollingStatistics
+from cerebralcortex.data_processor.signalprocessing.window import WindowPlan
 from cerebralcortex.kernel.datatypes.datapoint import DataPoint
 from cerebralcortex.kernel.datatypes.datastream import DataStream
 
@@ -53,22 +55,24 @@ def rsaCalculateCycle(startTime, endTime, rrIntervals):
 		rsa = -1
 	return rsa
 
-def getStats(data_window, list_qDev, list_mean, list_median, list_80):
-	# data array
-	data = np.array([i.sample for i in data_window])
+def windowStats(data, window_plan):
+	# Statistics of the samples in every window of the plan, in one pass
+	firsts, ends = window_plan.bucket(data)
+	samples = np.array([i.sample for i in data], dtype=np.float64)
+	return RollingStatistics(samples, firsts, ends, quantiles=(80,))
+
+def getStats(stats, index, starttime, endtime, list_qDev, list_mean, list_median, list_80):
+	if stats.count[index] == 0:
+		return list_qDev, list_mean, list_median, list_80
 
 	# Quantile deviation
-	value_qDev = (0.5 * (np.percentile(data, 75) - np.percentile(data, 25)))
-	list_qDev.append(DataPoint.from_tuple(start_time=starttime, end_time=endtime, sample = value_qDev))
+	list_qDev.append(DataPoint.from_tuple(start_time=starttime, end_time=endtime, sample = stats.quartile_deviation[index]))
 	# Mean
-	value_mean = np.mean(data)
-	list_mean.append(DataPoint.from_tuple(start_time=starttime, end_time=endtime, sample = value_mean))
+	list_mean.append(DataPoint.from_tuple(start_time=starttime, end_time=endtime, sample = stats.mean[index]))
 	# Median
-	value_median = np.median(data)
-	list_median.append(DataPoint.from_tuple(start_time=starttime, end_time=endtime, sample = value_median))
+	list_median.append(DataPoint.from_tuple(start_time=starttime, end_time=endtime, sample = stats.median[index]))
 	# 80 Percentile
-	value_80 = np.percentile(data, 80)
-	list_80.append(DataPoint.from_tuple(start_time=starttime, end_time=endtime, sample = value_80))
+	list_80.append(DataPoint.from_tuple(start_time=starttime, end_time=endtime, sample = stats.quantile(80)[index]))
 	return list_qDev, list_mean, list_median, list_80
 
 def getStats_window(data):
@@ -194,7 +198,7 @@ def rip_feature_computation(peaks_datastream: DataStream,
 		# RSA
 		value = rsaCalculateCycle(valley_start_time, valleys[i + 1].start_time, rrIntervals)
 		if value != -1:
-			rsa.append(Data.Point.from_tuple(start_time=valley_start_time, sample=value))
+			rsa.append(DataPoint.from_tuple(start_time=valley_start_time, sample=value))
 		#----------------------------------------------------------------------
 		# upper_stretch.append(DataPoint.from_tuple(start_time=valley_start_time, sample=(peak.sample - valleys[i + 1][1]) / 2))  # TODO: Fix this by adding a tracking moving average and compute upper stretch from this to the peak and lower from this to the valley
 		# lower_stretch.append(DataPoint.from_tuple(start_time=valley_start_time, sample=(-peak.sample + valleys[i + 1][1]) / 2))  # TODO: Fix this by adding a tracking moving average and compute upper stretch from this to the peak and lower from this to the valley
@@ -317,14 +321,15 @@ def rip_feature_computation(peaks_datastream: DataStream,
 	#----------------------------------------------------------------------
 	# Aggregate minute level feature
 	# Breath-rate
-	valleys_window = window_sliding(valleys, window_size, window_offset)
-	peaks_window = window_sliding(valleys, window_size, window_offset)
-	insp_window = window_sliding(inspiration_duration, window_size, window_offset)
-	exp_window = window_sliding(expiration_duration, window_size, window_offset)
-	resp_window = window_sliding(respiration_duration, window_size, window_offset)
-	inspExp_window = window_sliding(inspiration_expiration_ratio, window_size, window_offset)
-	stretch_window = window_sliding(stretch, window_size, window_offset)
-	rsa_window = window_sliding(rsa, window_size, window_offset)
+	# Every per-breath stream is bucketed against one window plan, so window k is the same in all of them
+	window_plan = WindowPlan.from_data([valleys], window_size, window_offset)
+	valleys_first, valleys_end = window_plan.bucket(valleys)
+	insp_stats = windowStats(inspiration_duration, window_plan)
+	exp_stats = windowStats(expiration_duration, window_plan)
+	resp_stats = windowStats(respiration_duration, window_plan)
+	inspExp_stats = windowStats(inspiration_expiration_ratio, window_plan)
+	stretch_stats = windowStats(stretch, window_plan)
+	rsa_stats = windowStats(rsa, window_plan)
 
 	breath_rate = []
 	insp_min_vol = []
@@ -335,20 +340,22 @@ def rip_feature_computation(peaks_datastream: DataStream,
 	stretch_qDev = []; stretch_mean = []; stretch_median = []; stretch_80 = []
 	rsa_qDev = [];     rsa_mean = [];     rsa_median = [];     rsa_80 = []
 
-	for key, value in valleys_window.items():
-		starttime, endtime = key
+	for key in range(len(window_plan)):
+		if valleys_end[key] <= valleys_first[key]:
+			continue
+		starttime, endtime = window_plan.key(key)
 
 		# breath_rate
 		breath_rate.append(DataPoint.from_tuple(start_time = starttime,
 												end_time = endtime,
-												sample = len(valleys_window[key])))
-		# inspiration minute volume
+												sample = int(valleys_end[key] - valleys_first[key])))
+		# inspiration minute volume, the peak of breath i follows valley i
 		value = 0.;
-		for i in range(len(valleys_window[key])):
-			peak_value = peaks_window[key][i].sample
-			peak_time = peaks_window[key][i].start_time.timestamp()
-			valley_value = valleys_window[key][i].sample
-			valley_time = valleys_window[key][i].start_time.timestamp()
+		for i in range(valleys_first[key], min(valleys_end[key], len(peaks))):
+			peak_value = peaks[i].sample
+			peak_time = peaks[i].start_time.timestamp()
+			valley_value = valleys[i].sample
+			valley_time = valleys[i].start_time.timestamp()
 			if peak_time > valley_time:
 				value += (peak_time - valley_time) * (peak_value - valley_value) / 2
 		insp_min_vol.append(DataPoint.from_tuple(start_time = starttime,
@@ -356,22 +363,22 @@ def rip_feature_computation(peaks_datastream: DataStream,
 												 sample = value))
 		# inspiration duration
 		insp_qDev, insp_mean, insp_median, insp_80 = getStats(
-					insp_window[key], insp_qDev, insp_mean, insp_median, insp_80)
+					insp_stats, key, starttime, endtime, insp_qDev, insp_mean, insp_median, insp_80)
 		# Expiration duration
 		exp_qDev, exp_mean, exp_median, exp_80 = getStats(
-					exp_window[key], exp_qDev, exp_mean, exp_median, exp_80)
+					exp_stats, key, starttime, endtime, exp_qDev, exp_mean, exp_median, exp_80)
 		# Respiration duration
 		resp_qDev, resp_mean, resp_median, resp_80 = getStats(
-					resp_window[key], resp_qDev, resp_mean, resp_median, resp_80)
+					resp_stats, key, starttime, endtime, resp_qDev, resp_mean, resp_median, resp_80)
 		# Inspiration Expiration duration ratio
 		inspExp_qDev, inspExp_mean, inspExp_median, inspExp_80 = getStats(
-					inspExp_window[key], inspExp_qDev, inspExp_mean, inspExp_median, inspExp_80)
+					inspExp_stats, key, starttime, endtime, inspExp_qDev, inspExp_mean, inspExp_median, inspExp_80)
 		# Stretch
 		stretch_qDev, stretch_mean, stretch_median, stretch_80 = getStats(
-					stretch_window[key], stretch_qDev, stretch_mean, stretch_median, stretch_80)
+					stretch_stats, key, starttime, endtime, stretch_qDev, stretch_mean, stretch_median, stretch_80)
 		# RSA
 		rsa_qDev, rsa_mean, rsa_median, rsa_80 = getStats(
-					rsa_window[key], rsa_qDev, rsa_mean, rsa_median, rsa_80)
+					rsa_stats, key, starttime, endtime, rsa_qDev, rsa_mean, rsa_median, rsa_80)
 
 	# To datastream struct
 	# breath_rate
@@ -22,19 +22,275 @@
 # OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
-from datetime import datetime
+import gzip
+from datetime import datetime, tzinfo
+from typing import Dict, Iterable, Iterator, Tuple
 
-import pytz
+import numpy as np
 
+from cerebralcortex.configuration import study_time_zone
+from cerebralcortex.kernel.datatypes.columnardata import ColumnarData, concatenate, epoch_us_to_datetime
 from cerebralcortex.kernel.datatypes.datapoint import DataPoint
+from cerebralcortex.kernel.datatypes.segment import read_segment
 
+# Lines longer than this cannot be a "value timestamp" pair and are dropped as malformed
+MAX_LINE_LENGTH = 64
 
-def data_processor(input_string):
+# Bytes of decompressed text parsed per block
+DEFAULT_BLOCK_SIZE = 16 * 1024 * 1024
+
+# Approximate text bytes of one "value timestamp" line, used to size blocks read from segments
+SEGMENT_ROW_BYTES = 32
+
+
+def data_processor(input_string, time_zone: tzinfo = None):
+    if time_zone is None:
+        time_zone = study_time_zone()
     try:
         [val, ts] = input_string.split(' ')
-        timestamp = datetime.fromtimestamp(float(ts) / 1000.0, pytz.timezone('US/Central'))
+        timestamp = datetime.fromtimestamp(float(ts) / 1000.0, time_zone)
         return DataPoint.from_tuple(start_time=timestamp, sample=float(val))
     except ValueError:
         # Skip bad values and filter them later
         # print("ValueError: " + str(input))
         return
+
+
+def _number_mask(tokens: np.ndarray) -> np.ndarray:
+    """
+    Mask of the columns of a bottom zero-padded uint8 token matrix (one token per column, characters along
+    axis 0) that hold a decimal number ([+-]digits[.digits][(e|E)[+-]digits]). nan/inf are not accepted.
+    """
+    positions = np.arange(tokens.shape[0])[:, None]
+    length = np.count_nonzero(tokens, axis=0)
+
+    digit = (tokens >= ord('0')) & (tokens <= ord('9'))
+    dot = tokens == ord('.')
+    sign = (tokens == ord('+')) | (tokens == ord('-'))
+    exponent = (tokens == ord('e')) | (tokens == ord('E'))
+
+    has_exponent = exponent.any(axis=0)
+    exponent_position = np.where(has_exponent, np.argmax(exponent, axis=0), length)
+
+    after_exponent = np.zeros_like(exponent)
+    after_exponent[1:] = exponent[:-1]
+    misplaced_sign = sign & (positions != 0) & ~after_exponent
+
+    mask = (digit | dot | sign | exponent | (tokens == 0)).all(axis=0)
+    mask &= length > 0
+    mask &= np.count_nonzero(dot, axis=0) <= 1
+    mask &= np.count_nonzero(exponent, axis=0) <= 1
+    mask &= ~misplaced_sign.any(axis=0)
+    mask &= ~(dot & (positions > exponent_position)).any(axis=0)
+    mask &= (digit & (positions < exponent_position)).any(axis=0)
+    mask &= ~has_exponent | (digit & (positions > exponent_position)).any(axis=0)
+    return mask
+
+
+def _to_float(tokens: np.ndarray) -> np.ndarray:
+    return np.ascontiguousarray(tokens.T).view('S%d' % tokens.shape[0]).ravel().astype(np.float64)
+
+
+def data_processor_bulk(block: bytes,
+                        time_zone: tzinfo = None) -> ColumnarData:
+    """
+    Vectorized equivalent of data_processor for a block of "value timestamp" lines. The block is viewed as a
+    fixed width byte matrix, malformed lines are dropped by mask and the remaining values and millisecond
+    timestamps are converted in bulk.
+
+    :param block: newline separated lines, timestamps in epoch milliseconds
+    :param time_zone: timezone attached to the parsed data, the study timezone when None
+    :return: ColumnarData with int64 epoch microsecond start times and float samples
+    """
+    if time_zone is None:
+        time_zone = study_time_zone()
+    lines = block.split(b'\n')
+    lengths = np.fromiter(map(len, lines), dtype=np.int64, count=len(lines))
+    width = int(min(max(lengths.max(initial=0), 1), MAX_LINE_LENGTH))
+
+    # One line per column so that the per-line reductions below run along axis 0 as whole-array operations
+    chars = np.array(lines, dtype='S%d' % width).view(np.uint8).reshape(len(lines), width).T.copy()
+    chars[chars == ord('\r')] = 0
+
+    positions = np.arange(width)[:, None]
+    length = np.count_nonzero(chars, axis=0)
+    is_space = chars == ord(' ')
+    space = np.argmax(is_space, axis=0)
+
+    valid = lengths <= MAX_LINE_LENGTH
+    valid &= np.argmax(np.vstack([chars, np.zeros((1, len(lines)), dtype=np.uint8)]) == 0, axis=0) == length
+    valid &= np.count_nonzero(is_space, axis=0) == 1
+    valid &= (space > 0) & (space < length - 1)
+
+    values = np.where(positions < space, chars, 0)
+
+    source = space + 1 + positions
+    timestamps = np.where(source < width, np.take_along_axis(chars, np.minimum(source, width - 1), axis=0), 0)
+
+    valid &= _number_mask(values) & _number_mask(timestamps)
+
+    start_times = np.round(_to_float(timestamps[:, valid]) * 1000.0).astype(np.int64)
+    return ColumnarData(start_times, _to_float(values[:, valid]), time_zone=time_zone)
+
+
+def iter_file_blocks(filename: str,
+                     block_size: int = DEFAULT_BLOCK_SIZE,
+                     time_zone: tzinfo = None) -> Iterator[ColumnarData]:
+    """
+    Parse a (gzipped) "value timestamp" file block by block. Blocks are cut at line boundaries so no line is
+    split between two blocks. Segments (.seg) are memory mapped and split into blocks without parsing.
+
+    :param filename: path to the file, gzip compressed when it ends in .gz, a segment when it ends in .seg
+    :param block_size: decompressed bytes per block
+    :param time_zone: timezone attached to the parsed data, the study timezone when None
+    :return: iterator of ColumnarData blocks in file order
+    """
+    if time_zone is None:
+        time_zone = study_time_zone()
+
+    if filename.endswith('.seg'):
+        # Converted segments need no parsing, hand out views of the memory mapped arrays instead
+        data = read_segment(filename).data
+        rows = max(1, block_size // SEGMENT_ROW_BYTES)
+        for offset in range(0, len(data), rows):
+            yield data[offset:offset + rows]
+        return
+
+    opener = gzip.open if filename.endswith('.gz') else open
+    remainder = b''
+    with opener(filename, 'rb') as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+
+            block = remainder + block
+            cut = block.rfind(b'\n')
+            if cut < 0:
+                remainder = block
+                continue
+
+            remainder = block[cut + 1:]
+            yield data_processor_bulk(block[:cut], time_zone)
+
+    if remainder:
+        yield data_processor_bulk(remainder, time_zone)
+
+
+def read_file(filename: str,
+              block_size: int = DEFAULT_BLOCK_SIZE,
+              time_zone: tzinfo = None) -> ColumnarData:
+    """
+    Parse a whole (gzipped) "value timestamp" file into columnar data
+
+    :param filename: path to the file, gzip compressed when it ends in .gz
+    :param block_size: decompressed bytes per block
+    :param time_zone: timezone attached to the parsed data, the study timezone when None
+    :return: ColumnarData
+    """
+    if time_zone is None:
+        time_zone = study_time_zone()
+    result = concatenate(list(iter_file_blocks(filename, block_size, time_zone)))
+    if result.time_zone is None:
+        result = ColumnarData(result.start_times, result.samples, time_zone=time_zone)
+    return result
+
+
+def iter_file_chunks(filename: str,
+                     duration: float = 3600.0,
+                     overlap: float = 0.0,
+                     block_size: int = DEFAULT_BLOCK_SIZE,
+                     time_zone: tzinfo = None) -> Iterator[Tuple[datetime, ColumnarData]]:
+    """
+    Stream a (gzipped) "value timestamp" file as fixed duration chunks. Chunk boundaries are multiples of duration
+    since the epoch so that chunks of different files recorded at the same time line up. Only the current chunk,
+    the overlap and one decompressed block are held in memory. Chunks without data are skipped.
+
+    :param filename: path to the file, gzip compressed when it ends in .gz
+    :param duration: chunk length in seconds
+    :param overlap: seconds of data before each chunk start that are repeated at the beginning of the chunk
+    :param block_size: decompressed bytes per parsed block
+    :param time_zone: timezone attached to the parsed data, the study timezone when None
+    :return: iterator of (chunk start, data with chunk_start - overlap <= t < chunk_start + duration)
+    """
+    if time_zone is None:
+        time_zone = study_time_zone()
+    duration_us = int(round(duration * 1e6))
+    overlap_us = int(round(overlap * 1e6))
+
+    pending = None
+    chunk_start = None
+    for block in iter_file_blocks(filename, block_size, time_zone):
+        if len(block) == 0:
+            continue
+
+        pending = block if pending is None else concatenate([pending, block])
+        if chunk_start is None:
+            chunk_start = (int(pending.start_times.min()) // duration_us) * duration_us
+
+        while len(pending) > 0 and pending.start_times.max() >= chunk_start + duration_us:
+            chunk_start, pending = yield from _emit_chunk(pending, chunk_start, duration_us, overlap_us)
+
+    while pending is not None and len(pending) > 0 and pending.start_times.max() >= chunk_start:
+        chunk_start, pending = yield from _emit_chunk(pending, chunk_start, duration_us, overlap_us)
+
+
+def _emit_chunk(pending: ColumnarData, chunk_start: int, duration_us: int, overlap_us: int):
+    """
+    Yield the chunk starting at chunk_start and return the next non-empty chunk start and the data still needed
+    """
+    chunk_end = chunk_start + duration_us
+    times = pending.start_times
+
+    chunk = pending[(times >= chunk_start - overlap_us) & (times < chunk_end)]
+    if np.any((times >= chunk_start) & (times < chunk_end)):
+        yield epoch_us_to_datetime(chunk_start, pending.time_zone), chunk
+
+    later = times[times >= chunk_end]
+    if len(later) == 0:
+        next_start = chunk_end
+    else:
+        next_start = (int(later.min()) // duration_us) * duration_us
+
+    return next_start, pending[times >= next_start - overlap_us]
+
+
+def iter_chunks(filenames: Dict[str, str],
+                duration: float = 3600.0,
+                overlap: float = 0.0,
+                block_size: int = DEFAULT_BLOCK_SIZE,
+                time_zone: tzinfo = None,
+                required: Iterable[str] = ()) -> Iterator[Tuple[datetime, Dict[str, ColumnarData]]]:
+    """
+    Stream several files of one participant chunk by chunk with shared chunk boundaries. Chunks in which a
+    required stream has no data (e.g. a sensor dropout) are skipped, since the features computed from them would
+    fail on empty input.
+
+    :param filenames: {name: filename}, e.g. {'ecg': ..., 'rip': ...}
+    :param duration: chunk length in seconds
+    :param overlap: seconds of data repeated at the beginning of each chunk
+    :param block_size: decompressed bytes per parsed block
+    :param time_zone: timezone attached to the parsed data, the study timezone when None
+    :param required: names that must have data in a chunk for it to be yielded
+    :return: iterator of (chunk start, {name: data}), names without data in a chunk map to empty ColumnarData
+    """
+    if time_zone is None:
+        time_zone = study_time_zone()
+
+    streams = {name: iter_file_chunks(filename, duration, overlap, block_size, time_zone)
+               for name, filename in filenames.items()}
+    heads = {name: next(stream, None) for name, stream in streams.items()}
+
+    while any(head is not None for head in heads.values()):
+        chunk_start = min(head[0] for head in heads.values() if head is not None)
+
+        chunk = {}
+        for name, head in heads.items():
+            if head is not None and head[0] == chunk_start:
+                chunk[name] = head[1]
+                heads[name] = next(streams[name], None)
+            else:
+                chunk[name] = ColumnarData(np.empty(0, dtype=np.int64), np.empty(0), time_zone=time_zone)
+
+        if all(len(chunk[name]) > 0 for name in required):
+            yield chunk_start, chunk
@@ -24,8 +24,9 @@
 
 import numpy as np
 
-from cerebralcortex.data_processor.signalprocessing.vector import magnitude, normalize, window_std_dev
-from cerebralcortex.data_processor.signalprocessing.window import window
+from cerebralcortex.data_processor.signalprocessing.vector import magnitude, normalize, segment_statistics
+from cerebralcortex.data_processor.signalprocessing.window import window_bounds
+from cerebralcortex.kernel.datatypes.columnardata import ColumnarData
 from cerebralcortex.kernel.datatypes.datapoint import DataPoint
 from cerebralcortex.kernel.datatypes.datastream import DataStream
 
@@ -49,14 +50,25 @@ def accelerometer_features(accel: DataStream,
     """
     accelerometer_magnitude = magnitude(normalize(accel))
 
-    accelerometer_win_mag_deviations_data = []
-    for key, data in window(accelerometer_magnitude.data, window_length).items():
-        accelerometer_win_mag_deviations_data.append(window_std_dev(data, key[0]))
+    if isinstance(accelerometer_magnitude.data, ColumnarData):
+        am_values = accelerometer_magnitude.data.samples
+    else:
+        am_values = np.array([dp.sample for dp in accelerometer_magnitude.data])
+
+    # Standard deviation of every window in one pass over the magnitude
+    bounds = list(window_bounds(accelerometer_magnitude.data, window_length, window_length))
+    firsts = np.array([first for _, first, _ in bounds], dtype=np.int64)
+    ends = np.array([end for _, _, end in bounds], dtype=np.int64)
+    if np.any(ends - firsts < 2):
+        raise Exception('Standard deviation requires at least 2 values to compute')
+    _, deviations, _, _ = segment_statistics(am_values, firsts, ends)
+
+    accelerometer_win_mag_deviations_data = [DataPoint.from_tuple(key[0], deviation)
+                                             for (key, _, _), deviation in zip(bounds, deviations.tolist())]
 
     accelerometer_win_mag_deviations = DataStream.from_datastream([accel])
     accelerometer_win_mag_deviations.data = accelerometer_win_mag_deviations_data
 
-    am_values = np.array([dp.sample for dp in accelerometer_magnitude.data])
     low_limit = np.percentile(am_values, percentile_low)
     high_limit = np.percentile(am_values, percentile_high)
     range = high_limit - low_limit
@@ -64,10 +76,9 @@ def accelerometer_features(accel: DataStream,
     #print (low_limit + activity_threshold * range)
     #print (accelerometer_win_mag_deviations_data)
 
-    accel_activity_data = []
-    for dp in accelerometer_win_mag_deviations_data:
-        comparison = dp.sample > (low_limit + activity_threshold * range)
-        accel_activity_data.append(DataPoint.from_tuple(dp.start_time, comparison))
+    activity = deviations > (low_limit + activity_threshold * range)
+    accel_activity_data = [DataPoint.from_tuple(dp.start_time, comparison)
+                           for dp, comparison in zip(accelerometer_win_mag_deviations_data, activity.tolist())]
 
     accel_activity = DataStream.from_datastream([accel])
     accel_activity.data = accel_activity_data
@@ -22,86 +22,98 @@
 # OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 import datetime
+from concurrent.futures import ProcessPoolExecutor
 from typing import List
 
 import numpy as np
 from fastdtw import fastdtw
 from scipy.interpolate import pchip
 
+from cerebralcortex.kernel.datatypes.columnardata import ColumnarData, NO_TIME, as_columnar, concatenate, \
+    epoch_us_to_datetime, seconds_to_epoch_us, stack
 from cerebralcortex.kernel.datatypes.datapoint import DataPoint
 from cerebralcortex.kernel.datatypes.datastream import DataStream
 
+_MICROSECOND = datetime.timedelta(microseconds=1)
+_CLOCK_SPAN = 32
+_CLOCK_REFITS = 3
+
 
 def interpolate_gaps(data: List[DataPoint],
                      sampling_frequency: float,
                      interpolation_gap_multiplier: float = 10.0) -> List[DataPoint]:
+    """
+    Fill gaps of two to interpolation_gap_multiplier sampling intervals with PCHIP interpolated samples on the
+    sampling grid. Each gap is interpolated from the points within the maximum interpolation gap of its start.
+
+    :param data: List[DataPoint] or ColumnarData sorted by start_time
+    :param sampling_frequency: nominal sampling frequency in Hz
+    :param interpolation_gap_multiplier: largest gap to fill, in sampling intervals
+    :return: data with interpolated points merged in, as ColumnarData when any gap was filled
+    """
     if data is None or len(data) == 0:
         return []
 
+    columns = as_columnar(data)
+    start_times = columns.start_times
+
     sampling_interval = 1.0 / sampling_frequency
 
     max_interpolation_gap = sampling_interval * interpolation_gap_multiplier
 
-    time_deltas = np.diff([dp.start_time for dp in data])
-
-    gap_points = []
-    low_limit = datetime.timedelta(seconds=2 * sampling_interval)  # TODO: Correct these low and high limits
-    high_limit = datetime.timedelta(seconds=max_interpolation_gap)
-
-    for index, value in enumerate(time_deltas):
-        if low_limit <= value <= high_limit:
-            gap_points.append((data[index], value))
-
-    if len(gap_points) == 0:
+    # TODO: Correct these low and high limits
+    low_limit = datetime.timedelta(seconds=2 * sampling_interval) // _MICROSECOND
+    high_limit = datetime.timedelta(seconds=max_interpolation_gap) // _MICROSECOND
+
+    time_deltas = np.diff(start_times)
+    gaps = np.flatnonzero((low_limit <= time_deltas) & (time_deltas <= high_limit))
+
+    # Gaps are filled in order. The first point past a gap's window closes it and is not collected into the next
+    # window, and filling stops at a window that collects no new points or is still open at the end of the data.
+    firsts = np.searchsorted(start_times, start_times[gaps] - high_limit, side='left')
+    ends = np.searchsorted(start_times, start_times[gaps] + high_limit, side='right')
+    previous_ends = np.concatenate(([-1], ends[:-1]))
+    filled = (np.maximum(firsts, previous_ends + 1) < ends) & (ends < len(start_times))
+    gap_count = len(gaps) if filled.all() else int(np.argmin(filled))
+    if gap_count == 0:
         return data
 
-    gap_index = 0
-    in_gap = False
-    gap_data = []
-    low_time = gap_points[gap_index][0].start_time - datetime.timedelta(seconds=max_interpolation_gap)
-    high_time = gap_points[gap_index][0].start_time + datetime.timedelta(seconds=max_interpolation_gap)
-
-    current_timezone = data[0].start_time.tzinfo
-    new_datapoints = []
-    for dp in data:
-        if low_time <= dp.start_time <= high_time:
-            in_gap = True
-            gap_data.append(dp)
-        elif in_gap:
-            in_gap = False
+    gaps, firsts, ends = gaps[:gap_count], firsts[:gap_count], ends[:gap_count]
+    collected = np.ones(len(start_times), dtype=bool)
+    collected[ends] = False
 
-            fix_start = gap_points[gap_index][0].start_time.timestamp()
-            fix_end = fix_start + gap_points[gap_index][1].total_seconds()
+    seconds = start_times / 1e6
+    new_times = []
+    new_samples = []
+    for gap, first, end in zip(gaps, firsts, ends):
+        fix_start = seconds[gap]
+        fix_end = fix_start + time_deltas[gap] / 1e6
 
-            x = np.array([dp.start_time.timestamp() for dp in gap_data])
-            y = np.array([dp.sample for dp in gap_data])
-            interpolated_signal = pchip(x, y)
+        new_x = frange_array(fix_start + sampling_interval, fix_end, sampling_interval)
 
-            new_x = [i for i in frange(fix_start + sampling_interval, fix_end, sampling_interval)]
-            new_y = interpolated_signal(new_x)
+        neighborhood = collected[first:end]
+        interpolated_signal = pchip(seconds[first:end][neighborhood], columns.samples[first:end][neighborhood])
 
-            for i, value in enumerate(new_y):
-                new_datapoints.append(
-                    DataPoint.from_tuple(datetime.datetime.fromtimestamp(new_x[i], tz=current_timezone), value))
+        new_times.append(new_x)
+        new_samples.append(interpolated_signal(new_x))
 
-            gap_index += 1
-            if gap_index == len(gap_points):
-                break
-            low_time = gap_points[gap_index][0].start_time - datetime.timedelta(seconds=max_interpolation_gap)
-            high_time = gap_points[gap_index][0].start_time + datetime.timedelta(seconds=max_interpolation_gap)
+    new_times = seconds_to_epoch_us(np.concatenate(new_times))
+    new_samples = np.concatenate(new_samples)
 
-            gap_data = [dp for dp in gap_data if low_time <= dp.start_time <= high_time]
+    # Interpolated points go before the first original point that is later, points past the end are dropped
+    positions = np.searchsorted(start_times, new_times, side='right')
+    inside = positions < len(start_times)
+    positions, new_times, new_samples = positions[inside], new_times[inside], new_samples[inside]
 
-    result = []
-    index = 0
-    for dp in data:
-        while index < len(new_datapoints) and dp.start_time > new_datapoints[index].start_time:
-            result.append(new_datapoints[index])
-            index += 1
+    end_times = None
+    if columns.end_times is not None:
+        end_times = np.insert(columns.end_times, positions, NO_TIME)
 
-        result.append(dp)
-
-    return result
+    return ColumnarData(np.insert(start_times, positions, new_times),
+                        np.insert(columns.samples.astype(new_samples.dtype, copy=False), positions, new_samples,
+                                  axis=0),
+                        end_times,
+                        columns.time_zone)
 
 
 def frange(start, stop, step):
@@ -111,108 +123,333 @@ def frange(start, stop, step):
         i += step
 
 
+def frange_array(start: float, stop: float, step: float) -> np.ndarray:
+    """
+    Array version of frange. The values are accumulated the same way, so they are bit for bit equal to
+    list(frange(start, stop, step)).
+
+    :param start: first value
+    :param stop: inclusive upper bound
+    :param step: increment
+    :return: np.ndarray of float
+    """
+    steps = np.full(max(0, int((stop - start) / step)) + 2, step, dtype=np.float64)
+    steps[0] = start
+    values = np.cumsum(steps)
+    return values[values <= stop]
+
+
+class ClockCorrection:
+    def __init__(self,
+                 start_times: np.ndarray,
+                 sampling_frequency: float,
+                 time_zone: datetime.tzinfo = None):
+        """
+        Linear clock model of one segment of a sensor stream. Every sample is given an index on the sensor's own
+        clock, a least squares line through (index, timestamp) estimates the effective sampling period, and the
+        fitted times are snapped to the nearest point of the nominal sampling grid, the same grid the DTW
+        correction uses. Linear in the number of samples.
+
+        Attributes: count, start_time and end_time of the segment, the effective sampling_frequency, drift as the
+        relative deviation of the effective from the nominal sampling frequency, jitter as the RMS distance in
+        seconds of the observed timestamps from the fitted clock, max_shift as the largest change of a timestamp in
+        seconds, and corrected, the corrected int64 epoch microsecond timestamps.
+
+        :param start_times: int64 epoch microseconds of the segment, sorted
+        :param sampling_frequency: nominal sampling frequency in Hz
+        :param time_zone: timezone of start_time and end_time
+        """
+        sampling_interval = 1.0 / sampling_frequency
+        seconds = (start_times - start_times[0]) / 1e6
+
+        self.count = len(start_times)
+        self.start_time = epoch_us_to_datetime(start_times[0], time_zone)
+        self.end_time = epoch_us_to_datetime(start_times[-1], time_zone)
+
+        # Initial period from the median spacing. It is refined over spans of samples without holes or stalls, so
+        # that timing noise is averaged out and rounding to clock indices does not drift.
+        spacing = np.diff(seconds)
+        period = float(np.median(spacing)) if self.count > 1 else sampling_interval
+        if self.count > _CLOCK_SPAN:
+            interrupted = np.concatenate(([0], np.cumsum(spacing > 2.0 * period)))
+            clean = interrupted[_CLOCK_SPAN:] == interrupted[:-_CLOCK_SPAN]
+            if np.any(clean):
+                period = float(np.median((seconds[_CLOCK_SPAN:] - seconds[:-_CLOCK_SPAN])[clean])) / _CLOCK_SPAN
+        if not 0.5 * sampling_interval <= period <= 2.0 * sampling_interval:
+            period = sampling_interval
+
+        # Strictly increasing sensor clock indices, missed samples leave holes. Transmission only delays samples,
+        # so a burst that follows a stall is assigned backwards into the stall.
+        positions = np.arange(self.count)
+        nearest = np.round(seconds / period).astype(np.int64) - positions
+        indices = positions + np.minimum.accumulate(nearest[::-1])[::-1]
+
+        offset = seconds[0] - period * indices[0]
+        if self.count > 1 and indices[-1] > indices[0]:
+            fitted_period, fitted_offset = np.polyfit(indices, seconds, 1)
+
+            # Refit without the samples that arrived far off the line, e.g. during a long transmission stall
+            for _ in range(_CLOCK_REFITS):
+                residuals = seconds - (fitted_offset + fitted_period * indices)
+                deviation = np.abs(residuals - np.median(residuals))
+                inliers = deviation <= max(3.0 * 1.4826 * np.median(deviation), sampling_interval)
+                if np.count_nonzero(inliers) < 2 or indices[inliers][-1] == indices[inliers][0]:
+                    break
+                fitted_period, fitted_offset = np.polyfit(indices[inliers], seconds[inliers], 1)
+
+            if fitted_period > 0:
+                period, offset = fitted_period, fitted_offset
+        fitted = offset + period * indices
+
+        grid = frange_array(start_times[0] / 1e6, start_times[-1] / 1e6, sampling_interval)
+        grid_index = np.clip(np.round(fitted * sampling_frequency).astype(np.int64), 0, len(grid) - 1)
+        self.corrected = seconds_to_epoch_us(grid[grid_index])
+
+        self.sampling_frequency = 1.0 / period
+        self.drift = self.sampling_frequency / sampling_frequency - 1.0
+        self.jitter = float(np.sqrt(np.mean((seconds - fitted) ** 2)))
+        self.max_shift = float(np.max(np.abs(self.corrected - start_times))) / 1e6
+
+    def as_dict(self) -> dict:
+        """
+        :return: report of the correction keyed by attribute name
+        """
+        return {'start_time': self.start_time,
+                'end_time': self.end_time,
+                'count': self.count,
+                'sampling_frequency': self.sampling_frequency,
+                'drift': self.drift,
+                'jitter': self.jitter,
+                'max_shift': self.max_shift}
+
+
+def _segment_bounds(start_times: np.ndarray,
+                    min_split_gap: int,
+                    max_data_points_per_segment: int) -> List[tuple]:
+    """
+    Index ranges of the segments timestamp_correct corrects independently. Segments end at gaps longer than
+    min_split_gap, the first point after such a gap is not part of any segment, and segments are cut into
+    pieces of at most max_data_points_per_segment points.
+
+    :param start_times: int64 epoch microseconds
+    :param min_split_gap: microseconds
+    :param max_data_points_per_segment:
+    :return: List of (first, end) index pairs
+    """
+    split_points = np.concatenate(([0], np.flatnonzero(np.diff(start_times) > min_split_gap), [len(start_times) - 1]))
+
+    bounds = []
+    first = 0
+    for high_point in split_points[1:]:
+        end = max(first, int(np.searchsorted(start_times, start_times[high_point], side='right')))
+        for piece in range(first, end, max_data_points_per_segment):
+            bounds.append((piece, min(end, piece + max_data_points_per_segment)))
+        if end >= len(start_times):
+            break
+        first = end + 1
+
+    return bounds
+
+
+def _dtw_correct(seconds: np.ndarray, sampling_frequency: float) -> np.ndarray:
+    """
+    Align observed timestamps to the nominal sampling grid with fastdtw
+
+    :param seconds: observed epoch seconds of one segment
+    :param sampling_frequency: nominal sampling frequency in Hz
+    :return: corrected epoch seconds
+    """
+    x = frange_array(seconds[0], seconds[-1], 1.0 / sampling_frequency)
+
+    distance, path = fastdtw(x, seconds, radius=1)
+
+    # Each observed point takes the last grid point it is matched with
+    path = np.array(path)
+    last = np.append(path[1:, 1] != path[:-1, 1], True)
+    corrected = np.zeros(len(seconds))
+    corrected[path[last, 1]] = x[path[last, 0]]
+    return corrected
+
+
+def _correct_segment(segment: ColumnarData, sampling_frequency: float, method: str) -> tuple:
+    """
+    Fill the short gaps of one segment and correct its timestamps
+
+    :param segment: ColumnarData of one segment
+    :param sampling_frequency: nominal sampling frequency in Hz
+    :param method: 'dtw' or 'linear'
+    :return: corrected ColumnarData, ClockCorrection for method 'linear' else None
+    """
+    segment = as_columnar(interpolate_gaps(segment, sampling_frequency))
+
+    correction = None
+    if method == 'linear':
+        correction = ClockCorrection(segment.start_times, sampling_frequency, segment.time_zone)
+        corrected = correction.corrected
+    else:
+        corrected = seconds_to_epoch_us(_dtw_correct(segment.start_times / 1e6, sampling_frequency))
+
+    return ColumnarData(corrected, segment.samples, None, segment.time_zone), correction
+
+
+def _correct_shared_segment(arguments: tuple) -> tuple:
+    """
+    Worker side of _correct_segments_parallel: copy one segment out of the shared input arrays and correct it
+
+    :param arguments: shared memory names, array length, sample shape and dtype, segment bounds, sampling
+        frequency, method and timezone
+    :return: result of _correct_segment
+    """
+    from multiprocessing.shared_memory import SharedMemory
+
+    names, length, sample_shape, sample_dtype, first, end, sampling_frequency, method, time_zone = arguments
+
+    times_memory = SharedMemory(name=names[0])
+    samples_memory = SharedMemory(name=names[1])
+    try:
+        start_times = np.ndarray((length,), np.int64, times_memory.buf)[first:end].copy()
+        samples = np.ndarray((length,) + sample_shape, sample_dtype, samples_memory.buf)[first:end].copy()
+    finally:
+        times_memory.close()
+        samples_memory.close()
+
+    return _correct_segment(ColumnarData(start_times, samples, None, time_zone), sampling_frequency, method)
+
+
+def _correct_segments_parallel(data: ColumnarData,
+                               bounds: List[tuple],
+                               sampling_frequency: float,
+                               method: str,
+                               processes: int) -> List[tuple]:
+    """
+    Correct segments in a process pool. The input arrays are placed in shared memory once, so each worker only
+    reads its own segment instead of receiving a pickled copy, and the results are returned in segment order.
+
+    :param data: ColumnarData with numeric samples
+    :param bounds: segment index ranges from _segment_bounds
+    :param sampling_frequency: nominal sampling frequency in Hz
+    :param method: 'dtw' or 'linear'
+    :param processes: number of worker processes, None for one per core
+    :return: List of _correct_segment results
+    """
+    # Python 3.8+, imported here so the serial path keeps working on older interpreters
+    from multiprocessing.shared_memory import SharedMemory
+
+    samples = np.ascontiguousarray(data.samples)
+
+    times_memory = SharedMemory(create=True, size=max(1, data.start_times.nbytes))
+    samples_memory = SharedMemory(create=True, size=max(1, samples.nbytes))
+    try:
+        np.ndarray(data.start_times.shape, np.int64, times_memory.buf)[:] = data.start_times
+        np.ndarray(samples.shape, samples.dtype, samples_memory.buf)[:] = samples
+
+        arguments = [((times_memory.name, samples_memory.name), len(data), samples.shape[1:], samples.dtype,
+                      first, end, sampling_frequency, method, data.time_zone) for first, end in bounds]
+
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            return list(executor.map(_correct_shared_segment, arguments))
+    finally:
+        times_memory.close()
+        times_memory.unlink()
+        samples_memory.close()
+        samples_memory.unlink()
+
+
 def timestamp_correct(datastream: DataStream,
                       sampling_frequency: float,
                       min_available_gaps: int = 3600,  # TODO: Does this matter anymore?
                       min_split_gap: datetime.timedelta = datetime.timedelta(seconds=30),
-                      max_data_points_per_segment: int = 100000000) -> DataStream:
-	try:
-		result = DataStream.from_datastream([datastream])
-		result.data = []
-
-		if len(datastream.data) == 0:
-			return result
-
-		data = datastream.data
-		time_deltas = np.diff([dp.start_time for dp in data])
-
-		gap_points = [data[0]]
-		for index, value in enumerate(time_deltas):
-			if value > min_split_gap:
-				gap_points.append(data[index])
-		gap_points.append(data[-1])
-
-		segments = []
-		segment_data = []
-		gap_index = 0
-		low_time = gap_points[gap_index].start_time
-		high_time = gap_points[gap_index + 1].start_time
-		for dp in data:
-			if len(segment_data) >= max_data_points_per_segment:
-				segments.append(interpolate_gaps(segment_data, sampling_frequency))
-				segment_data = []
-
-			if low_time <= dp.start_time <= high_time:
-				segment_data.append(dp)
-			else:
-				segments.append(interpolate_gaps(segment_data, sampling_frequency))
-				gap_index += 1
-				low_time = gap_points[gap_index].start_time
-				high_time = gap_points[gap_index + 1].start_time
-				segment_data = []
-
-		segments.append(interpolate_gaps(segment_data, sampling_frequency))
-
-		for s in segments:
-			begin_time = s[0].start_time.timestamp()
-			end_time = s[-1].start_time.timestamp()
-
-			x = np.array([i for i in frange(begin_time, end_time, 1.0 / sampling_frequency)], dtype='float')
-			y = np.array([dp.start_time.timestamp() for dp in s], dtype='float')
-
-			distance, path = fastdtw(x, y, radius=1)
-
-			xx = [0 for i in y]
-			for si, ei in path:
-				xx[ei] = x[si]
-
-			dtw_corrected_data = []
-			for index, dp in enumerate(s):
-				ts = datetime.datetime.fromtimestamp(xx[index], tz=dp.start_time.tzinfo)
-				dtw_corrected_data.append(DataPoint.from_tuple(ts, dp.sample))
-
-			result.data.extend(dtw_corrected_data)
-
+                      max_data_points_per_segment: int = 100000000,
+                      method: str = 'dtw',
+                      corrections: List[ClockCorrection] = None,
+                      processes: int = 1) -> DataStream:
+	"""
+	Correct the timestamps of a stream to its nominal sampling grid. The stream is split into segments at long
+	gaps, short gaps are filled with interpolate_gaps, and every segment is aligned to the grid.
+
+	:param datastream: input stream
+	:param sampling_frequency: nominal sampling frequency in Hz
+	:param min_available_gaps: unused
+	:param min_split_gap: gaps longer than this start a new segment
+	:param max_data_points_per_segment: longer segments are cut into pieces
+	:param method: 'dtw' aligns with fastdtw, 'linear' fits a linear clock model (ClockCorrection) in linear time
+	:param corrections: with method 'linear', a list that receives the ClockCorrection of every segment
+	:param processes: number of processes segments are corrected in, None for one per core. More than one needs
+		Python 3.8+.
+	:return: DataStream with ColumnarData
+	"""
+	if method not in ('dtw', 'linear'):
+		raise ValueError('Unknown timestamp correction method: ' + str(method))
+
+	result = DataStream.from_datastream([datastream])
+	result.data = []
+
+	if len(datastream.data) == 0:
 		return result
-	except:
-		return []
-	
+
+	data = as_columnar(datastream.data)
+
+	bounds = _segment_bounds(data.start_times, min_split_gap // _MICROSECOND, max_data_points_per_segment)
+
+	if processes != 1 and len(bounds) > 1 and data.samples.dtype != object:
+		segments = _correct_segments_parallel(data, bounds, sampling_frequency, method, processes)
+	else:
+		segments = [_correct_segment(data[first:end], sampling_frequency, method) for first, end in bounds]
+
+	if corrections is not None:
+		corrections.extend(correction for segment, correction in segments if correction is not None)
+
+	result.data = concatenate([segment for segment, correction in segments])
+
+	return result
 
 
 def autosense_sequence_align(datastreams: List[DataStream],
-                             sampling_frequency: float) -> DataStream:
+                             sampling_frequency: float,
+                             tolerance: float = None) -> DataStream:
+    """
+    Combine streams sampled together, e.g. accelerometer x, y and z, into one stream with a sample column per
+    input stream. Streams start one sampling interval before the latest first timestamp. By default rows are
+    zipped by position and truncated to the shortest stream. With a tolerance every point of the first stream is
+    matched with the nearest point of each other stream instead, and rows without a match within the tolerance
+    are dropped.
+
+    :param datastreams: List[DataStream], sorted by start_time
+    :param sampling_frequency: sampling frequency in Hz
+    :param tolerance: seconds, None for positional alignment
+    :return: DataStream with multi-channel ColumnarData and the timestamps of the first stream
+    """
     result = DataStream.from_datastream(input_streams=datastreams)
     result.data = []
 
     if len(datastreams) == 0:
         return result
 
-    start_time = None
-    #print (len(datastreams))
-    for ds in datastreams:
-        ts = ds.data[0].start_time
-        #print (ts)
-        if not start_time:
-            start_time = ts
-        elif start_time < ts:
-            start_time = ts
-    print (start_time)
-    start_time -= datetime.timedelta(seconds=1.0 / sampling_frequency)
-    print (start_time)
-
-    data_block = []
-    max_index = np.Inf
-    for ds in datastreams:
-        d = [i for i in ds.data if i.start_time > start_time]
-        if len(d) < max_index:
-            max_index = len(d)
-        data_block.append(d)
-    print (max_index)
-    data_array = np.array(data_block)
-
-    dimensions = data_array.shape[0]
-    for i in range(0, max_index):
-        sample = [data_array[d][i].sample for d in range(0, dimensions)]
-        result.data.append(DataPoint.from_tuple(data_array[0][i].start_time, sample))
+    columns = [as_columnar(ds.data) for ds in datastreams]
+    if any(len(c) == 0 for c in columns):
+        return result
+
+    start_time = max(c.start_times[0] for c in columns)
+    start_time -= datetime.timedelta(seconds=1.0 / sampling_frequency) // _MICROSECOND
+
+    columns = [c[int(c.searchsorted(start_time, side='right')):] for c in columns]
+
+    if tolerance is None:
+        length = min(len(c) for c in columns)
+        result.data = stack([c[:length] for c in columns])
+        return result
+
+    if any(len(c) == 0 for c in columns):
+        return result
+
+    reference = columns[0].start_times
+    max_distance = datetime.timedelta(seconds=tolerance) // _MICROSECOND
+    matched = np.ones(len(reference), dtype=bool)
+    matches = []
+    for c in columns[1:]:
+        nearest = c.nearest_indices(reference)
+        matched &= np.abs(c.start_times[nearest] - reference) <= max_distance
+        matches.append(nearest)
 
+    result.data = stack([columns[0][matched]] + [c[nearest[matched]] for c, nearest in zip(columns[1:], matches)])
     return result
@@ -26,7 +26,8 @@ from typing import List
 import numpy as np
 from scipy import signal
 
-from cerebralcortex.data_processor.signalprocessing.window import window
+from cerebralcortex.data_processor.signalprocessing.window import window_bounds
+from cerebralcortex.kernel.datatypes.columnardata import ColumnarData
 from cerebralcortex.kernel.datatypes.datapoint import DataPoint
 from cerebralcortex.kernel.datatypes.datastream import DataStream
 
@@ -48,13 +49,29 @@ def classify_ecg_window(data: List[DataPoint],
 	"""
 
 	values = np.array([i.sample for i in data])
-	if max(values) - min(values) < range_threshold:
-		return False
-	if max(values) > maximum_value:
-		return False
-	if np.median(np.abs(np.diff(values))) > slope_threshold:
-		return False
-	return True
+	return bool(classify_ecg_windows(values[np.newaxis, :], range_threshold, slope_threshold, maximum_value)[0])
+
+
+def classify_ecg_windows(windows: np.ndarray,
+						 range_threshold: int = 200,
+						 slope_threshold: int = 50,
+						 maximum_value: int = 4000) -> np.ndarray:
+	"""
+	classify_ecg_window for many windows of the same length at once, e.g. from window_regular
+	:param windows: windows x samples array of raw ecg values
+	:param range_threshold: see classify_ecg_window
+	:param slope_threshold: see classify_ecg_window
+	:param maximum_value: see classify_ecg_window
+	:return: boolean array, True for the windows to keep
+	"""
+	windows = np.asarray(windows)
+	if windows.shape[1] < 2:
+		return np.zeros(len(windows), dtype=bool)
+
+	maximum = windows.max(axis=1)
+	minimum = windows.min(axis=1)
+	slope = np.median(np.abs(np.diff(windows, axis=1)), axis=1)
+	return (maximum - minimum >= range_threshold) & (maximum <= maximum_value) & ~(slope > slope_threshold)
 
 
 def filter_bad_ecg(ecg: DataStream,
@@ -72,14 +89,28 @@ def filter_bad_ecg(ecg: DataStream,
 	"""
 
 	window_length = int(no_of_secs * fs)
-	window_data = window(ecg.data, window_size=window_length)
+	bounds = np.array([(first, end) for _, first, end in window_bounds(ecg.data, window_length, window_length)],
+					  dtype=np.int64).reshape(-1, 2)
+	firsts, ends = bounds[:, 0], bounds[:, 1]
+
+	if isinstance(ecg.data, ColumnarData):
+		samples = ecg.data.samples
+	else:
+		samples = np.array([i.sample for i in ecg.data])
+
+	# Windows of a regular signal all have the same length, so they are classified with one reduction per length
+	keep = np.zeros(len(bounds), dtype=bool)
+	lengths = ends - firsts
+	for length in np.unique(lengths):
+		selected = np.flatnonzero(lengths == length)
+		windows = samples[firsts[selected, np.newaxis] + np.arange(length)]
+		keep[selected] = classify_ecg_windows(windows, range_threshold=200, slope_threshold=50, maximum_value=4000)
 
 	ecg_filtered = DataStream.from_datastream([ecg])
 	ecg_filtered_array = []
 
-	for key, data in window_data.items():
-		if classify_ecg_window(data, range_threshold=200, slope_threshold=50, maximum_value=4000):
-			ecg_filtered_array.extend(data)
+	for index in np.flatnonzero(keep):
+		ecg_filtered_array.extend(ecg.data[firsts[index]:ends[index]])
 
 	ecg_filtered.data = ecg_filtered_array
 
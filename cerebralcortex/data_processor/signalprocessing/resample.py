@@ -0,0 +1,210 @@
+# Copyright (c) 2017, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import math
+from fractions import Fraction
+
+import numpy as np
+from scipy.interpolate import PchipInterpolator
+from scipy.signal import resample_poly
+
+from cerebralcortex.kernel.datatypes.columnardata import ColumnarData, as_columnar
+from cerebralcortex.kernel.datatypes.datastream import DataStream
+
+METHODS = ('linear', 'pchip', 'polyphase')
+
+# Input points on each side of a chunk that PCHIP derivatives at the chunk edges depend on
+_PCHIP_MARGIN = 2
+
+
+def _rational_ratio(target_rate: float, sampling_frequency: float) -> tuple:
+	"""
+	:param target_rate: Hz
+	:param sampling_frequency: Hz
+	:return: (up, down) with up / down = target_rate / sampling_frequency
+	"""
+	ratio = Fraction(target_rate / sampling_frequency).limit_denominator(1000)
+	return ratio.numerator, ratio.denominator
+
+
+def _interpolate(times: np.ndarray, samples: np.ndarray, grid: np.ndarray, method: str) -> np.ndarray:
+	"""
+	:param times: seconds, strictly increasing
+	:param samples: samples at times, time along the first axis
+	:param grid: seconds within [times[0], times[-1]]
+	:param method: 'linear' or 'pchip'
+	:return: samples at grid
+	"""
+	if len(times) == 1:
+		return np.repeat(samples[:1].astype(np.float64), len(grid), axis=0)
+	if method == 'pchip':
+		return PchipInterpolator(times, samples, axis=0)(grid)
+	if samples.ndim == 1:
+		return np.interp(grid, times, samples)
+	return np.column_stack([np.interp(grid, times, samples[:, c]) for c in range(samples.shape[1])])
+
+
+def _interpolate_chunks(times: np.ndarray,
+						samples: np.ndarray,
+						grid: np.ndarray,
+						method: str,
+						chunk_size: int) -> np.ndarray:
+	"""
+	Interpolate onto the grid chunk by chunk, fitting each chunk on the input points it covers plus a margin, so
+	that the result equals a single fit over the whole input
+
+	:param times: seconds, strictly increasing
+	:param samples: samples at times
+	:param grid: seconds within [times[0], times[-1]]
+	:param method: 'linear' or 'pchip'
+	:param chunk_size: grid points per chunk
+	:return: samples at grid
+	"""
+	chunks = []
+	for first in range(0, len(grid), chunk_size):
+		chunk = grid[first:first + chunk_size]
+		low = max(0, int(np.searchsorted(times, chunk[0], side='right')) - 1 - _PCHIP_MARGIN)
+		high = min(len(times), int(np.searchsorted(times, chunk[-1], side='left')) + 1 + _PCHIP_MARGIN)
+		chunks.append(_interpolate(times[low:high], samples[low:high], chunk, method))
+	return np.concatenate(chunks) if chunks else np.empty((0,) + samples.shape[1:])
+
+
+def _polyphase(times: np.ndarray,
+			   samples: np.ndarray,
+			   up: int,
+			   down: int,
+			   sampling_frequency: float,
+			   chunk_size: int) -> np.ndarray:
+	"""
+	Polyphase resampling by up / down. The input is first linearly interpolated onto its regular sampling grid
+	starting at the first output point, then filtered chunk by chunk with enough overlap that chunk edges match a
+	single pass.
+
+	:param times: seconds from the first output point, strictly increasing with times[0] <= 0
+	:param samples: samples at times
+	:param up: upsampling factor
+	:param down: downsampling factor
+	:param sampling_frequency: input sampling frequency in Hz
+	:param chunk_size: output points per chunk
+	:return: samples at k * down / (up * sampling_frequency) for k = 0, 1, ...
+	"""
+	source_count = int(math.floor(times[-1] * sampling_frequency + 1e-9)) + 1
+	regular = _interpolate_chunks(times, samples, np.arange(source_count) / sampling_frequency, 'linear',
+								  chunk_size)
+	output_count = (source_count - 1) * up // down + 1
+
+	# resample_poly's default filter reaches 10 * max(up, down) upsampled samples to each side
+	margin = -(-(10 * max(up, down) // up + 1) // down) * down
+	chunk_size = max(up, chunk_size // up * up)
+
+	chunks = []
+	for first in range(0, output_count, chunk_size):
+		end = min(output_count, first + chunk_size)
+		source_first = max(0, first * down // up - margin)
+		source_end = min(source_count, -(-end * down // up) + margin)
+		filtered = resample_poly(regular[source_first:source_end], up, down, axis=0)
+		offset = first - source_first * up // down
+		chunks.append(filtered[offset:offset + end - first])
+	return np.concatenate(chunks)
+
+
+def resample(datastream: DataStream,
+			 target_rate: float,
+			 method: str = 'linear',
+			 sampling_frequency: float = None,
+			 max_gap: float = None,
+			 chunk_size: int = 65536) -> DataStream:
+	"""
+	Resample a stream onto the regular grid of target_rate. Grid points are whole multiples of the target
+	sampling interval since the epoch, so streams resampled to the same rate share timestamps and can be combined
+	sample by sample. Long recordings are processed chunk_size output points at a time.
+
+	Methods: 'linear' and 'pchip' interpolate between the input points, 'polyphase' regularizes the input at its
+	sampling_frequency and applies scipy's anti-aliased polyphase filter, for decimation (e.g. ECG at 64 Hz to
+	accelerometer at 64 / 6 Hz) or interpolation.
+
+	:param datastream: input stream with numeric samples, sorted by time. Of points sharing a timestamp, as
+		timestamp_correct can produce, the last one is used.
+	:param target_rate: output sampling frequency in Hz, taken as the nearest fraction with a denominator of at most
+		10^6 (e.g. 64 / 6 as 32 / 3)
+	:param method: one of METHODS
+	:param sampling_frequency: input sampling frequency in Hz, required for 'polyphase'
+	:param max_gap: seconds, grid points inside gaps of the input longer than this are dropped, None keeps all
+	:param chunk_size: output points per chunk
+	:return: DataStream with ColumnarData on the target grid
+	"""
+	if method not in METHODS:
+		raise ValueError('Unknown resampling method: ' + str(method))
+	if method == 'polyphase' and sampling_frequency is None:
+		raise ValueError('Polyphase resampling requires the input sampling_frequency')
+
+	result = DataStream.from_datastream([datastream])
+	result.data = []
+
+	data = as_columnar(datastream.data)
+	if len(data) == 0:
+		return result
+
+	distinct = np.append(np.diff(data.start_times) > 0, True)
+	start_times = data.start_times[distinct]
+	samples = data.samples[distinct].astype(np.float64)
+
+	# Grid point k is at k / target_rate seconds since the epoch. Polyphase output must also fall on the input
+	# grid, which holds for every up-th grid point.
+	step = 1
+	if method == 'polyphase':
+		up, down = _rational_ratio(target_rate, sampling_frequency)
+		step = up
+	# Integer arithmetic on the epoch microseconds: grid point k is at k * scale / rate_numerator microseconds
+	rate = Fraction(target_rate).limit_denominator(1000000)
+	scale = rate.denominator * 1000000
+	first_point = -(-int(start_times[0]) * rate.numerator // scale)
+	first_point = -(-first_point // step) * step
+	last_point = int(start_times[-1]) * rate.numerator // scale
+	if last_point < first_point:
+		return result
+
+	# The first grid point is origin_us + origin_fraction / rate_numerator microseconds since the epoch
+	origin_us, origin_fraction = divmod(first_point * scale, rate.numerator)
+	points = np.arange(last_point - first_point + 1)
+	times = ((start_times - origin_us) - origin_fraction / rate.numerator) / 1e6
+	grid = points * (rate.denominator / rate.numerator)
+
+	if method == 'polyphase':
+		resampled = _polyphase(times, samples, up, down, sampling_frequency, chunk_size)[:len(grid)]
+		grid = grid[:len(resampled)]
+	else:
+		resampled = _interpolate_chunks(times, samples, grid, method, chunk_size)
+
+	offsets = (origin_fraction + points[:len(grid)] * float(scale)) / rate.numerator
+	grid_times = origin_us + np.round(offsets).astype(np.int64)
+
+	if max_gap is not None and len(start_times) > 1:
+		after = np.clip(np.searchsorted(start_times, grid_times), 1, len(start_times) - 1)
+		gaps = start_times[after] - start_times[after - 1]
+		keep = (gaps <= max_gap * 1e6) | (start_times[after] == grid_times) | (start_times[after - 1] == grid_times)
+		grid_times, resampled = grid_times[keep], resampled[keep]
+
+	result.data = ColumnarData(grid_times, resampled, None, data.time_zone)
+	return result
@@ -0,0 +1,140 @@
+# Copyright (c) 2017, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from bisect import bisect_left, insort
+from typing import Dict, Iterable
+
+import numpy as np
+
+# Quantiles (percent) always tracked, for the median and the quartile deviation
+QUARTILES = (25, 50, 75)
+
+
+def _quantile(window: list, q: float) -> float:
+	"""
+	Linear interpolation quantile of a sorted list, computed like np.percentile
+
+	:param window: sorted non-empty list
+	:param q: percent
+	:return: q-th percentile
+	"""
+	position = q / 100 * (len(window) - 1)
+	below = int(position)
+	above = min(below + 1, len(window) - 1)
+	t = position - below
+	difference = window[above] - window[below]
+	if t >= 0.5:
+		return window[above] - difference * (1 - t)
+	return window[below] + difference * t
+
+
+def _median(window: list) -> float:
+	"""
+	:param window: sorted non-empty list
+	:return: median, computed like np.median
+	"""
+	middle = len(window) // 2
+	if len(window) % 2:
+		return window[middle]
+	return (window[middle - 1] + window[middle]) / 2
+
+
+class RollingStatistics:
+	def __init__(self,
+				 values: np.ndarray,
+				 firsts: np.ndarray,
+				 ends: np.ndarray,
+				 quantiles: Iterable[float] = (20, 80)):
+		"""
+		Mean, variance, median and quantiles of values[firsts[k]:ends[k]] for every window k in one pass. The
+		bounds must be non-decreasing, as returned by WindowPlan.bucket. Sums and sums of squares come from prefix
+		sums, and order statistics from a sorted window that only inserts the values entering and removes the values
+		leaving as windows slide. Statistics of empty windows are nan.
+
+		:param values: samples sorted by time
+		:param firsts: first index of every window
+		:param ends: end index of every window
+		:param quantiles: percents to compute besides QUARTILES
+		"""
+		values = np.asarray(values, dtype=np.float64)
+		firsts = np.asarray(firsts, dtype=np.int64)
+		ends = np.maximum(np.asarray(ends, dtype=np.int64), firsts)
+
+		self.count = ends - firsts
+		nonempty = self.count > 0
+		counts = np.where(nonempty, self.count, 1)
+
+		# Shift by the overall mean so the prefix sums keep their precision
+		shift = values.mean() if len(values) > 0 else 0.0
+		centered = values - shift
+		sums = np.concatenate(([0.0], np.cumsum(centered)))
+		squares = np.concatenate(([0.0], np.cumsum(centered * centered)))
+		centered_mean = (sums[ends] - sums[firsts]) / counts
+		variance = (squares[ends] - squares[firsts]) / counts - centered_mean * centered_mean
+
+		self.mean = np.where(nonempty, centered_mean + shift, np.nan)
+		self.var = np.where(nonempty, np.maximum(variance, 0.0), np.nan)
+
+		self.median = np.full(len(firsts), np.nan)
+		self.quantiles = {q: np.full(len(firsts), np.nan) for q in set(QUARTILES) | set(quantiles)}
+
+		window = []
+		first = end = 0
+		for k in np.flatnonzero(nonempty):
+			if firsts[k] >= end:
+				# No overlap with the previous window
+				window = sorted(values[firsts[k]:ends[k]].tolist())
+			else:
+				for value in values[first:firsts[k]].tolist():
+					del window[bisect_left(window, value)]
+				for value in values[end:ends[k]].tolist():
+					insort(window, value)
+			first, end = firsts[k], ends[k]
+
+			self.median[k] = _median(window)
+			for q, result in self.quantiles.items():
+				result[k] = _quantile(window, q)
+
+		# Half of the interquartile range
+		self.quartile_deviation = 0.5 * (self.quantiles[75] - self.quantiles[25])
+
+	def __len__(self):
+		return len(self.count)
+
+	def quantile(self, q: float) -> np.ndarray:
+		"""
+		:param q: percent, one of QUARTILES or the quantiles given to the constructor
+		:return: q-th percentile of every window
+		"""
+		return self.quantiles[q]
+
+	def as_dict(self) -> Dict[str, np.ndarray]:
+		"""
+		:return: {'count', 'mean', 'var', 'median', 'quartile_deviation', 'p<q>'...}
+		"""
+		result = {'count': self.count, 'mean': self.mean, 'var': self.var, 'median': self.median,
+				  'quartile_deviation': self.quartile_deviation}
+		for q in sorted(self.quantiles):
+			result['p%g' % q] = self.quantiles[q]
+		return result
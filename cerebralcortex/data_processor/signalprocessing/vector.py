@@ -22,58 +22,109 @@
 # OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 import datetime
-from typing import List
+from typing import List, Tuple
 
 import numpy as np
 from numpy.linalg import norm
 from sklearn import preprocessing
 
+from cerebralcortex.kernel.datatypes.columnardata import ColumnarData
 from cerebralcortex.kernel.datatypes.datapoint import DataPoint
 from cerebralcortex.kernel.datatypes.datastream import DataStream
 
 
+def _samples(data) -> np.ndarray:
+	"""
+	Sample matrix of a List[DataPoint] or ColumnarData, one row per point
+	"""
+	if isinstance(data, ColumnarData):
+		return data.samples
+	return np.array([i.sample for i in data])
+
+
 def normalize(datastream: DataStream) -> DataStream:
 	"""
+	Scale every channel of a multi-channel stream to unit L2 norm, as one matrix operation
 
-	:param datastream:
-	:return:
+	:param datastream: List[DataPoint] with vector samples or ColumnarData with N x channels samples
+	:return: DataStream, ColumnarData for ColumnarData input
 	"""
 	result = DataStream.from_datastream(input_streams=[datastream])
 	if datastream.data is None or len(datastream.data) == 0:
 		result.data = []
 		return result
 
-	input_data = np.array([i.sample for i in datastream.data])
+	data = preprocessing.normalize(_samples(datastream.data), axis=0)
 
-	data = preprocessing.normalize(input_data, axis=0)
-
-	result.data = [DataPoint.from_tuple(start_time=v.start_time, sample=data[i])
-				   for i, v in enumerate(datastream.data)]
+	if isinstance(datastream.data, ColumnarData):
+		result.data = ColumnarData(datastream.data.start_times, data, time_zone=datastream.data.time_zone)
+	else:
+		result.data = [DataPoint.from_tuple(start_time=v.start_time, sample=data[i])
+					   for i, v in enumerate(datastream.data)]
 
 	return result
 
 
 def magnitude(datastream: DataStream) -> DataStream:
 	"""
+	Euclidean norm of the samples of a multi-channel stream, as one matrix operation
 
-	:param datastream:
-	:return:
+	:param datastream: List[DataPoint] with vector samples or ColumnarData with N x channels samples
+	:return: DataStream with scalar samples, ColumnarData for ColumnarData input
 	"""
 	result = DataStream.from_datastream(input_streams=[datastream])
 	if datastream.data is None or len(datastream.data) == 0:
 		result.data = []
 		return result
 
-	input_data = np.array([i.sample for i in datastream.data])
-
-	data = norm(input_data, axis=1).tolist()
+	data = norm(_samples(datastream.data), axis=1)
 
-	result.data = [DataPoint.from_tuple(start_time=v.start_time, sample=data[i])
-				   for i, v in enumerate(datastream.data)]
+	if isinstance(datastream.data, ColumnarData):
+		result.data = ColumnarData(datastream.data.start_times, data, time_zone=datastream.data.time_zone)
+	else:
+		data = data.tolist()
+		result.data = [DataPoint.from_tuple(start_time=v.start_time, sample=data[i])
+					   for i, v in enumerate(datastream.data)]
 
 	return result
 
 
+def _prefix_sums(samples: np.ndarray) -> np.ndarray:
+	"""
+	Cumulative sums with a leading zero, so sum(samples[i:j]) == sums[j] - sums[i]. Integer samples are summed
+	exactly as int64, float samples are shifted by their mean first to keep the sums small.
+	"""
+	if np.issubdtype(samples.dtype, np.integer) or np.issubdtype(samples.dtype, np.bool_):
+		return np.concatenate(([0], np.cumsum(samples, dtype=np.int64)))
+	return np.concatenate(([0.0], np.cumsum(samples - samples.mean())))
+
+
+def smooth_array(samples: np.ndarray,
+				 span: int = 5) -> np.ndarray:
+	"""
+	Array version of smooth, in O(n) from prefix sums
+
+	:param samples: 1-D array
+	:param span: odd number of samples averaged around each sample
+	:return: smoothed samples, same length as samples
+	"""
+	samples = np.asarray(samples)
+	if span < 1 or span % 2 == 0:
+		raise ValueError('span must be a positive odd number')
+	if len(samples) < span:
+		raise ValueError('Smoothing needs at least span samples')
+
+	sums = _prefix_sums(samples)
+	shift = 0.0 if sums.dtype == np.int64 else samples.mean()
+	total = sums[-1]
+
+	sample_middle = (sums[span:] - sums[:-span]) / span + shift
+	divisor = np.arange(1, span - 1, 2)
+	sample_start = sums[1:span - 1:2] / divisor + shift
+	sample_end = ((total - sums[len(samples) - divisor]) / divisor)[::-1] + shift
+	return np.concatenate((sample_start, sample_middle, sample_end))
+
+
 def smooth(data: List[DataPoint],
 		   span: int = 5) -> List[DataPoint]:
 	"""
@@ -97,26 +148,35 @@ def smooth(data: List[DataPoint],
 		if data is None or len(data) == 0:
 			return []
 
-		sample = [i.sample for i in data]
-		sample_middle = np.convolve(sample, np.ones(span, dtype=int), 'valid') / span
-		divisor = np.arange(1, span - 1, 2)
-		sample_start = np.cumsum(sample[:span - 1])[::2] / divisor
-		sample_end = (np.cumsum(sample[:-span:-1])[::2] / divisor)[::-1]
-		sample_smooth = np.concatenate((sample_start, sample_middle, sample_end))
-
-		data_smooth = []
+		sample_smooth = smooth_array(np.array([i.sample for i in data]), span)
 
-		if len(sample_smooth) == len(data):
-			for i, item in enumerate(data):
-				dp = DataPoint.from_tuple(sample=sample_smooth[i], start_time=item.start_time, end_time=item.end_time)
-				data_smooth.append(dp)
-		else:
-			raise Exception("Smoothed data length does not match with original data length.")
-
-		return data_smooth
+		return [DataPoint.from_tuple(sample=sample, start_time=item.start_time, end_time=item.end_time)
+				for item, sample in zip(data, sample_smooth.tolist())]
 	except:
 		return []
 
+
+def moving_average_curve_array(samples: np.ndarray,
+							   window_length: int) -> np.ndarray:
+	"""
+	Array version of moving_average_curve, in O(n) from prefix sums
+
+	:param samples: 1-D array
+	:param window_length: samples on each side of the averaged sample
+	:return: means of samples[i - window_length:i + window_length + 1] for
+	window_length <= i < len(samples) - window_length - 1
+	"""
+	samples = np.asarray(samples)
+	span = 2 * window_length + 1
+	count = len(samples) - span
+	if count <= 0:
+		return np.empty(0)
+
+	sums = _prefix_sums(samples)
+	shift = 0.0 if sums.dtype == np.int64 else samples.mean()
+	return (sums[span:span + count] - sums[:count]) / span + shift
+
+
 def moving_average_curve(data: List[DataPoint],
 						 window_length: int) -> List[DataPoint]:
 	"""
@@ -129,13 +189,9 @@ def moving_average_curve(data: List[DataPoint],
 	if data is None or len(data) == 0:
 		return []
 
-	sample = [i.sample for i in data]
-	mac = []
-	for i in range(window_length, len(sample) - (window_length + 1)):
-		sample_avg = np.mean(sample[i - window_length:i + window_length + 1])
-		mac.append(DataPoint.from_tuple(sample=sample_avg, start_time=data[i].start_time, end_time=data[i].end_time))
-
-	return mac
+	sample_avg = moving_average_curve_array(np.array([i.sample for i in data]), window_length)
+	return [DataPoint.from_tuple(sample=sample, start_time=data[i].start_time, end_time=data[i].end_time)
+			for i, sample in enumerate(sample_avg.tolist(), window_length)]
 
 
 def window_std_dev(data: List[DataPoint],
@@ -152,3 +208,63 @@ def window_std_dev(data: List[DataPoint],
 
 	data_points = np.array([dp.sample for dp in data])
 	return DataPoint.from_tuple(window_start, np.std(data_points))
+
+
+def window_std_devs(windows: np.ndarray) -> np.ndarray:
+	"""
+	window_std_dev for many windows of the same length at once, e.g. from window_regular
+
+	:param windows: windows x samples array
+	:return: standard deviation of every window
+	"""
+	windows = np.asarray(windows)
+	if windows.ndim < 2 or windows.shape[1] < 2:
+		raise Exception('Standard deviation requires at least 2 values to compute')
+
+	return np.std(windows, axis=1)
+
+
+def segment_statistics(values: np.ndarray,
+					   firsts: np.ndarray,
+					   ends: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+	"""
+	Mean, standard deviation, minimum and maximum of the segments values[firsts[k]:ends[k]] of a stream, computed
+	with one np.ufunc.reduceat call per statistic over all segments. Segments may overlap or leave gaps, e.g. the
+	index ranges of window_bounds or WindowPlan.bucket. Statistics of empty segments are nan.
+
+	:param values: 1-D array of samples
+	:param firsts: first index of every segment
+	:param ends: end index of every segment, each segment ends at the next first (the last at len(values)) when None
+	:return: (mean, std, minimum, maximum) arrays with one value per segment
+	"""
+	values = np.asarray(values, dtype=np.float64)
+	firsts = np.asarray(firsts, dtype=np.int64)
+	if ends is None:
+		ends = np.append(firsts[1:], len(values))
+	ends = np.maximum(np.asarray(ends, dtype=np.int64), firsts)
+	if len(firsts) == 0:
+		empty = np.empty(0)
+		return empty, empty, empty, empty
+
+	counts = ends - firsts
+	nonempty = counts > 0
+	divisor = np.where(nonempty, counts, 1)
+
+	# reduceat over [first_0, end_0, first_1, end_1, ...], the odd results span the gaps between segments. The
+	# padding keeps an end at len(values) a valid index.
+	indices = np.empty(2 * len(firsts), dtype=np.int64)
+	indices[0::2] = firsts
+	indices[1::2] = ends
+
+	def reduce(ufunc, array):
+		return ufunc.reduceat(np.append(array, 0.0), indices)[0::2]
+
+	# Shift by the overall mean so the sums of squares keep their precision
+	shift = values.mean() if len(values) > 0 else 0.0
+	centered = values - shift
+	mean = reduce(np.add, centered) / divisor
+	variance = np.maximum(reduce(np.add, centered * centered) / divisor - mean * mean, 0.0)
+
+	missing = np.where(nonempty, 0.0, np.nan)
+	return (mean + shift + missing, np.sqrt(variance) + missing, reduce(np.minimum, values) + missing,
+			reduce(np.maximum, values) + missing)
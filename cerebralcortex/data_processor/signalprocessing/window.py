@@ -22,39 +22,58 @@
 # OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
-import math
-from collections import OrderedDict
-from datetime import datetime, timedelta
-from typing import List
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta, tzinfo
+from typing import Dict, Iterable, Iterator, List, Tuple
 
-import pytz
 from pprint import pprint
 import numpy as np
 
+from cerebralcortex.kernel.datatypes.columnardata import ColumnarData, datetime_to_epoch_us, epoch_us_to_datetime
 from cerebralcortex.kernel.datatypes.datapoint import DataPoint
+from cerebralcortex.kernel.datatypes.regularsignal import RegularSignal
+
+def epoch_align_us(timestamps,
+				   offset: float,
+				   after: bool = False,
+				   time_base: int = 1e6):
+	"""
+	Epoch alignment of int64 epoch microsecond timestamps, a single value or a whole array at once. Timestamps are
+	floored to a multiple of offset since the epoch, independent of any timezone.
+
+	:param timestamps: int or np.ndarray of epoch microseconds
+	:param offset: seconds as a float
+	:param after: Flag designating if the result should be after the timestamps
+	:param time_base: resolution of the offset (1e6 -> microseconds)
+	:return: aligned epoch microseconds, int for a single timestamp
+	"""
+	offset_us = int(round(offset * time_base)) * int(round(1e6 / time_base))
+	aligned = np.floor_divide(timestamps, offset_us) * offset_us
+	if after:
+		aligned = aligned + offset_us
+
+	if np.ndim(aligned) == 0:
+		return int(aligned)
+	return aligned
+
 
 def epoch_align(ts: datetime,
 				offset: float,
 				after: bool = False,
-				time_zone: pytz = pytz.timezone('US/Central'),
+				time_zone: tzinfo = None,
 				time_base: int = 1e6) -> datetime:
 	"""
 	Epoch timestamp alignment based on offset
 
-	:param time_zone: Specifiy the timezone of the timestamps, default US/Central
+	:param time_zone: timezone of the result, the timezone of ts when None
 	:param ts: datatime object representing the timestamp to start with
 	:param offset: seconds as a float
 	:param after: Flag designating if the result should be after ts
-	:param time_base: specifies the precision with which the time base should be manipulated (1e6 -> microseconds)
+	:param time_base: resolution of the offset (1e6 -> microseconds)
 	:return: aligned datetime object
 	"""
-	new_timestamp = math.floor(ts.timestamp() * time_base / (offset * time_base)) * offset * time_base
-
-	if after:
-		new_timestamp += offset * time_base
-
-	result = datetime.fromtimestamp(new_timestamp / time_base, time_zone)
-	return result
+	aligned = epoch_align_us(datetime_to_epoch_us(ts), offset, after, time_base)
+	return epoch_us_to_datetime(aligned, time_zone or ts.tzinfo)
 
 
 def window(data: List[DataPoint],
@@ -95,54 +114,310 @@ def window_sliding(data: List[DataPoint],
 
 	return windowed_datastream
 
+def _timestamps(data) -> np.ndarray:
+	"""
+	int64 epoch microsecond start times of a List[DataPoint], ColumnarData or RegularSignal
+	"""
+	if isinstance(data, (ColumnarData, RegularSignal)):
+		return data.start_times
+	return np.fromiter((datetime_to_epoch_us(dp.start_time) for dp in data), dtype=np.int64, count=len(data))
+
+
+def _time_zone(data) -> tzinfo:
+	"""
+	Timezone used to present window times of non-empty List[DataPoint], ColumnarData or RegularSignal
+	"""
+	if isinstance(data, (ColumnarData, RegularSignal)):
+		return data.time_zone
+	return data[0].start_time.tzinfo
+
+
+def window_bounds(data: List[DataPoint],
+				  window_size: float,
+				  window_offset: float,
+				  batch_size: int = 4096) -> Iterator[Tuple[Tuple[datetime, datetime], int, int]]:
+	"""
+	Window boundaries of sorted data as index ranges. A window (st, et] holds the points with st < start_time <= et
+	that were not already part of the previous window, so with window_offset < window_size a window only adds the
+	points after the previous window's end. Windows start at the epoch aligned first timestamp and advance by
+	window_offset; when a window is empty the next one starts at the epoch aligned first timestamp after it, so gaps
+	in the data are skipped. Boundaries are found with binary searches over int64 timestamps, a batch of windows
+	at a time.
+
+	:param data: List[DataPoint] or ColumnarData sorted by start_time
+	:param window_size: seconds
+	:param window_offset: seconds
+	:param batch_size: windows searched per numpy call
+	:return: iterator of ((st, et), first index, end index) with data[first:end] inside the window
+	"""
+	if len(data) == 0:
+		return
+
+	times = _timestamps(data)
+	final_time = times[-1]
+	window_size_delta = timedelta(seconds=window_size)
+	window_offset_delta = timedelta(seconds=window_offset)
+	size_us = window_size_delta // timedelta(microseconds=1)
+	offset_us = window_offset_delta // timedelta(microseconds=1)
+
+	time_zone = _time_zone(data)
+	start_us = epoch_align_us(int(times[0]), window_offset)
+	start_time = epoch_us_to_datetime(start_us, time_zone)
+	consumed = 0
+
+	while start_us < final_time:
+		count = min(batch_size, -(-(int(final_time) - start_us) // offset_us))
+		starts = start_us + np.arange(count, dtype=np.int64) * offset_us
+		firsts = np.searchsorted(times, starts, side='right')
+		ends = np.searchsorted(times, starts + size_us, side='right')
+
+		# Points up to the end of the previous window are consumed by it
+		taken = np.where(ends < len(times), ends, consumed)
+		previous = np.maximum.accumulate(np.concatenate(([consumed], taken[:-1])))
+		firsts = np.maximum(firsts, previous)
+
+		empty = np.flatnonzero(ends <= firsts)
+		filled = count if len(empty) == 0 else int(empty[0])
+
+		for k in range(filled):
+			st = start_time + k * window_offset_delta
+			yield (st, st + window_size_delta), int(firsts[k]), int(ends[k])
+
+		if filled > 0:
+			consumed = max(int(previous[filled - 1]), int(taken[filled - 1]))
+
+		current = start_us + filled * offset_us
+		if filled < count:
+			# Skip ahead to the window of the first point after the empty one
+			consumed = max(consumed, int(ends[filled]))
+			skipped = epoch_align_us(int(times[consumed]), window_offset)
+			start_us = skipped if skipped > current else current + offset_us
+		else:
+			start_us = current
+		start_time = epoch_us_to_datetime(start_us, time_zone)
+
+
 def window_iter(iterable: List[DataPoint],
 				window_size: float,
 				window_offset: float):
 	"""
 	Window iteration function that support various common implementations
-	:param iterable:
+	:param iterable: List[DataPoint] or ColumnarData sorted by start_time
 	:param window_size:
 	:param window_offset:
+	:return: iterator of ((st, et), window data), lists for List[DataPoint] input and views for ColumnarData
 	"""
+	for key, first, end in window_bounds(iterable, window_size, window_offset):
+		yield key, iterable[first:end]
+
+def window_regular(samples: np.ndarray,
+				   window_length: int,
+				   window_step: int = None) -> np.ndarray:
+	"""
+	Fixed length windows of a regularly sampled signal (e.g. after timestamp_correct) as a strided view, so per
+	window checks can be one numpy reduction along axis 1 over the whole recording. Nothing is copied; the view is
+	read only. Samples after the last complete window are left out.
+
+	:param samples: array of samples, one row per sample for multi-channel signals
+	:param window_length: samples per window
+	:param window_step: samples between window starts, window_length (non-overlapping windows) when None
+	:return: windows x window_length (x channels) view, window k starts at sample k * window_step
+	"""
+	samples = np.asarray(samples)
+	window_step = window_step or window_length
+	if window_length <= 0 or window_step <= 0:
+		raise ValueError('window_length and window_step must be positive')
+	if len(samples) < window_length:
+		return np.empty((0, window_length) + samples.shape[1:], dtype=samples.dtype)
+
+	count = (len(samples) - window_length) // window_step + 1
+	return np.lib.stride_tricks.as_strided(samples,
+										   shape=(count, window_length) + samples.shape[1:],
+										   strides=(samples.strides[0] * window_step,) + samples.strides,
+										   writeable=False)
 
-	start_time = epoch_align(iterable[0].start_time, window_offset)
-	final_time = iterable[-1].start_time
-	window_size_delta = timedelta(seconds=window_size)
-	window_offset_delta = timedelta(seconds=window_offset)
- 	
-	while start_time < final_time:
-		end_time = start_time + window_size_delta
-		key = (start_time, end_time)
-		
-		data = []
-		num_data = len(iterable)
-		for i in range(num_data):
-			if iterable[i].start_time > end_time:
-				iterable = iterable[i:]
-				break
-			elif iterable[i].start_time > start_time:
-				data.append(iterable[i])
 
+class WindowPlan:
+	def __init__(self,
+				 start_time: datetime,
+				 end_time: datetime,
+				 window_size: float,
+				 window_offset: float):
+		"""
+		Regular grid of windows (st, st + window_size] with st = epoch_align(start_time) + k * window_offset for
+		every st < end_time. The plan is computed once and shared by all streams on the same timeline: each stream
+		is bucketed against it with binary searches, and the results of different streams are indexed by the same
+		window number, so they can be joined without building dictionaries keyed by datetime tuples.
+
+		:param start_time: first timestamp to cover
+		:param end_time: last timestamp to cover
+		:param window_size: seconds
+		:param window_offset: seconds
+		"""
+		self.window_size = window_size
+		self.window_offset = window_offset
+		self._size_delta = timedelta(seconds=window_size)
+		self._offset_delta = timedelta(seconds=window_offset)
+		self._first = epoch_align(start_time, window_offset)
+
+		first_us = datetime_to_epoch_us(self._first)
+		offset_us = self._offset_delta // timedelta(microseconds=1)
+		count = max(0, -(-(datetime_to_epoch_us(end_time) - first_us) // offset_us))
+
+		self.starts = first_us + np.arange(count, dtype=np.int64) * offset_us
+		self.ends = self.starts + self._size_delta // timedelta(microseconds=1)
+
+	@classmethod
+	def from_data(cls, data: List[List[DataPoint]], window_size: float, window_offset: float):
+		"""
+		Plan covering the union of the time ranges of several sorted streams
+
+		:param data: list of List[DataPoint] or ColumnarData
+		:param window_size: seconds
+		:param window_offset: seconds
+		:return: WindowPlan
+		"""
+		data = [d for d in data if d is not None and len(d) > 0]
 		if len(data) == 0:
-			num_data = len(iterable)
-			for i in range(num_data):
-				if iterable[i].start_time > end_time:
-					start_time = iterable[i].start_time
-					start_time = epoch_align(start_time, window_offset)
-					iterable = iterable[i:]
-					break
-		else:
-			# slide window
-			start_time = start_time + window_offset_delta
-			'''
-			# check data length in window
-			data_start_time = np.datetime64(data[0].start_time).astype(np.int64)/10**6
-			data_end_time = np.datetime64(data[-1].start_time).astype(np.int64)/10**6
-			data_timedelta = data_end_time - data_start_time
-			if data_timedelta > window_size/2:
-				yield key, data
-			'''
-			yield key, data
+			raise ValueError('Cannot plan windows without data')
+		start_time = min((d[0].start_time for d in data), key=datetime_to_epoch_us)
+		end_time = max((d[-1].start_time for d in data), key=datetime_to_epoch_us)
+		return cls(start_time, end_time, window_size, window_offset)
+
+	def __len__(self):
+		return len(self.starts)
+
+	def key(self, index: int) -> Tuple[datetime, datetime]:
+		"""
+		:param index: window number
+		:return: (st, et) of the window, as used by window_sliding
+		"""
+		start_time = self._first + int(index) * self._offset_delta
+		return start_time, start_time + self._size_delta
+
+	def keys(self) -> List[Tuple[datetime, datetime]]:
+		return [self.key(i) for i in range(len(self))]
+
+	def bucket(self, data: List[DataPoint]) -> Tuple[np.ndarray, np.ndarray]:
+		"""
+		Index ranges of sorted data in every window of the plan, computed from the sampling grid for a
+		RegularSignal
+
+		:param data: List[DataPoint], ColumnarData or RegularSignal sorted by start_time
+		:return: (firsts, ends) such that data[firsts[k]:ends[k]] lies in window k
+		"""
+		if isinstance(data, RegularSignal):
+			return data.searchsorted(self.starts, side='right'), data.searchsorted(self.ends, side='right')
+		times = _timestamps(data)
+		return np.searchsorted(times, self.starts, side='right'), np.searchsorted(times, self.ends, side='right')
+
+	def split(self, data: List[DataPoint]) -> List:
+		"""
+		:param data: List[DataPoint], ColumnarData or RegularSignal sorted by start_time
+		:return: the data of every window, empty for windows without points
+		"""
+		firsts, ends = self.bucket(data)
+		return [data[first:end] for first, end in zip(firsts, ends)]
+
+
+class StreamingWindow:
+	def __init__(self,
+				 window_size: float,
+				 window_offset: float):
+		"""
+		Push based sliding windows for unbounded streams. Points are pushed in chunks as they arrive and every
+		window (st, st + window_size] is emitted as soon as a later point shows it is complete. Windows lie on the
+		grid of WindowPlan, starting at the epoch aligned first timestamp, and windows without points are not
+		emitted. Points at or before the current window start are evicted, so only the points of one window are
+		held in memory. Points must arrive sorted by start_time; late points before the current window are dropped.
+
+		:param window_size: seconds
+		:param window_offset: seconds
+		"""
+		self.window_size = window_size
+		self.window_offset = window_offset
+		self._size_delta = timedelta(seconds=window_size)
+		self._offset_delta = timedelta(seconds=window_offset)
+		self._size_us = self._size_delta // timedelta(microseconds=1)
+		self._offset_us = self._offset_delta // timedelta(microseconds=1)
+
+		self._start_time = None
+		self._start_us = None
+		self._buffer = deque()
+		self._times = deque()
+
+	def __len__(self):
+		"""
+		:return: number of buffered points
+		"""
+		return len(self._buffer)
+
+	def _advance(self, windows: int):
+		self._start_time += windows * self._offset_delta
+		self._start_us += windows * self._offset_us
+		while len(self._times) > 0 and self._times[0] <= self._start_us:
+			self._times.popleft()
+			self._buffer.popleft()
+
+	def _emit(self) -> Tuple[Tuple[datetime, datetime], List[DataPoint]]:
+		return (self._start_time, self._start_time + self._size_delta), list(self._buffer)
+
+	def push(self, points: Iterable[DataPoint]) -> List[Tuple[Tuple[datetime, datetime], List[DataPoint]]]:
+		"""
+		:param points: next chunk of the stream, List[DataPoint] or ColumnarData
+		:return: windows completed by the chunk as [((st, et), [dp, dp, ...]), ...]
+		"""
+		completed = []
+		for dp, ts in zip(points, _timestamps(points)):
+			ts = int(ts)
+			if self._start_time is None:
+				self._start_us = epoch_align_us(ts, self.window_offset)
+				self._start_time = epoch_us_to_datetime(self._start_us, dp.start_time.tzinfo)
+
+			while ts > self._start_us + self._size_us:
+				if len(self._buffer) > 0:
+					completed.append(self._emit())
+				self._advance(1)
+				if len(self._buffer) == 0:
+					# Skip the empty windows of a gap, up to the first window that can hold the point
+					skipped = -(-(ts - self._size_us - self._start_us) // self._offset_us)
+					if skipped > 0:
+						self._advance(skipped)
+
+			if ts > self._start_us:
+				self._buffer.append(dp)
+				self._times.append(ts)
+		return completed
+
+	def flush(self) -> List[Tuple[Tuple[datetime, datetime], List[DataPoint]]]:
+		"""
+		Emit the windows still holding buffered points, at the end of the stream
+
+		:return: [((st, et), [dp, dp, ...]), ...]
+		"""
+		completed = []
+		while len(self._buffer) > 0:
+			completed.append(self._emit())
+			self._advance(1)
+		return completed
+
+
+def window_stream(chunks: Iterable[List[DataPoint]],
+				  window_size: float,
+				  window_offset: float) -> Iterator[Tuple[Tuple[datetime, datetime], List[DataPoint]]]:
+	"""
+	Generator form of StreamingWindow
+
+	:param chunks: iterable of sorted chunks of one stream, e.g. from a socket or a chunked file reader
+	:param window_size: seconds
+	:param window_offset: seconds
+	:return: iterator of ((st, et), [dp, dp, ...]) as windows complete
+	"""
+	windows = StreamingWindow(window_size, window_offset)
+	for chunk in chunks:
+		yield from windows.push(chunk)
+	yield from windows.flush()
+
 
 def window_sliding_multi(data,
 				   window_size: float,
@@ -166,105 +441,104 @@ def window_sliding_multi(data,
 
 	return windowed_datastream
 
-def window_iter_multi(iterable_dict,
-				window_size: float,
-				window_offset: float):
-	"""
-	Window iteration function that support various common implementations
-	:param iterable:
-	:param window_size:
-	:param window_offset:
+def window_iter_aligned(streams: Dict[str, List[DataPoint]],
+						window_size: float,
+						window_offset: float,
+						coverage: Dict[str, float] = None,
+						paired: Dict[str, str] = None,
+						batch_size: int = 4096):
 	"""
+	Windows (st, et] shared by several named streams. Every window holds the points of each stream with
+	st < start_time <= et. Windows start at the epoch aligned earliest timestamp and advance by window_offset.
+	When any stream has no points in a window, the next window starts at the epoch aligned earliest timestamp after
+	it among the streams. Boundaries are found with binary searches per stream, a batch of windows at a time.
 
-	peak = iterable_dict['peak']
-	valley = iterable_dict['valley']
-	rr_intervals = iterable_dict['rr_intervals']
+	:param streams: {name: List[DataPoint] or ColumnarData sorted by start_time}
+	:param window_size: seconds
+	:param window_offset: seconds
+	:param coverage: {name: seconds}, only yield windows where the stream's points span more than this
+	:param paired: {name: reference name}, the stream is indexed like its reference (e.g. the peak following each
+	valley) instead of by its own timestamps
+	:param batch_size: windows searched per numpy call
+	:return: iterator of ((st, et), {name: window data})
+	"""
+	coverage = coverage or {}
+	paired = paired or {}
+	if len(streams) == 0 or any(data is None or len(data) == 0 for data in streams.values()):
+		return
 
-	start_time = np.min([valley[0].start_time, rr_intervals[0].start_time])
-	final_time = np.max([valley[-1].start_time, rr_intervals[-1].start_time])
+	timed = [name for name in streams if name not in paired]
+	times = {name: _timestamps(streams[name]) for name in set(timed) | set(coverage)}
 
-	start_time = epoch_align(start_time, window_offset)
 	window_size_delta = timedelta(seconds=window_size)
 	window_offset_delta = timedelta(seconds=window_offset)
+	size_us = window_size_delta // timedelta(microseconds=1)
+	offset_us = window_offset_delta // timedelta(microseconds=1)
+
+	time_zone = _time_zone(streams[timed[0]])
+	start_us = epoch_align_us(min(int(times[name][0]) for name in timed), window_offset)
+	start_time = epoch_us_to_datetime(start_us, time_zone)
+	final_time = max(int(times[name][-1]) for name in timed)
+
+	while start_us < final_time:
+		count = min(batch_size, -(-(final_time - start_us) // offset_us))
+		starts = start_us + np.arange(count, dtype=np.int64) * offset_us
+
+		firsts = {}
+		ends = {}
+		for name in timed:
+			firsts[name] = np.searchsorted(times[name], starts, side='right')
+			ends[name] = np.searchsorted(times[name], starts + size_us, side='right')
+		for name, reference in paired.items():
+			firsts[name] = firsts[reference]
+			ends[name] = np.minimum(ends[reference], len(streams[name]))
+
+		empty = np.zeros(count, dtype=bool)
+		for name in streams:
+			empty |= ends[name] <= firsts[name]
+
+		covered = ~empty
+		for name, span in coverage.items():
+			last = len(times[name]) - 1
+			first_time = times[name][np.minimum(firsts[name], last)]
+			last_time = times[name][np.clip(ends[name] - 1, 0, last)]
+			covered &= (last_time - first_time) / 1e6 > span
 
-	while start_time < final_time:
-		end_time = start_time + window_size_delta
-		key = (start_time, end_time)
-		#print (start_time, end_time)
-
-		data = {}
-		# valley -> peak
-		data['valley'] = []
-		data['peak'] = []
-		num_data = len(valley)
-		for i in range(num_data):
-			if valley[i].start_time > end_time:
-				break
-			elif valley[i].start_time > start_time:
-				data['valley'].append(valley[i])
-				data['peak'].append(peak[i]) 
-		# rr_intervals
-		data['rr_intervals'] = []
-		num_data = len(rr_intervals)
-		for i in range(num_data):
-			if rr_intervals[i].start_time > end_time:
-				break
-			elif rr_intervals[i].start_time > start_time:
-				data['rr_intervals'].append(rr_intervals[i])
-				
-		# slide window
-		start_time = start_time + window_offset_delta
-				
-		# cut off unnecessary previous time
-		# RIP
-		num_data = len(valley)
-		i_start = 0
-		for i in range(num_data):
-			if valley[i].start_time < start_time:
-				i_start += 1
-			else:
-				break
-		valley = valley[i_start:]
-		peak = peak[i_start:]
-		# ECG
-		num_data = len(rr_intervals)
-		i_start = 0
-		for i in range(num_data):
-			if rr_intervals[i].start_time < start_time:
-				i_start += 1
-			else:
-				break
-		rr_intervals = rr_intervals[i_start:]
-		
-		# If have to skip to far future
-		# Among RIP & ECG
-		# find closest point from current end_time
-		# choose further part as start_time
-		if len(data['peak']) == 0 or len(data['valley']) == 0 or len(data['rr_intervals']) == 0:
-			# valley -> peak
-			num_data = len(valley)
-			start_time_rip = start_time
-			for i in range(num_data):
-				if valley[i].start_time > end_time:
-					start_time_rip = valley[i].start_time
-					break
-			# rr_intervals
-			num_data = len(rr_intervals)
-			start_time_rr = start_time
-			for i in range(num_data):
-				if rr_intervals[i].start_time > end_time:
-					start_time_rr = rr_intervals[i].start_time
-					break
-			start_time = np.min([start_time_rip, start_time_rr])
-			start_time = epoch_align(start_time, window_offset)
+		empty_windows = np.flatnonzero(empty)
+		filled = count if len(empty_windows) == 0 else int(empty_windows[0])
+
+		for k in np.flatnonzero(covered[:filled]):
+			st = start_time + int(k) * window_offset_delta
+			yield (st, st + window_size_delta), {name: streams[name][firsts[name][k]:ends[name][k]]
+												 for name in streams}
+
+		current = start_us + filled * offset_us
+		if filled < count:
+			# Skip ahead to the window of the earliest point after the empty one, streams without later points
+			# only allow the next regular window
+			following = [int(times[name][ends[name][filled]]) if ends[name][filled] < len(times[name])
+						 else current + offset_us for name in timed]
+			skipped = epoch_align_us(min(following), window_offset)
+			start_us = skipped if skipped > current else current + offset_us
 		else:
-			# check data length in window
-			#data_start_time = np.max([data['peak'][0].start_time, data['valley'][0].start_time, data['rr_intervals'][0].start_time])
-			data_start_time = data['rr_intervals'][0].start_time
-			data_start_time = np.datetime64(data_start_time).astype(np.int64)/10**6
-			#data_end_time = np.min([data['peak'][-1].start_time, data['valley'][-1].start_time, data['rr_intervals'][-1].start_time])
-			data_end_time = data['rr_intervals'][-1].start_time
-			data_end_time = np.datetime64(data_end_time).astype(np.int64)/10**6
-			data_timedelta = data_end_time - data_start_time
-			if data_timedelta > window_size/2:
-				yield key, data
+			start_us = current
+		start_time = epoch_us_to_datetime(start_us, time_zone)
+
+
+def window_iter_multi(iterable_dict,
+				window_size: float,
+				window_offset: float):
+	"""
+	Windows over paired RIP peaks and valleys and RR intervals, keeping the windows whose RR intervals span more
+	than half of the window
+	:param iterable_dict: {'peak': List[DataPoint], 'valley': List[DataPoint], 'rr_intervals': List[DataPoint]}
+	:param window_size:
+	:param window_offset:
+	"""
+	streams = OrderedDict([('valley', iterable_dict['valley']),
+						   ('peak', iterable_dict['peak']),
+						   ('rr_intervals', iterable_dict['rr_intervals'])])
+
+	return window_iter_aligned(streams, window_size, window_offset,
+							   coverage={'rr_intervals': window_size / 2},
+							   paired={'peak': 'valley'})
@@ -28,11 +28,13 @@ import os
 import unittest
 from random import random
 
+import numpy as np
 import pytz
 
 from cerebralcortex.data_processor.signalprocessing.accelerometer import accelerometer_features
 from cerebralcortex.data_processor.signalprocessing.alignment import autosense_sequence_align
-from cerebralcortex.data_processor.signalprocessing.vector import window_std_dev
+from cerebralcortex.data_processor.signalprocessing.vector import window_std_dev, window_std_devs, segment_statistics
+from cerebralcortex.data_processor.signalprocessing.window import window_regular, window_sliding, window_bounds
 from cerebralcortex.kernel.datatypes.datapoint import DataPoint
 from cerebralcortex.kernel.datatypes.datastream import DataStream
 
@@ -105,6 +107,56 @@ class TestAccelerometer(unittest.TestCase):
         ts = datetime.datetime.now(tz=pytz.timezone('US/Central'))
         self.assertRaises(Exception, window_std_dev, [DataPoint.from_tuple(ts, 10)], ts)
 
+    def test_window_std_devs(self):
+        ts = datetime.datetime.now(tz=pytz.timezone('US/Central'))
+        samples = np.array([dp.sample for dp in self.accelx])
+        devs = window_std_devs(window_regular(samples, window_length=64))
+        self.assertEqual(len(devs), len(samples) // 64)
+        for index in [0, 10, len(devs) - 1]:
+            window = self.accelx[index * 64:(index + 1) * 64]
+            self.assertAlmostEqual(devs[index], window_std_dev(window, ts).sample, delta=1e-9)
+
+        self.assertRaises(Exception, window_std_devs, np.zeros((5, 1)))
+
+    def test_segment_statistics(self):
+        ts = datetime.datetime.now(tz=pytz.timezone('US/Central'))
+        samples = np.array([dp.sample for dp in self.accelx])
+        bounds = list(window_bounds(self.accelx, 10.0, 10.0))
+        firsts = np.array([first for _, first, _ in bounds])
+        ends = np.array([end for _, _, end in bounds])
+
+        mean, std, minimum, maximum = segment_statistics(samples, firsts, ends)
+        self.assertEqual(len(std), len(bounds))
+        for index, (key, window) in enumerate(window_sliding(self.accelx, 10.0, 10.0).items()):
+            values = [dp.sample for dp in window]
+            self.assertAlmostEqual(std[index], window_std_dev(window, key[0]).sample, delta=1e-9)
+            self.assertAlmostEqual(mean[index], np.mean(values), delta=1e-9)
+            self.assertEqual(minimum[index], min(values))
+            self.assertEqual(maximum[index], max(values))
+
+        # Offsets only, overlapping and empty segments
+        mean, std, minimum, maximum = segment_statistics([1.0, 2.0, 3.0, 4.0], [0, 2, 2])
+        self.assertEqual(mean[0], 1.5)
+        self.assertTrue(np.isnan(std[1]))
+        self.assertEqual(maximum[2], 4.0)
+        mean, _, _, _ = segment_statistics([1.0, 2.0, 3.0, 4.0], [0, 1], [3, 4])
+        self.assertEqual(mean.tolist(), [2.0, 3.0])
+
+    def test_accelerometer_features_columns(self):
+        count = min(len(self.accelx), len(self.accely), len(self.accelz))
+        ds = DataStream(None, None)
+        ds.data = [DataPoint.from_tuple(self.accelx[i].start_time,
+                                        [self.accelx[i].sample, self.accely[i].sample, self.accelz[i].sample])
+                   for i in range(count)]
+
+        accelerometer_magnitude, accelerometer_win_mag_deviations, accel_activity = accelerometer_features(ds)
+        windows = window_sliding(accelerometer_magnitude.data, 10.0, 10.0)
+        self.assertEqual([dp.start_time for dp in accelerometer_win_mag_deviations.data],
+                         [key[0] for key in windows.keys()])
+        for dp, (key, window) in zip(accelerometer_win_mag_deviations.data, windows.items()):
+            self.assertAlmostEqual(dp.sample, window_std_dev(window, key[0]).sample, delta=1e-9)
+        self.assertEqual(len(accel_activity.data), len(windows))
+
     def test_accelerometer_features(self):
         ds = autosense_sequence_align([self.accelx_ds, self.accely_ds, self.accelz_ds], self.sampling_frequency)
 
@@ -27,9 +27,13 @@ import gzip
 import os
 import unittest
 
+import numpy as np
 import pytz
+from scipy.interpolate import pchip
 
-from cerebralcortex.data_processor.signalprocessing.alignment import interpolate_gaps, timestamp_correct
+from cerebralcortex.data_processor.signalprocessing.alignment import ClockCorrection, _dtw_correct, frange, \
+	frange_array, interpolate_gaps, timestamp_correct
+from cerebralcortex.kernel.datatypes.columnardata import ColumnarData, as_columnar, seconds_to_epoch_us, stack
 from cerebralcortex.kernel.datatypes.datapoint import DataPoint
 from cerebralcortex.kernel.datatypes.datastream import DataStream
 
@@ -37,6 +41,97 @@ from cerebralcortex.data_processor.signalprocessing.window import window_iter
 
 import time
 
+
+def reference_interpolate_gaps(data, sampling_frequency, interpolation_gap_multiplier=10.0):
+	"""
+	Point by point implementation interpolate_gaps is regression tested against
+	"""
+	sampling_interval = 1.0 / sampling_frequency
+	max_interpolation_gap = sampling_interval * interpolation_gap_multiplier
+
+	time_deltas = np.diff([dp.start_time for dp in data])
+
+	gap_points = []
+	low_limit = datetime.timedelta(seconds=2 * sampling_interval)
+	high_limit = datetime.timedelta(seconds=max_interpolation_gap)
+	for index, value in enumerate(time_deltas):
+		if low_limit <= value <= high_limit:
+			gap_points.append((data[index], value))
+
+	if len(gap_points) == 0:
+		return data
+
+	gap_index = 0
+	in_gap = False
+	gap_data = []
+	low_time = gap_points[gap_index][0].start_time - datetime.timedelta(seconds=max_interpolation_gap)
+	high_time = gap_points[gap_index][0].start_time + datetime.timedelta(seconds=max_interpolation_gap)
+
+	current_timezone = data[0].start_time.tzinfo
+	new_datapoints = []
+	for dp in data:
+		if low_time <= dp.start_time <= high_time:
+			in_gap = True
+			gap_data.append(dp)
+		elif in_gap:
+			in_gap = False
+
+			fix_start = gap_points[gap_index][0].start_time.timestamp()
+			fix_end = fix_start + gap_points[gap_index][1].total_seconds()
+
+			x = np.array([dp.start_time.timestamp() for dp in gap_data])
+			y = np.array([dp.sample for dp in gap_data])
+			interpolated_signal = pchip(x, y)
+
+			new_x = [i for i in frange(fix_start + sampling_interval, fix_end, sampling_interval)]
+			new_y = interpolated_signal(new_x)
+
+			for i, value in enumerate(new_y):
+				new_datapoints.append(
+					DataPoint.from_tuple(datetime.datetime.fromtimestamp(new_x[i], tz=current_timezone), value))
+
+			gap_index += 1
+			if gap_index == len(gap_points):
+				break
+			low_time = gap_points[gap_index][0].start_time - datetime.timedelta(seconds=max_interpolation_gap)
+			high_time = gap_points[gap_index][0].start_time + datetime.timedelta(seconds=max_interpolation_gap)
+
+			gap_data = [dp for dp in gap_data if low_time <= dp.start_time <= high_time]
+
+	result = []
+	index = 0
+	for dp in data:
+		while index < len(new_datapoints) and dp.start_time > new_datapoints[index].start_time:
+			result.append(new_datapoints[index])
+			index += 1
+
+		result.append(dp)
+
+	return result
+
+
+def synthetic_timestamps(sampling_frequency, drift, latency, stall, count=20000):
+	"""
+	Arrival times of a sensor whose clock runs drift faster than nominal, with exponentially distributed
+	transmission latency, a stall every 1000 samples and 20 lost samples
+
+	:return: true sample times in seconds from the first sample, observed int64 epoch microseconds
+	"""
+	random = np.random.RandomState(0)
+	index = np.delete(np.arange(count), np.arange(5000, 5020))
+	true_times = index / (sampling_frequency * (1.0 + drift))
+
+	delay = random.exponential(latency, len(index))
+	for stall_start in range(700, len(index), 1000):
+		delay[stall_start:stall_start + 20] += np.maximum(0, stall - np.arange(20) / sampling_frequency)
+
+	# Arrival order is preserved
+	positions = np.arange(len(index))
+	observed = 1484929672918273 + np.round((true_times + delay) * 1e6).astype(np.int64)
+	observed = np.maximum.accumulate(observed - positions) + positions
+	return true_times - true_times[0], observed
+
+
 class TestAlignment(unittest.TestCase):
 	@classmethod
 	def setUpClass(cls):
@@ -75,12 +170,98 @@ class TestAlignment(unittest.TestCase):
 		self.assertEqual(len(self.accelx.data), 63598)
 		self.assertEqual(len(result), 65964)
 
+	def test_interpolate_gaps_reference(self):
+		for ds in [self.accelx, self.accely, self.accelz]:
+			expected = reference_interpolate_gaps(ds.data, self.sample_rate)
+			result = interpolate_gaps(ds.data, self.sample_rate)
+
+			self.assertIsInstance(result, ColumnarData)
+			self.assertEqual(len(result), len(expected))
+			self.assertTrue(np.array_equal(result.start_times, as_columnar(expected).start_times))
+			self.assertTrue(np.array_equal(result.samples, np.array([dp.sample for dp in expected], dtype=float)))
+
+	def test_interpolate_gaps_channels(self):
+		accelx = as_columnar(self.accelx.data)
+		accel = stack([accelx, accelx[::-1]])
+
+		result = interpolate_gaps(accel, self.sample_rate)
+		self.assertEqual(result.samples.shape, (65964, 2))
+		self.assertTrue(np.array_equal(result.samples[:, 0], interpolate_gaps(accelx, self.sample_rate).samples))
+
+	def test_interpolate_gaps_no_gaps(self):
+		data = self.accelx.data[:9]
+		self.assertIs(interpolate_gaps(data, self.sample_rate), data)
+		self.assertEqual(interpolate_gaps([], self.sample_rate), [])
+
 	def test_timestamp_correct(self):
 		result = timestamp_correct(self.accelx, sampling_frequency=self.sample_rate)
 
 		self.assertEqual(len(self.accelx.data), 63598)
 		self.assertEqual(len(result.data), 70010)
 	
+	def test_frange_array(self):
+		for start, stop, step in [(1484929672.918273, 1484929674.1, 1.0 / 64), (0.0, 1.0, 0.1), (1.0, 0.5, 0.1)]:
+			self.assertListEqual(frange_array(start, stop, step).tolist(), list(frange(start, stop, step)))
+
+	def test_clock_correction(self):
+		true_times, observed = synthetic_timestamps(self.sample_rate, drift=0.003, latency=0.02, stall=0.4)
+
+		correction = ClockCorrection(observed, self.sample_rate)
+		self.assertEqual(correction.count, 19980)
+		self.assertAlmostEqual(correction.drift, 0.003, delta=1e-3)
+		self.assertLess(correction.jitter, 0.1)
+		self.assertLess(correction.max_shift, 1.0)
+		self.assertEqual(correction.as_dict()['count'], 19980)
+
+		offsets = (correction.corrected - observed[0]) / 1e6 * self.sample_rate
+		self.assertTrue(np.allclose(offsets, np.round(offsets), atol=1e-3))
+		self.assertTrue(np.all(np.diff(correction.corrected) >= 0))
+
+		error = (correction.corrected - observed[0]) / 1e6 - true_times
+		error = np.abs(error - np.median(error)) * self.sample_rate
+		self.assertLess(np.max(error), 1.5)
+
+	def test_timestamp_correct_linear(self):
+		corrections = []
+		result = timestamp_correct(self.accelx, sampling_frequency=self.sample_rate, method='linear',
+		                           corrections=corrections)
+
+		self.assertEqual(len(result.data), 70010)
+		self.assertEqual(len(corrections), 5)
+		self.assertEqual(sum(c.count for c in corrections), 70010)
+		for c in corrections:
+			self.assertAlmostEqual(c.drift, 0.003, delta=0.001)
+			self.assertLess(c.jitter, 0.5)
+
+		self.assertRaises(ValueError, timestamp_correct, self.accelx, self.sample_rate, method='spline')
+
+	def test_timestamp_correct_processes(self):
+		for method in ['dtw', 'linear']:
+			serial_corrections = []
+			serial = timestamp_correct(self.accelx, self.sample_rate, method=method, corrections=serial_corrections)
+
+			parallel_corrections = []
+			parallel = timestamp_correct(self.accelx, self.sample_rate, method=method,
+			                             corrections=parallel_corrections, processes=2)
+
+			self.assertTrue(np.array_equal(parallel.data.start_times, serial.data.start_times))
+			self.assertTrue(np.array_equal(parallel.data.samples, serial.data.samples))
+			self.assertEqual([c.as_dict() for c in parallel_corrections], [c.as_dict() for c in serial_corrections])
+
+	def test_compare_timestamp_correct_methods(self):
+		# Accuracy against the true sample times of a segment with drift, transmission latency and stalls
+		true_times, observed = synthetic_timestamps(self.sample_rate, drift=0.003, latency=0.05, stall=1.0)
+		corrections = [('dtw', seconds_to_epoch_us(_dtw_correct(observed / 1e6, self.sample_rate))),
+		               ('linear', ClockCorrection(observed, self.sample_rate).corrected)]
+
+		errors = {}
+		for method, corrected in corrections:
+			error = (corrected - observed[0]) / 1e6 - true_times
+			errors[method] = np.abs(error - np.median(error)) * self.sample_rate
+
+		self.assertLess(np.mean(errors['linear']), np.mean(errors['dtw']))
+		self.assertLess(np.percentile(errors['linear'], 99), np.percentile(errors['dtw'], 99))
+
 	def test_compare_running_time(self):
 		start_time_whole = time.time()
 		result = timestamp_correct(self.accelx, sampling_frequency=self.sample_rate)
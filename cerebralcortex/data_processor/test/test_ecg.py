@@ -32,7 +32,9 @@ import pytz
 
 from cerebralcortex.data_processor.signalprocessing.alignment import timestamp_correct
 from cerebralcortex.data_processor.signalprocessing.ecg import rr_interval_update, compute_moving_window_int, \
-	check_peak, compute_r_peaks, remove_close_peaks, confirm_peaks, compute_rr_intervals
+	check_peak, compute_r_peaks, remove_close_peaks, confirm_peaks, compute_rr_intervals, classify_ecg_window, \
+	classify_ecg_windows
+from cerebralcortex.data_processor.signalprocessing.window import window_regular
 from cerebralcortex.kernel.datatypes.datapoint import DataPoint
 from cerebralcortex.kernel.datatypes.datastream import DataStream
 
@@ -53,6 +55,16 @@ class TestRPeakDetect(unittest.TestCase):
 		cls.ecg_datastream.data = cls.ecg
 		print (len(cls.ecg_datastream.data))
 
+	def test_classify_ecg_windows(self):
+		samples = np.array([dp.sample for dp in self.ecg])
+		windows = window_regular(samples, window_length=128)
+		result = classify_ecg_windows(windows)
+		self.assertEqual(len(result), len(samples) // 128)
+		self.assertTrue(result.any())
+		self.assertFalse(result.all())
+		for index in range(0, len(result), 97):
+			self.assertEqual(result[index], classify_ecg_window(self.ecg[index * 128:(index + 1) * 128]))
+
 	def test_rr_interval_update(self):
 		rpeak_temp1 = [i for i in range(0, 100, 10)]
 		rr_ave = 4.5
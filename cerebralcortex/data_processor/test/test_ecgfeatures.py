@@ -27,11 +27,12 @@ import gzip
 import os
 import unittest
 
+import numpy as np
 import pytz
 
 from cerebralcortex.data_processor.feature.ecg import ecg_feature_computation, lomb, heart_rate_power
 from cerebralcortex.data_processor.signalprocessing.ecg import compute_rr_intervals
-from cerebralcortex.data_processor.signalprocessing.window import window_sliding
+from cerebralcortex.data_processor.signalprocessing.window import WindowPlan, window_sliding
 from cerebralcortex.kernel.datatypes.datapoint import DataPoint
 from cerebralcortex.kernel.datatypes.datastream import DataStream
 
@@ -99,6 +100,37 @@ class TestECGFeatures(unittest.TestCase):
         self.assertAlmostEqual(rr_20.data[0].sample, 0.58499999999999996, delta=0.01)
         self.assertAlmostEqual(rr_heart_rate.data[0].sample, 97.56123355471891, delta=0.01)
 
+    def test_ecg_feature_computation_windows(self):
+        # Overlapping windows over RR intervals with a gap must match window_sliding, key for key
+        tz = pytz.timezone('US/Eastern')
+        random = np.random.RandomState(11)
+        start = datetime.datetime.fromtimestamp(1484929600.37, tz=tz)
+        rr = 0.8 + 0.05 * random.randn(3000)
+        seconds = np.cumsum(rr)
+        seconds[1500:] += 600
+        data = [DataPoint.from_tuple(start + datetime.timedelta(seconds=float(t)), float(v))
+                for t, v in zip(seconds, rr)]
+        rr_intervals = DataStream(None, None)
+        rr_intervals.data = data
+
+        features = ecg_feature_computation(rr_intervals, window_size=120, window_offset=60)
+        rr_variance, rr_mean, rr_median = features[0], features[5], features[6]
+
+        windows = window_sliding(data, window_size=120, window_offset=60)
+        self.assertListEqual([(dp.start_time, dp.end_time) for dp in rr_mean.data], list(windows.keys()))
+        for dp_mean, dp_variance, dp_median, value in zip(rr_mean.data, rr_variance.data, rr_median.data,
+                                                          windows.values()):
+            samples = np.array([dp.sample for dp in value])
+            self.assertAlmostEqual(dp_mean.sample, np.mean(samples), delta=1e-9)
+            self.assertAlmostEqual(dp_variance.sample, np.var(samples), delta=1e-9)
+            self.assertAlmostEqual(dp_median.sample, np.median(samples), delta=1e-9)
+
+        plan = WindowPlan.from_data([data], 120, 60)
+        planned = ecg_feature_computation(rr_intervals, window_size=120, window_offset=60, window_plan=plan)[5]
+        firsts, ends = plan.bucket(data)
+        self.assertListEqual([(dp.start_time, dp.end_time) for dp in planned.data],
+                             [plan.key(i) for i in np.flatnonzero(ends > firsts)])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,153 @@
+# Copyright (c) 2017, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import gzip
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pytz
+
+from cerebralcortex.data_processor.preprocessor import parser
+from cerebralcortex.kernel.datatypes.columnardata import ColumnarData
+
+
+class TestParser(unittest.TestCase):
+    def setUp(self):
+        self.lines = ['2048 1484929672918',
+                      '-3.5 1484929672934.5',
+                      'bad line',
+                      '1 2 3',
+                      '',
+                      '1e3 1484929672950',
+                      '1.2.3 1484929672966',
+                      '2049 148492967298x',
+                      ' 5 1484929672982',
+                      '+7 1484929672998']
+
+    def test_data_processor_bulk(self):
+        result = parser.data_processor_bulk('\n'.join(self.lines).encode())
+        self.assertIsInstance(result, ColumnarData)
+
+        expected = [dp for dp in map(parser.data_processor, self.lines) if dp is not None]
+        self.assertEqual(len(result), 4)
+        self.assertEqual(len(result), len(expected))
+        for dp, reference in zip(result, expected):
+            self.assertEqual(dp.start_time, reference.start_time)
+            self.assertEqual(dp.sample, reference.sample)
+
+    def test_data_processor_bulk_empty(self):
+        self.assertEqual(len(parser.data_processor_bulk(b'')), 0)
+        self.assertEqual(len(parser.data_processor_bulk(b'x' * 1000)), 0)
+
+    def test_read_file(self):
+        timestamps = 1484929672918 + np.arange(20000) * 15.625
+        lines = ['%d %.3f' % (i % 4096, ts) for i, ts in enumerate(timestamps)]
+        lines[100] = 'corrupted'
+
+        fd, filename = tempfile.mkstemp(suffix='.txt.gz')
+        os.close(fd)
+        try:
+            with gzip.open(filename, 'wt') as f:
+                f.write('\n'.join(lines))
+
+            result = parser.read_file(filename, block_size=4096)
+            self.assertEqual(len(result), 19999)
+            self.assertEqual(len(list(parser.iter_file_blocks(filename, block_size=4096))) > 1, True)
+
+            expected = np.round(np.delete(timestamps, 100) * 1000).astype(np.int64)
+            self.assertTrue(np.array_equal(result.start_times, expected))
+            self.assertTrue(np.array_equal(result.samples, np.delete(np.arange(20000) % 4096, 100)))
+        finally:
+            os.remove(filename)
+
+    def test_default_time_zone(self):
+        filename = self._write(1484929672918 + np.arange(10) * 15.625, np.arange(10))
+        self.assertEqual(parser.read_file(filename).time_zone, pytz.timezone('US/Central'))
+        self.assertEqual(parser.data_processor('1 1484929672918').start_time.tzinfo.zone, 'US/Central')
+
+        # Omitted timezones follow the configured default
+        with mock.patch('cerebralcortex.configuration.DEFAULT_TIME_ZONE', 'Asia/Seoul'):
+            self.assertEqual(parser.read_file(filename).time_zone, pytz.timezone('Asia/Seoul'))
+            chunk_start, chunk = next(parser.iter_chunks({'ecg': filename}, duration=60.0))
+            self.assertEqual(chunk['ecg'].time_zone, pytz.timezone('Asia/Seoul'))
+            self.assertEqual(chunk_start.tzinfo.zone, 'Asia/Seoul')
+
+    def _write(self, timestamps, samples):
+        fd, filename = tempfile.mkstemp(suffix='.txt.gz')
+        os.close(fd)
+        with gzip.open(filename, 'wt') as f:
+            f.write('\n'.join('%d %d' % (v, ts) for v, ts in zip(samples, timestamps)))
+        self.addCleanup(os.remove, filename)
+        return filename
+
+    def test_iter_file_chunks(self):
+        # 64 Hz for 25 minutes with a 12 minute hole
+        timestamps = 1484929200000 + np.arange(25 * 60 * 64) * 15.625
+        timestamps = timestamps[(timestamps < 1484929200000 + 5 * 60000) | (timestamps >= 1484929200000 + 17 * 60000)]
+        filename = self._write(timestamps, np.arange(len(timestamps)))
+
+        chunks = list(parser.iter_file_chunks(filename, duration=120.0, overlap=10.0, block_size=8192))
+        self.assertEqual(len(chunks), 3 + 5)
+
+        expected_us = timestamps.astype(np.int64) * 1000
+        for chunk_start, data in chunks:
+            start_us = int(round(chunk_start.timestamp() * 1e6))
+            self.assertEqual(start_us % 120000000, 0)
+            reference = expected_us[(expected_us >= start_us - 10000000) & (expected_us < start_us + 120000000)]
+            self.assertTrue(np.array_equal(data.start_times, reference))
+
+        without_overlap = list(parser.iter_file_chunks(filename, duration=120.0, block_size=8192))
+        self.assertEqual(sum(len(data) for _, data in without_overlap), len(timestamps))
+
+    def test_iter_chunks(self):
+        timestamps = 1484929200000 + np.arange(10 * 60 * 64) * 15.625
+        ecg = self._write(timestamps, np.arange(len(timestamps)))
+        rip = self._write(timestamps[timestamps >= 1484929200000 + 4 * 60000], np.arange(len(timestamps)))
+
+        chunks = list(parser.iter_chunks({'ecg': ecg, 'rip': rip}, duration=60.0))
+        self.assertEqual(len(chunks), 10)
+        self.assertEqual([len(c['rip']) for _, c in chunks[:4]], [0, 0, 0, 0])
+        self.assertTrue(all(len(c['ecg']) == 3840 for _, c in chunks))
+        self.assertTrue(all(len(c['rip']) == 3840 for _, c in chunks[4:]))
+
+    def test_iter_chunks_required(self):
+        # rip drops out for the third minute
+        timestamps = 1484929200000 + np.arange(5 * 60 * 64) * 15.625
+        dropout = (timestamps >= 1484929200000 + 2 * 60000) & (timestamps < 1484929200000 + 3 * 60000)
+        ecg = self._write(timestamps, np.arange(len(timestamps)))
+        rip = self._write(timestamps[~dropout], np.arange(len(timestamps)))
+
+        chunks = list(parser.iter_chunks({'ecg': ecg, 'rip': rip}, duration=60.0, required=['ecg', 'rip']))
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual([int(start.timestamp()) - 1484929200 for start, _ in chunks], [0, 60, 180, 240])
+        self.assertTrue(all(len(c['ecg']) == 3840 and len(c['rip']) == 3840 for _, c in chunks))
+
+        self.assertEqual(len(list(parser.iter_chunks({'ecg': ecg, 'rip': rip}, duration=60.0, required=['ecg']))), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
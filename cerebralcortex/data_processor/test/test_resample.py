@@ -0,0 +1,143 @@
+# Copyright (c) 2017, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+
+import numpy as np
+from scipy.interpolate import PchipInterpolator
+from scipy.signal import resample_poly
+
+from cerebralcortex.data_processor.signalprocessing.resample import resample
+from cerebralcortex.kernel.datatypes.columnardata import ColumnarData
+from cerebralcortex.kernel.datatypes.datastream import DataStream
+
+
+class TestResample(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super(TestResample, cls).setUpClass()
+        cls.sampling_frequency = 64.0
+        cls.start = 1484929672000000 + 7 * 15625
+        cls.count = 20000
+        cls.start_times = cls.start + np.arange(cls.count) * 15625
+        seconds = np.arange(cls.count) / cls.sampling_frequency
+        cls.samples = np.sin(2 * np.pi * 0.3 * seconds) + 0.1 * np.random.RandomState(3).randn(cls.count)
+        cls.ds = DataStream(None, None, data=ColumnarData(cls.start_times, cls.samples))
+
+    def test_resample_on_epoch_grid(self):
+        for method in ['linear', 'pchip', 'polyphase']:
+            result = resample(self.ds, 64.0 / 6, method, sampling_frequency=self.sampling_frequency)
+            times = result.data.start_times
+            self.assertEqual(len(result.data), len(times))
+            self.assertTrue(np.all(np.diff(times) == 93750))
+            self.assertEqual(times[0] % 93750, 0)
+            self.assertGreaterEqual(times[0], self.start_times[0])
+            self.assertLessEqual(times[-1], self.start_times[-1])
+
+    def test_resample_grid_edges(self):
+        # Inputs starting and ending exactly on the grid keep both points at current epoch values
+        for start in [1740579642000000, 1717824261000000, 1763808657000000]:
+            ds = DataStream(None, None, data=ColumnarData(np.array([start, start + 3000000]), np.array([0.0, 1.0])))
+            result = resample(ds, 100.0 / 3)
+            self.assertEqual(len(result.data), 101)
+            self.assertEqual(result.data.start_times[0], start)
+            self.assertEqual(result.data.start_times[-1], start + 3000000)
+            self.assertEqual(result.data.start_times[1] - start, 30000)
+
+    def test_resample_reference(self):
+        seconds = (self.start_times - self.start) / 1e6
+        for method in ['linear', 'pchip']:
+            result = resample(self.ds, 64.0 / 3, method)
+            grid = (result.data.start_times - self.start) / 1e6
+            if method == 'linear':
+                expected = np.interp(grid, seconds, self.samples)
+            else:
+                expected = PchipInterpolator(seconds, self.samples)(grid)
+            self.assertTrue(np.allclose(result.data.samples, expected, atol=1e-9))
+
+        result = resample(self.ds, 64.0 / 3, 'polyphase', sampling_frequency=self.sampling_frequency)
+        first = int(np.flatnonzero(self.start_times == result.data.start_times[0])[0])
+        expected = resample_poly(self.samples[first:], 1, 3)[:len(result.data)]
+        self.assertTrue(np.allclose(result.data.samples, expected, atol=1e-9))
+
+    def test_resample_chunks(self):
+        for method in ['linear', 'pchip', 'polyphase']:
+            for target_rate in [64.0 / 6, 128.0]:
+                whole = resample(self.ds, target_rate, method, sampling_frequency=self.sampling_frequency,
+                                 chunk_size=10 ** 9)
+                chunked = resample(self.ds, target_rate, method, sampling_frequency=self.sampling_frequency,
+                                   chunk_size=500)
+                self.assertTrue(np.array_equal(whole.data.start_times, chunked.data.start_times))
+                self.assertTrue(np.allclose(whole.data.samples, chunked.data.samples, atol=1e-12))
+
+    def test_resample_shared_grid(self):
+        accel_times = self.start + 31250 + np.arange(0, self.count, 6) * 15625
+        accel = DataStream(None, None, data=ColumnarData(accel_times, np.ones(len(accel_times))))
+        ecg = resample(self.ds, 64.0 / 6, 'polyphase', sampling_frequency=self.sampling_frequency)
+        accel = resample(accel, 64.0 / 6, 'linear')
+        shared = np.intersect1d(ecg.data.start_times, accel.data.start_times)
+        self.assertGreater(len(shared), 0.99 * min(len(ecg.data), len(accel.data)))
+
+    def test_resample_channels(self):
+        samples = np.column_stack((self.samples, 2 * self.samples, -self.samples))
+        ds = DataStream(None, None, data=ColumnarData(self.start_times, samples))
+        for method in ['linear', 'pchip', 'polyphase']:
+            single = resample(self.ds, 16.0, method, sampling_frequency=self.sampling_frequency)
+            result = resample(ds, 16.0, method, sampling_frequency=self.sampling_frequency)
+            self.assertEqual(result.data.samples.shape, (len(single.data), 3))
+            self.assertTrue(np.allclose(result.data.samples[:, 1], 2 * single.data.samples))
+            self.assertTrue(np.allclose(result.data.samples[:, 2], -single.data.samples))
+
+    def test_resample_max_gap(self):
+        keep = np.ones(self.count, dtype=bool)
+        keep[5000:5640] = False
+        ds = DataStream(None, None, data=ColumnarData(self.start_times[keep], self.samples[keep]))
+        everything = resample(ds, 8.0)
+        result = resample(ds, 8.0, max_gap=1.0)
+        gap_start, gap_end = self.start_times[4999], self.start_times[5640]
+        inside = (everything.data.start_times > gap_start) & (everything.data.start_times < gap_end)
+        self.assertEqual(np.sum(inside), 80)
+        self.assertEqual(len(result.data), len(everything.data) - 80)
+        self.assertFalse(np.any((result.data.start_times > gap_start) & (result.data.start_times < gap_end)))
+
+    def test_resample_duplicate_times(self):
+        start_times = np.repeat(self.start_times[:100], 2)
+        samples = np.repeat(self.samples[:100], 2)
+        ds = DataStream(None, None, data=ColumnarData(start_times, samples))
+        result = resample(ds, 32.0, 'pchip')
+        self.assertEqual(len(result.data), 50)
+
+    def test_resample_errors(self):
+        with self.assertRaises(ValueError):
+            resample(self.ds, 16.0, 'cubic')
+        with self.assertRaises(ValueError):
+            resample(self.ds, 16.0, 'polyphase')
+
+    def test_resample_empty(self):
+        ds = DataStream(None, None, data=[])
+        self.assertEqual(len(resample(ds, 16.0).data), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -34,7 +34,8 @@ from cerebralcortex.data_processor.signalprocessing.rip import up_down_intercept
     generate_peak_valley, \
     remove_close_valley_peak_pair, filter_expiration_duration_outlier, filter_small_amp_expiration_peak_valley, \
     filter_small_amp_inspiration_peak_valley, correct_peak_position, correct_valley_position
-from cerebralcortex.data_processor.signalprocessing.vector import smooth, moving_average_curve
+from cerebralcortex.data_processor.signalprocessing.vector import smooth, moving_average_curve, smooth_array, \
+    moving_average_curve_array
 from cerebralcortex.kernel.datatypes.datapoint import DataPoint
 from cerebralcortex.kernel.datatypes.datastream import DataStream
 from cerebralcortex.data_processor.signalprocessing.alignment import timestamp_correct
@@ -89,6 +90,33 @@ class TestPeakValleyComputation(unittest.TestCase):
         for i in range(0,len(sample_mac_matlab)):
             self.assertAlmostEqual(sample_mac_matlab[i],sample_mac_python[i],delta=0.1)
 
+    def test_smooth_array(self):
+        samples = np.array([dp.sample for dp in self.rip_datastream.data])
+        sample_smooth = smooth_array(samples, self._smoothing_factor)
+        self.assertEqual(len(sample_smooth), len(samples))
+
+        sample_smooth_matlab = np.genfromtxt(os.path.join(os.path.dirname(__file__), 'res/testmatlab_rip_smooth.csv'),
+                                             delimiter=',', )
+        self.assertTrue(np.all(np.round(sample_smooth_matlab) == np.round(sample_smooth[:len(sample_smooth_matlab)])))
+
+        # Shrinking spans at the edges
+        self.assertEqual(sample_smooth[:3].tolist(), [samples[0], samples[:3].mean(), samples[:5].mean()])
+        self.assertEqual(sample_smooth[-2:].tolist(), [samples[-3:].mean(), samples[-1]])
+        self.assertRaises(ValueError, smooth_array, samples, 4)
+        self.assertRaises(ValueError, smooth_array, samples[:3], 5)
+
+    def test_moving_average_curve_array(self):
+        samples = np.array([dp.sample for dp in self.rip_datastream.data])
+        mac = moving_average_curve_array(smooth_array(samples, self._smoothing_factor), self._window_length)
+        self.assertEqual(len(mac), len(samples) - 2 * self._window_length - 1)
+
+        sample_mac_matlab = np.genfromtxt(os.path.join(os.path.dirname(__file__), 'res/testmatlab_mac_sample.csv'),
+                                          delimiter=',', )
+        self.assertTrue(np.allclose(sample_mac_matlab, mac[:len(sample_mac_matlab)], rtol=0, atol=0.1))
+
+        self.assertEqual(len(moving_average_curve_array(samples[:11], 5)), 0)
+        self.assertEqual(moving_average_curve_array(np.arange(6.0), 1).tolist(), [1.0, 2.0, 3.0])
+
     def test_up_down_intercepts(self):
         data_start_time_list = [0,1,2,3,4]
         mac_start_time_list = [0,1,2,3,4]
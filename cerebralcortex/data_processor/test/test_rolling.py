@@ -0,0 +1,89 @@
+# Copyright (c) 2017, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import datetime
+import unittest
+
+import numpy as np
+import pytz
+
+from cerebralcortex.data_processor.signalprocessing.rolling import RollingStatistics
+from cerebralcortex.data_processor.signalprocessing.window import WindowPlan
+from cerebralcortex.kernel.datatypes.datapoint import DataPoint
+
+
+class TestRollingStatistics(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super(TestRollingStatistics, cls).setUpClass()
+        tz = pytz.timezone('US/Central')
+        random = np.random.RandomState(7)
+        start = datetime.datetime.fromtimestamp(1484929600.25, tz=tz)
+
+        # One RR interval like sample per second for six hours, with a ten minute gap
+        seconds = np.concatenate((np.arange(0, 10000), np.arange(10600, 21600)))
+        cls.values = 0.8 + 0.1 * random.randn(len(seconds))
+        cls.data = [DataPoint.from_tuple(start + datetime.timedelta(seconds=int(s)), v)
+                    for s, v in zip(seconds, cls.values)]
+
+    def per_window(self, firsts, ends):
+        result = []
+        for first, end in zip(firsts, ends):
+            data = np.array([dp.sample for dp in self.data[first:end]])
+            if len(data) == 0:
+                continue
+            result.append([np.mean(data), np.var(data), np.median(data),
+                           0.5 * (np.percentile(data, 75) - np.percentile(data, 25)),
+                           np.percentile(data, 80), np.percentile(data, 20)])
+        return np.array(result)
+
+    def test_rolling_statistics(self):
+        for window_size, window_offset in [(60.0, 60.0), (60.0, 30.0), (120.0, 5.0), (10.0, 30.0)]:
+            plan = WindowPlan.from_data([self.data], window_size, window_offset)
+            firsts, ends = plan.bucket(self.data)
+            stats = RollingStatistics(self.values, firsts, ends, quantiles=(20, 80))
+
+            nonempty = stats.count > 0
+            self.assertTrue(np.all(np.isnan(stats.mean[~nonempty])))
+            self.assertTrue(np.array_equal(stats.count, ends - firsts))
+
+            expected = self.per_window(firsts, ends)
+            self.assertTrue(np.allclose(stats.mean[nonempty], expected[:, 0], rtol=0, atol=1e-12))
+            self.assertTrue(np.allclose(stats.var[nonempty], expected[:, 1], rtol=0, atol=1e-12))
+            # Order statistics are exact
+            self.assertTrue(np.array_equal(stats.median[nonempty], expected[:, 2]))
+            self.assertTrue(np.array_equal(stats.quartile_deviation[nonempty], expected[:, 3]))
+            self.assertTrue(np.array_equal(stats.quantile(80)[nonempty], expected[:, 4]))
+            self.assertTrue(np.array_equal(stats.quantile(20)[nonempty], expected[:, 5]))
+
+    def test_rolling_statistics_small(self):
+        stats = RollingStatistics([4.0, 1.0, 3.0, 2.0], [0, 0, 1, 4], [1, 4, 4, 4])
+        self.assertEqual(list(stats.count), [1, 4, 3, 0])
+        self.assertEqual(list(stats.median[:3]), [4.0, 2.5, 2.0])
+        self.assertEqual(stats.as_dict()['p80'][1], np.percentile([4.0, 1.0, 3.0, 2.0], 80))
+        self.assertTrue(np.isnan(stats.var[3]))
+
+
+if __name__ == '__main__':
+    unittest.main()
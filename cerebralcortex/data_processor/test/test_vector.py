@@ -27,10 +27,12 @@ import gzip
 import os
 import unittest
 
+import numpy as np
 import pytz
 
 from cerebralcortex.data_processor.signalprocessing.alignment import autosense_sequence_align
 from cerebralcortex.data_processor.signalprocessing.vector import normalize, magnitude
+from cerebralcortex.kernel.datatypes.columnardata import ColumnarData
 from cerebralcortex.kernel.datatypes.datapoint import DataPoint
 from cerebralcortex.kernel.datatypes.datastream import DataStream
 
@@ -80,6 +82,37 @@ class TestVector(unittest.TestCase):
         self.assertIsInstance(self.accel, DataStream)
         self.assertEqual(len(self.accel.data), 62870)
 
+    def test_autosense_sequence_align_channels(self):
+        self.assertIsInstance(self.accel.data, ColumnarData)
+        self.assertEqual(self.accel.data.channels, 3)
+        self.assertEqual(self.accel.data.samples.shape, (62870, 3))
+
+    def test_autosense_sequence_align_tolerance(self):
+        times = 1484929672918273 + np.arange(20, dtype=np.int64) * 93750
+        x = DataStream(None, None, data=ColumnarData(times, np.arange(20.0)))
+        y = DataStream(None, None, data=ColumnarData(np.delete(times, 5) + 1000, np.delete(np.arange(20.0), 5)))
+
+        zipped = autosense_sequence_align([x, y], 64.0 / 6)
+        self.assertEqual(len(zipped.data), 19)
+        self.assertEqual(zipped.data[5].sample, [5.0, 6.0])
+
+        matched = autosense_sequence_align([x, y], 64.0 / 6, tolerance=0.01)
+        self.assertEqual(len(matched.data), 19)
+        self.assertTrue(np.array_equal(matched.data.samples[:, 0], matched.data.samples[:, 1]))
+        self.assertNotIn(times[5], matched.data.start_times)
+
+        self.assertEqual(len(autosense_sequence_align([x, DataStream(None, None, data=[])], 64.0 / 6).data), 0)
+
+    def test_magnitude_columns(self):
+        rows = DataStream(None, None,
+                          data=[DataPoint.from_tuple(dp.start_time, dp.sample) for dp in self.accel.data[:500]])
+        columns = DataStream(None, None, data=self.accel.data[:500])
+
+        m_rows = magnitude(normalize(rows))
+        m_columns = magnitude(normalize(columns))
+        self.assertIsInstance(m_columns.data, ColumnarData)
+        self.assertTrue(np.allclose([dp.sample for dp in m_rows.data], m_columns.data.samples))
+
     def test_normalize(self):
         self.assertIsInstance(self.accel, DataStream)
 
@@ -28,9 +28,13 @@ from datetime import datetime, timedelta
 from random import random
 from time import sleep
 
+import numpy as np
 import pytz
 
-from cerebralcortex.data_processor.signalprocessing.window import window_sliding, epoch_align
+from cerebralcortex.data_processor.signalprocessing.window import window_sliding, epoch_align, epoch_align_us, \
+    window_bounds, window_iter, WindowPlan, window_iter_aligned, window_iter_multi, \
+    StreamingWindow, window_stream, window_regular
+from cerebralcortex.kernel.datatypes.columnardata import ColumnarData
 from cerebralcortex.kernel.datatypes.datapoint import DataPoint
 
 
@@ -85,6 +89,197 @@ class TestWindowing(unittest.TestCase):
                 reference = (int(int(timestamp.timestamp() * 1e6) / int(interval * 1e6)) * interval)
                 self.assertAlmostEqual(aligned.timestamp(), reference, delta=1e-6)
 
+    def test_epoch_align_us(self):
+        timestamps = np.array([123456789000000, 123456789567800, 1484929672918273, -1500000])
+        self.assertEqual(epoch_align_us(timestamps, 10.0).tolist(),
+                         [123456780000000, 123456780000000, 1484929670000000, -10000000])
+        self.assertEqual(epoch_align_us(timestamps, 0.01, after=True).tolist(),
+                         [123456789010000, 123456789570000, 1484929672920000, -1490000])
+        self.assertEqual(epoch_align_us(1484929672918273, 0.5), 1484929672500000)
+        self.assertIsInstance(epoch_align_us(1484929672918273, 0.5), int)
+
+        # The alignment does not depend on the timezone, which only applies to the result
+        eastern = pytz.timezone('US/Eastern')
+        ts = datetime.fromtimestamp(1484929672.918273, tz=eastern)
+        aligned = epoch_align(ts, 60.0)
+        self.assertEqual(aligned.tzinfo.zone, 'US/Eastern')
+        self.assertEqual(aligned, epoch_align(ts.astimezone(self.timezone), 60.0))
+        self.assertEqual(epoch_align(ts, 60.0, time_zone=pytz.utc).tzinfo, pytz.utc)
+        self.assertEqual(epoch_align(ts, 60.0, time_zone=pytz.utc), aligned)
+
+    def gapped_data(self):
+        # 1 Hz for 100 s, a 1000 s gap, then 1 Hz for another 50 s
+        start = datetime.fromtimestamp(1484929600.5, tz=self.timezone)
+        return [DataPoint.from_tuple(start + timedelta(seconds=i), i) for i in list(range(100)) + list(range(1100, 1150))]
+
+    def test_window_iter_gap(self):
+        data = self.gapped_data()
+        windows = list(window_iter(data, window_size=10.0, window_offset=10.0))
+
+        keys = [key for key, _ in windows]
+        self.assertEqual(keys[0][0], epoch_align(data[0].start_time, 10.0))
+        self.assertEqual(keys[0][1] - keys[0][0], timedelta(seconds=10))
+
+        # Empty windows over the gap are skipped, the next window starts at the aligned first point after it
+        self.assertEqual(len(windows), 10 + 5)
+        self.assertEqual(keys[10][0], epoch_align(data[100].start_time, 10.0))
+
+        for (st, et), window_data in windows:
+            self.assertTrue(all(st < dp.start_time <= et for dp in window_data))
+        self.assertEqual(sum(len(window_data) for _, window_data in windows), len(data))
+
+    def test_window_iter_overlap(self):
+        data = self.gapped_data()
+        windows = list(window_iter(data, window_size=20.0, window_offset=10.0))
+        for (st, et), window_data in windows:
+            self.assertTrue(all(st < dp.start_time <= et for dp in window_data))
+
+        # A window only adds the points after the end of the previous window
+        self.assertEqual(len(windows[0][1]), 20)
+        self.assertEqual(len(windows[1][1]), 10)
+        self.assertEqual({id(dp) for _, window_data in windows for dp in window_data}, {id(dp) for dp in data})
+
+    def test_window_bounds_columnar(self):
+        data = self.gapped_data()
+        columns = ColumnarData.from_datapoints(data)
+
+        bounds = list(window_bounds(data, window_size=7.0, window_offset=3.0))
+        self.assertEqual(bounds, list(window_bounds(columns, window_size=7.0, window_offset=3.0)))
+
+        for (key, window_data), (_, view) in zip(window_iter(data, 7.0, 3.0), window_iter(columns, 7.0, 3.0)):
+            self.assertIsInstance(view, ColumnarData)
+            self.assertEqual([dp.sample for dp in window_data], list(view.samples))
+
+    def test_window_bounds_batches(self):
+        data = self.gapped_data()
+        self.assertEqual(list(window_bounds(data, 2.0, 1.0)), list(window_bounds(data, 2.0, 1.0, batch_size=3)))
+
+    def test_window_plan(self):
+        data = self.gapped_data()
+        plan = WindowPlan.from_data([data], window_size=10.0, window_offset=10.0)
+
+        self.assertEqual(plan.key(0)[0], epoch_align(data[0].start_time, 10.0))
+        self.assertEqual(len(plan), len(plan.keys()))
+        self.assertLess(plan.key(len(plan) - 1)[0], data[-1].start_time)
+
+        # Non-empty windows of the plan are the windows of window_sliding
+        windows = [(plan.key(i), window_data) for i, window_data in enumerate(plan.split(data)) if len(window_data)]
+        self.assertEqual(windows, list(window_sliding(data, 10.0, 10.0).items()))
+
+    def test_window_plan_shared(self):
+        data = self.gapped_data()
+        odd = data[1::2]
+        columns = ColumnarData.from_datapoints(data[::3])
+        plan = WindowPlan.from_data([odd, data, columns], window_size=20.0, window_offset=10.0)
+
+        for stream in [data, odd, columns]:
+            firsts, ends = plan.bucket(stream)
+            self.assertEqual(len(firsts), len(plan))
+            for index, (first, end) in enumerate(zip(firsts, ends)):
+                st, et = plan.key(index)
+                expected = [i for i, dp in enumerate(stream) if st < dp.start_time <= et]
+                self.assertEqual(list(range(first, end)), expected)
+
+        with self.assertRaises(ValueError):
+            WindowPlan.from_data([[], None], 10.0, 10.0)
+
+    def test_window_iter_aligned(self):
+        data = self.gapped_data()
+        odd = data[1::2]
+        columns = ColumnarData.from_datapoints(data[::3])
+        streams = OrderedDict([('all', data), ('odd', odd), ('third', columns)])
+
+        windows = list(window_iter_aligned(streams, window_size=20.0, window_offset=10.0))
+        self.assertEqual(windows[0][0][0], epoch_align(data[0].start_time, 10.0))
+        for (st, et), window_data in windows:
+            self.assertEqual(list(window_data), ['all', 'odd', 'third'])
+            for name, stream in streams.items():
+                self.assertGreater(len(window_data[name]), 0)
+                self.assertEqual([dp.start_time for dp in window_data[name]],
+                                 [dp.start_time for dp in stream if st < dp.start_time <= et])
+
+        # Windows over the gap are skipped
+        self.assertTrue(all(et <= data[99].start_time + timedelta(seconds=20) or st >= epoch_align(data[100].start_time, 10.0)
+                            for (st, et), _ in windows))
+        batched = list(window_iter_aligned(streams, 20.0, 10.0, batch_size=2))
+        self.assertEqual([(key, {name: len(d) for name, d in window_data.items()}) for key, window_data in batched],
+                         [(key, {name: len(d) for name, d in window_data.items()}) for key, window_data in windows])
+
+        self.assertEqual(list(window_iter_aligned(OrderedDict([('all', data), ('none', [])]), 20.0, 10.0)), [])
+
+    def test_window_iter_aligned_coverage(self):
+        data = self.gapped_data()
+        sparse = data[:5] + data[100:]
+        streams = OrderedDict([('all', data), ('sparse', sparse)])
+
+        windows = list(window_iter_aligned(streams, 10.0, 10.0, coverage={'sparse': 5.0}))
+        for _, window_data in windows:
+            span = window_data['sparse'][-1].start_time - window_data['sparse'][0].start_time
+            self.assertGreater(span, timedelta(seconds=5))
+        self.assertEqual(len(windows), 5)
+
+    def test_window_iter_multi(self):
+        data = self.gapped_data()
+        valleys = data[::4]
+        peaks = data[2::4]
+        rr_intervals = data
+
+        windows = list(window_iter_multi({'peak': peaks, 'valley': valleys, 'rr_intervals': rr_intervals}, 20.0, 20.0))
+        self.assertEqual(len(windows), 5 + 2)
+        for (st, et), window_data in windows:
+            self.assertEqual(len(window_data['peak']), len(window_data['valley']))
+            for valley, peak in zip(window_data['valley'], window_data['peak']):
+                self.assertTrue(st < valley.start_time <= et)
+                self.assertEqual(peak.sample, valley.sample + 2)
+
+    def test_streaming_window(self):
+        data = self.gapped_data()
+        for window_size, window_offset in [(10.0, 10.0), (20.0, 10.0), (7.0, 3.0), (5.0, 10.0)]:
+            plan = WindowPlan.from_data([data], window_size, window_offset)
+            expected = [(plan.key(i), window_data) for i, window_data in enumerate(plan.split(data))
+                        if len(window_data)]
+            for chunk_size in [1, 7, len(data)]:
+                chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+                self.assertEqual(list(window_stream(chunks, window_size, window_offset)), expected)
+
+        columns = ColumnarData.from_datapoints(data)
+        streamed = list(window_stream([columns[:30], columns[30:]], 10.0, 10.0))
+        self.assertEqual([key for key, _ in streamed], list(window_sliding(data, 10.0, 10.0).keys()))
+
+    def test_streaming_window_eviction(self):
+        data = self.gapped_data()
+        windows = StreamingWindow(window_size=20.0, window_offset=10.0)
+
+        completed = []
+        for dp in data:
+            completed.extend(windows.push([dp]))
+            self.assertLessEqual(len(windows), 21)
+        self.assertEqual(completed[0][0][0], epoch_align(data[0].start_time, 10.0))
+
+        remaining = windows.flush()
+        self.assertEqual(len(windows), 0)
+        self.assertEqual(remaining[-1][1][-1], data[-1])
+        self.assertEqual(windows.flush(), [])
+
+    def test_window_regular(self):
+        samples = np.arange(10)
+        windows = window_regular(samples, window_length=4)
+        self.assertEqual(windows.tolist(), [[0, 1, 2, 3], [4, 5, 6, 7]])
+        self.assertTrue(np.shares_memory(windows, samples))
+        self.assertFalse(windows.flags.writeable)
+
+        windows = window_regular(samples, window_length=4, window_step=3)
+        self.assertEqual(windows.tolist(), [[0, 1, 2, 3], [3, 4, 5, 6], [6, 7, 8, 9]])
+
+        channels = np.arange(30).reshape(10, 3)
+        windows = window_regular(channels, window_length=5)
+        self.assertEqual(windows.shape, (2, 5, 3))
+        self.assertEqual(windows[1].tolist(), channels[5:].tolist())
+
+        self.assertEqual(window_regular(samples, window_length=11).shape, (0, 11))
+        with self.assertRaises(ValueError):
+            window_regular(samples, window_length=0)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,257 @@
+# Copyright (c) 2017, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import json
+from datetime import datetime
+from typing import Dict, List, Sequence, Union
+
+import numpy as np
+import pytz
+
+from cerebralcortex.kernel.datatypes.columnardata import ColumnarData, NO_TIME, _sample_array, as_columnar, \
+    concatenate
+from cerebralcortex.kernel.datatypes.datastream import DataStream
+from cerebralcortex.kernel.datatypes.segment import decode_identifier, encode_identifier
+
+# Schema metadata key holding the stream identifiers
+METADATA_KEY = b'cerebralcortex'
+
+# Rows per Parquet row group, each row group keeps min/max statistics used to skip data outside a time filter
+ROW_GROUP_SIZE = 64 * 1024
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError('Arrow and Parquet support requires pyarrow: pip install "pyarrow>=1.0"')
+    return pyarrow
+
+
+def _timestamp_type(time_zone):
+    pa = _pyarrow()
+    return pa.timestamp('us', getattr(time_zone, 'zone', None))
+
+
+def _time_zone(timestamp_type):
+    return None if timestamp_type.tz is None else pytz.timezone(timestamp_type.tz)
+
+
+def _sample_column(samples: np.ndarray):
+    pa = _pyarrow()
+    if samples.dtype == object:
+        return pa.array(list(samples))
+    if samples.ndim > 1:
+        width = int(np.prod(samples.shape[1:]))
+        return pa.FixedSizeListArray.from_arrays(pa.array(np.ascontiguousarray(samples).reshape(-1)), width)
+    return pa.array(samples)
+
+
+def _sample_array_from_column(column) -> np.ndarray:
+    pa = _pyarrow()
+    column = column.combine_chunks() if isinstance(column, pa.ChunkedArray) else column
+    if pa.types.is_fixed_size_list(column.type):
+        return column.flatten().to_numpy(zero_copy_only=False).reshape(len(column), column.type.list_size)
+    if column.null_count == 0 and (pa.types.is_integer(column.type) or pa.types.is_floating(column.type)):
+        return column.to_numpy(zero_copy_only=False)
+    return _sample_array(column.to_pylist())
+
+
+def _time_columns(data: ColumnarData):
+    pa = _pyarrow()
+    timestamp_type = _timestamp_type(data.time_zone)
+    start_time = pa.array(data.start_times, type=pa.int64()).cast(timestamp_type)
+    if data.end_times is None:
+        return start_time, None
+    end_time = pa.array(data.end_times, type=pa.int64(), mask=data.end_times == NO_TIME).cast(timestamp_type)
+    return start_time, end_time
+
+
+def _int64_times(column) -> np.ndarray:
+    pa = _pyarrow()
+    column = column.combine_chunks() if isinstance(column, pa.ChunkedArray) else column
+    return column.cast(pa.int64()).fill_null(NO_TIME).to_numpy()
+
+
+def to_arrow(datastream: DataStream):
+    """
+    Convert a DataStream to a pyarrow Table with start_time, optional end_time and sample columns. Timestamps are
+    microsecond timestamps in the stream's timezone and the stream identifiers are kept in the schema metadata.
+
+    :param datastream: DataStream
+    :return: pyarrow.Table
+    """
+    pa = _pyarrow()
+    data = as_columnar(datastream.data if datastream.data is not None else [])
+
+    start_time, end_time = _time_columns(data)
+    columns = {'start_time': start_time}
+    if end_time is not None:
+        columns['end_time'] = end_time
+    columns['sample'] = _sample_column(data.samples)
+
+    metadata = {'identifier': encode_identifier(datastream.identifier),
+                'owner': encode_identifier(datastream.user),
+                'name': encode_identifier(datastream.name),
+                'description': datastream.description}
+
+    return pa.table(columns, metadata={METADATA_KEY: json.dumps(metadata).encode('utf-8')})
+
+
+def from_arrow(table) -> DataStream:
+    """
+    Convert a pyarrow Table written by to_arrow (or any table with start_time and sample columns) to a DataStream
+
+    :param table: pyarrow.Table
+    :return: DataStream backed by ColumnarData
+    """
+    metadata = {}
+    if table.schema.metadata is not None and METADATA_KEY in table.schema.metadata:
+        metadata = json.loads(table.schema.metadata[METADATA_KEY].decode('utf-8'))
+
+    start_time = table.column('start_time')
+    end_times = _int64_times(table.column('end_time')) if 'end_time' in table.column_names else None
+
+    datastream = DataStream(identifier=decode_identifier(metadata.get('identifier')),
+                            owner=decode_identifier(metadata.get('owner')),
+                            name=decode_identifier(metadata.get('name')),
+                            description=metadata.get('description'))
+    datastream.data = ColumnarData(_int64_times(start_time),
+                                   _sample_array_from_column(table.column('sample')),
+                                   end_times,
+                                   _time_zone(start_time.type))
+    return datastream
+
+
+def write_parquet(filename: str, datastream: DataStream, row_group_size: int = ROW_GROUP_SIZE):
+    """
+    :param filename: output path
+    :param datastream: DataStream
+    :param row_group_size: rows per row group, smaller groups make time filters more selective
+    """
+    pa = _pyarrow()
+    pa.parquet.write_table(to_arrow(datastream), filename, row_group_size=row_group_size)
+
+
+def _time_filters(start_time: datetime, end_time: datetime) -> Union[List, None]:
+    filters = []
+    if start_time is not None:
+        filters.append(('start_time', '>=', start_time))
+    if end_time is not None:
+        filters.append(('start_time', '<', end_time))
+    return filters or None
+
+
+def read_parquet(filename: str, start_time: datetime = None, end_time: datetime = None) -> DataStream:
+    """
+    Read a DataStream from Parquet. The time range is pushed down to the reader so that row groups outside of it
+    are not decoded.
+
+    :param filename: Parquet file written by write_parquet
+    :param start_time: keep points with start_time >= start_time
+    :param end_time: keep points with start_time < end_time
+    :return: DataStream
+    """
+    pa = _pyarrow()
+    return from_arrow(pa.parquet.read_table(filename, filters=_time_filters(start_time, end_time)))
+
+
+def features_to_arrow(features: Sequence[DataStream], names: Sequence[str]):
+    """
+    Convert the tuple of feature streams returned by a feature computation (e.g. ecg_feature_computation together
+    with ECG_FEATURES) to one long format table with feature, start_time, end_time and sample columns
+
+    :param features: feature DataStreams
+    :param names: feature name of each stream
+    :return: pyarrow.Table
+    """
+    pa = _pyarrow()
+    if len(features) != len(names):
+        raise ValueError('Expected one name per feature stream')
+
+    parts = [as_columnar(f.data if f is not None and f.data is not None else []) for f in features]
+    data = concatenate(parts)
+    time_zone = next((p.time_zone for p in parts if len(p) > 0), None)
+    data = ColumnarData(data.start_times, data.samples.astype(np.float64), data.end_times, time_zone)
+
+    feature = pa.DictionaryArray.from_arrays(
+        np.repeat(np.arange(len(names), dtype=np.int32), [len(p) for p in parts]), pa.array(list(names)))
+
+    start_time, end_time = _time_columns(data)
+    columns = {'feature': feature, 'start_time': start_time}
+    if end_time is not None:
+        columns['end_time'] = end_time
+    columns['sample'] = pa.array(data.samples)
+    return pa.table(columns)
+
+
+def features_from_arrow(table) -> Dict[str, DataStream]:
+    """
+    :param table: long format table produced by features_to_arrow
+    :return: {feature name: DataStream}
+    """
+    pa = _pyarrow()
+    result = {}
+    feature = table.column('feature').combine_chunks()
+    if pa.types.is_dictionary(feature.type):
+        feature = feature.dictionary_decode()
+    for name in feature.unique().to_pylist():
+        rows = table.filter(pa.compute.equal(feature, name))
+        result[name] = from_arrow(rows.remove_column(rows.schema.get_field_index('feature')))
+        result[name].name = name
+    return result
+
+
+def write_features_parquet(filename: str,
+                           features: Sequence[DataStream],
+                           names: Sequence[str],
+                           row_group_size: int = ROW_GROUP_SIZE):
+    """
+    :param filename: output path
+    :param features: feature DataStreams
+    :param names: feature name of each stream
+    :param row_group_size: rows per row group
+    """
+    pa = _pyarrow()
+    pa.parquet.write_table(features_to_arrow(features, names), filename, row_group_size=row_group_size)
+
+
+def read_features_parquet(filename: str,
+                          names: Sequence[str] = None,
+                          start_time: datetime = None,
+                          end_time: datetime = None) -> Dict[str, DataStream]:
+    """
+    :param filename: Parquet file written by write_features_parquet
+    :param names: only read these features
+    :param start_time: keep windows with start_time >= start_time
+    :param end_time: keep windows with start_time < end_time
+    :return: {feature name: DataStream}
+    """
+    pa = _pyarrow()
+    filters = _time_filters(start_time, end_time) or []
+    if names is not None:
+        filters.append(('feature', 'in', list(names)))
+    return features_from_arrow(pa.parquet.read_table(filename, filters=filters or None))
@@ -0,0 +1,465 @@
+# Copyright (c) 2017, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from datetime import datetime, timedelta, timezone, tzinfo
+from typing import Any, List
+
+import numpy as np
+
+from cerebralcortex.kernel.datatypes.datapoint import DataPoint
+
+# Marker stored in the end time column for DataPoints without an end time
+NO_TIME = np.iinfo(np.int64).min
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def datetime_to_epoch_us(ts: datetime) -> int:
+    """
+    Convert a datetime to integer microseconds since the epoch without a float round trip
+
+    :param ts: timezone aware or naive (local time) datetime
+    :return: epoch microseconds
+    """
+    if ts.tzinfo is not None:
+        # Exact integer arithmetic and about twice as fast as going through timestamp()
+        return (ts - _EPOCH) // _MICROSECOND
+    return int(ts.replace(microsecond=0).timestamp()) * 1000000 + ts.microsecond
+
+
+def epoch_us_to_datetime(timestamp: int, time_zone: tzinfo = None) -> datetime:
+    """
+    Convert integer epoch microseconds back to a datetime
+
+    :param timestamp: epoch microseconds
+    :param time_zone: timezone of the result, None returns a naive local datetime
+    :return: datetime
+    """
+    seconds, microseconds = divmod(int(timestamp), 1000000)
+    return datetime.fromtimestamp(seconds, time_zone).replace(microsecond=microseconds)
+
+
+def seconds_to_epoch_us(seconds: np.ndarray) -> np.ndarray:
+    """
+    Convert float epoch seconds to int64 epoch microseconds, rounding the fraction half to even the way
+    datetime.fromtimestamp does
+
+    :param seconds: epoch seconds
+    :return: int64 epoch microseconds
+    """
+    seconds = np.asarray(seconds, dtype=np.float64)
+    whole = np.floor(seconds)
+    return whole.astype(np.int64) * 1000000 + np.round((seconds - whole) * 1e6).astype(np.int64)
+
+
+def _sample_array(samples: List[Any]) -> np.ndarray:
+    """
+    Pack samples into a numeric array where possible, falling back to an object array for ragged or
+    non-numeric samples (e.g. dicts or None)
+    """
+    try:
+        result = np.array(samples)
+    except ValueError:
+        result = None
+
+    if result is None or result.dtype.kind not in 'biuf':
+        result = np.empty(len(samples), dtype=object)
+        result[:] = samples
+    return result
+
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    result = array.view()
+    result.flags.writeable = False
+    return result
+
+
+def _narrow_integer_type(array: np.ndarray) -> np.dtype:
+    return np.promote_types(np.min_scalar_type(int(array.min())), np.min_scalar_type(int(array.max())))
+
+
+def _pack(array: np.ndarray, delta: bool = False):
+    """
+    Compact pickle form of an integer array: optionally delta encoded, then stored in the narrowest integer type
+    that holds the values. Regularly sampled timestamps shrink from 8 to 2-4 bytes per point.
+    """
+    if array is None or len(array) < 2 or array.dtype.kind not in 'iu' or array.ndim != 1:
+        return array
+    values = np.diff(array) if delta else array
+    dtype = _narrow_integer_type(values)
+    if dtype.itemsize >= array.dtype.itemsize:
+        return array
+    return array.dtype.str, array[0] if delta else None, values.astype(dtype)
+
+
+def _unpack(packed) -> np.ndarray:
+    if not isinstance(packed, tuple):
+        return packed
+    dtype, first, values = packed
+    if first is None:
+        return values.astype(dtype)
+    result = np.empty(len(values) + 1, dtype=dtype)
+    result[0] = first
+    np.cumsum(values, dtype=dtype, out=result[1:])
+    result[1:] += first
+    return result
+
+
+def _unpickle(start_times, samples, end_times, time_zone):
+    return ColumnarData(_unpack(start_times), _unpack(samples), _unpack(end_times), time_zone)
+
+
+class ColumnarData:
+    def __init__(self,
+                 start_times: np.ndarray,
+                 samples: np.ndarray,
+                 end_times: np.ndarray = None,
+                 time_zone: tzinfo = None):
+        """
+        Array backed replacement for a List[DataPoint]. Start and end times are int64 epoch microseconds and
+        samples are a NumPy array whose first axis is time. The arrays are adopted without copying. Indexing and
+        iteration return DataPoint views, slicing returns a read-only ColumnarData sharing the same arrays.
+
+        :param start_times: int64 epoch microseconds
+        :param samples: array with len(start_times) rows
+        :param end_times: int64 epoch microseconds, NO_TIME where a point has no end time, or None
+        :param time_zone: timezone used when presenting timestamps as datetimes
+        """
+        self._start_times = np.asarray(start_times, dtype=np.int64)
+        self._samples = np.asarray(samples)
+        self._end_times = None if end_times is None else np.asarray(end_times, dtype=np.int64)
+        self._time_zone = time_zone
+        self._shared = False
+        self._sorted = None
+
+        if len(self._samples) != len(self._start_times):
+            raise ValueError('samples and start_times must have the same length')
+        if self._end_times is not None and len(self._end_times) != len(self._start_times):
+            raise ValueError('end_times and start_times must have the same length')
+
+    @classmethod
+    def from_datapoints(cls, data: List[DataPoint]):
+        """
+        Build columns from a list of DataPoints. The timezone of the first point is used for the whole column.
+
+        :param data: List[DataPoint]
+        :return: ColumnarData
+        """
+        if isinstance(data, ColumnarData):
+            return data
+
+        start_times = np.fromiter((datetime_to_epoch_us(dp.start_time) for dp in data), dtype=np.int64,
+                                  count=len(data))
+
+        end_times = None
+        if any(dp.end_time is not None for dp in data):
+            end_times = np.fromiter((NO_TIME if dp.end_time is None else datetime_to_epoch_us(dp.end_time)
+                                     for dp in data), dtype=np.int64, count=len(data))
+
+        time_zone = data[0].start_time.tzinfo if len(data) > 0 else None
+
+        return cls(start_times, _sample_array([dp.sample for dp in data]), end_times, time_zone)
+
+    @property
+    def start_times(self) -> np.ndarray:
+        return self._start_times
+
+    @property
+    def end_times(self) -> np.ndarray:
+        return self._end_times
+
+    @property
+    def samples(self) -> np.ndarray:
+        return self._samples
+
+    @property
+    def time_zone(self) -> tzinfo:
+        return self._time_zone
+
+    @property
+    def channels(self) -> int:
+        """
+        :return: number of sample columns, e.g. 3 for an x/y/z accelerometer, 1 for scalar samples
+        """
+        return 1 if self._samples.ndim == 1 else self._samples.shape[1]
+
+    def channel(self, index: int):
+        """
+        Read-only single channel of a multi-channel ColumnarData, sharing its arrays
+
+        :param index: sample column
+        :return: ColumnarData with 1-D samples
+        """
+        view = self.view()
+        return ColumnarData(view.start_times, view.samples[:, index], view.end_times, self._time_zone)
+
+    def datapoint(self, index: int) -> DataPoint:
+        """
+        DataPoint view of a single row
+
+        :param index: row index
+        :return: DataPoint
+        """
+        start_time = epoch_us_to_datetime(self._start_times[index], self._time_zone)
+
+        end_time = None
+        if self._end_times is not None and self._end_times[index] != NO_TIME:
+            end_time = epoch_us_to_datetime(self._end_times[index], self._time_zone)
+
+        sample = self._samples[index]
+        if self._samples.dtype != object:
+            sample = sample.tolist()
+
+        return DataPoint(start_time, end_time, sample)
+
+    def to_datapoints(self) -> List[DataPoint]:
+        start_times = [epoch_us_to_datetime(ts, self._time_zone) for ts in self._start_times.tolist()]
+
+        end_times = None
+        if self._end_times is not None:
+            end_times = [None if ts == NO_TIME else epoch_us_to_datetime(ts, self._time_zone)
+                         for ts in self._end_times.tolist()]
+
+        samples = list(self._samples) if self._samples.dtype == object else self._samples.tolist()
+
+        return DataPoint.from_arrays(start_times, samples, end_times)
+
+    def view(self):
+        """
+        Read-only ColumnarData sharing this object's arrays. Both objects are marked as shared so that the first
+        one to be modified copies its arrays before writing (copy-on-write).
+
+        :return: ColumnarData
+        """
+        end_times = None if self._end_times is None else _read_only(self._end_times)
+        result = ColumnarData(_read_only(self._start_times), _read_only(self._samples), end_times, self._time_zone)
+        result._shared = True
+        self._shared = True
+        return result
+
+    def copy(self):
+        """
+        ColumnarData owning private copies of all arrays
+
+        :return: ColumnarData
+        """
+        end_times = None if self._end_times is None else self._end_times.copy()
+        return ColumnarData(self._start_times.copy(), self._samples.copy(), end_times, self._time_zone)
+
+    def _make_writable(self):
+        if not self._shared and self._start_times.flags.writeable and self._samples.flags.writeable:
+            return
+        self._start_times = self._start_times.copy()
+        self._samples = self._samples.copy()
+        if self._end_times is not None:
+            self._end_times = self._end_times.copy()
+        self._shared = False
+
+    @property
+    def is_sorted(self) -> bool:
+        """
+        True when start times are non-decreasing, which is required for binary searching the time index
+        """
+        if self._sorted is None:
+            self._sorted = bool(np.all(self._start_times[1:] >= self._start_times[:-1]))
+        return self._sorted
+
+    def searchsorted(self, timestamp, side: str = 'left'):
+        """
+        Binary search of the start time column
+
+        :param timestamp: datetime, epoch microseconds or an array of epoch microseconds
+        :param side: 'left' or 'right', as numpy.searchsorted
+        :return: insertion index or indices
+        """
+        if isinstance(timestamp, datetime):
+            timestamp = datetime_to_epoch_us(timestamp)
+        return np.searchsorted(self._start_times, timestamp, side=side)
+
+    def time_slice(self, start_time: datetime = None, end_time: datetime = None):
+        """
+        Points with start_time <= t < end_time. Sorted data returns a view found by binary search, unsorted data
+        falls back to a linear scan that returns a copy.
+
+        :param start_time: inclusive lower bound, None for no bound
+        :param end_time: exclusive upper bound, None for no bound
+        :return: ColumnarData
+        """
+        if not self.is_sorted:
+            mask = np.ones(len(self), dtype=bool)
+            if start_time is not None:
+                mask &= self._start_times >= datetime_to_epoch_us(start_time)
+            if end_time is not None:
+                mask &= self._start_times < datetime_to_epoch_us(end_time)
+            return self[mask]
+
+        low = 0 if start_time is None else int(self.searchsorted(start_time))
+        high = len(self) if end_time is None else int(self.searchsorted(end_time))
+        return self[low:max(low, high)]
+
+    def nearest_index(self, timestamp: datetime) -> int:
+        """
+        Index of the point whose start time is closest to timestamp
+
+        :param timestamp: datetime
+        :return: index, or None for empty data
+        """
+        if len(self) == 0:
+            return None
+
+        target = datetime_to_epoch_us(timestamp)
+        if not self.is_sorted:
+            return int(np.argmin(np.abs(self._start_times - target)))
+
+        index = int(np.searchsorted(self._start_times, target))
+        if index == len(self):
+            return index - 1
+        if index > 0 and target - self._start_times[index - 1] <= self._start_times[index] - target:
+            return index - 1
+        return index
+
+    def nearest_indices(self, timestamps: np.ndarray) -> np.ndarray:
+        """
+        Vectorized nearest_index for sorted data, ties go to the earlier point
+
+        :param timestamps: epoch microseconds
+        :return: np.ndarray of indices
+        """
+        if len(self) == 0:
+            raise ValueError('No points to match')
+
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        if len(self) == 1:
+            return np.zeros(len(timestamps), dtype=np.int64)
+
+        after = np.clip(np.searchsorted(self._start_times, timestamps), 1, len(self) - 1)
+        before = after - 1
+        earlier = timestamps - self._start_times[before] <= self._start_times[after] - timestamps
+        return np.where(earlier, before, after)
+
+    def __setitem__(self, index: int, value: DataPoint):
+        self._make_writable()
+        self._sorted = None
+        self._start_times[index] = datetime_to_epoch_us(value.start_time)
+        self._samples[index] = value.sample
+        if value.end_time is not None and self._end_times is None:
+            self._end_times = np.full(len(self), NO_TIME, dtype=np.int64)
+        if self._end_times is not None:
+            self._end_times[index] = NO_TIME if value.end_time is None else datetime_to_epoch_us(value.end_time)
+
+    def __reduce__(self):
+        # Pickle the visible arrays only in compact form, the unpickled copy owns new arrays and is not shared
+        return _unpickle, (_pack(self._start_times, delta=True),
+                           _pack(self._samples),
+                           _pack(self._end_times, delta=True),
+                           self._time_zone)
+
+    def __len__(self):
+        return len(self._start_times)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.datapoint(i)
+
+    def __getitem__(self, item):
+        if isinstance(item, (int, np.integer)):
+            if item < 0:
+                item += len(self)
+            if not 0 <= item < len(self):
+                raise IndexError('ColumnarData index out of range')
+            return self.datapoint(item)
+
+        if isinstance(item, slice):
+            view = self.view()
+            end_times = None if view.end_times is None else view.end_times[item]
+            result = ColumnarData(view.start_times[item], view.samples[item], end_times, self._time_zone)
+            result._shared = True
+            return result
+
+        # Fancy or boolean indexing always produces private copies
+        end_times = None if self._end_times is None else self._end_times[item]
+        return ColumnarData(self._start_times[item], self._samples[item], end_times, self._time_zone)
+
+    def __str__(self):
+        return str(self.to_datapoints())
+
+    def __repr__(self):
+        return 'ColumnarData(' + str(len(self)) + ' points, samples ' + str(self._samples.dtype) + str(
+            self._samples.shape[1:]) + ')'
+
+
+def as_columnar(data) -> ColumnarData:
+    """
+    Columnar view of a stream's data, converting a List[DataPoint] when needed
+
+    :param data: ColumnarData, RegularSignal or List[DataPoint]
+    :return: ColumnarData
+    """
+    if isinstance(data, ColumnarData):
+        return data
+    if hasattr(data, 'to_columnar'):
+        return data.to_columnar()
+    return ColumnarData.from_datapoints(data)
+
+
+def concatenate(parts: List[ColumnarData]) -> ColumnarData:
+    """
+    Join ColumnarData blocks end to end into one block owning new arrays
+
+    :param parts: List[ColumnarData], all with the same sample shape
+    :return: ColumnarData
+    """
+    parts = [p for p in parts if len(p) > 0]
+    if len(parts) == 0:
+        return ColumnarData(np.empty(0, dtype=np.int64), np.empty(0))
+    if len(parts) == 1:
+        return parts[0].copy()
+
+    end_times = None
+    if any(p.end_times is not None for p in parts):
+        end_times = np.concatenate([np.full(len(p), NO_TIME, dtype=np.int64) if p.end_times is None else p.end_times
+                                    for p in parts])
+
+    return ColumnarData(np.concatenate([p.start_times for p in parts]),
+                        np.concatenate([p.samples for p in parts]),
+                        end_times,
+                        parts[0].time_zone)
+
+
+def stack(parts: List[ColumnarData]) -> ColumnarData:
+    """
+    Multi-channel ColumnarData with one sample column per part, e.g. accelerometer x, y and z. Rows are combined
+    by position and take the timestamps of the first part.
+
+    :param parts: List[ColumnarData] of equal length with 1-D samples
+    :return: ColumnarData with len(parts[0]) x len(parts) samples
+    """
+    if len(parts) == 0:
+        raise ValueError('Cannot stack without parts')
+    if any(len(p) != len(parts[0]) for p in parts):
+        raise ValueError('Stacked parts must have the same length')
+
+    return ColumnarData(parts[0].start_times.copy(), np.column_stack([p.samples for p in parts]),
+                        None if parts[0].end_times is None else parts[0].end_times.copy(), parts[0].time_zone)
@@ -23,29 +23,31 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 from datetime import datetime
-from typing import Any
+from itertools import repeat
+from typing import Any, Iterable, List
 
 
 class DataPoint:
+    # Slots instead of a per-instance __dict__ (a day of 64 Hz ECG is millions of DataPoints). The slots are read
+    # directly as attributes; assignment is blocked after construction so instances stay immutable.
+    __slots__ = ('start_time', 'end_time', 'sample')
+
     def __init__(self,
                  start_time: datetime = None,
                  end_time: datetime = None,
                  sample: Any = None):
-        self._start_time = start_time
-        self._end_time = end_time
-        self._sample = sample
+        _set_start_time(self, start_time)
+        _set_end_time(self, end_time)
+        _set_sample(self, sample)
 
-    @property
-    def sample(self):
-        return self._sample
+    def __setattr__(self, key, value):
+        raise AttributeError('DataPoint is immutable')
 
-    @property
-    def start_time(self):
-        return self._start_time
+    def __delattr__(self, key):
+        raise AttributeError('DataPoint is immutable')
 
-    @property
-    def end_time(self):
-        return self._end_time
+    def __reduce__(self):
+        return DataPoint, (self.start_time, self.end_time, self.sample)
 
     # @property
     # def datastream_id(self):
@@ -56,8 +58,30 @@ class DataPoint:
         #return cls(None, start_time, end_time, sample)
         return cls(start_time, end_time, sample)
 
+    @classmethod
+    def from_arrays(cls,
+                    start_times: Iterable[datetime],
+                    samples: Iterable[Any],
+                    end_times: Iterable[datetime] = None) -> List['DataPoint']:
+        """
+        Bulk constructor for many DataPoints from parallel sequences
+
+        :param start_times: sequence of datetimes
+        :param samples: sequence of samples, use ndarray.tolist() to get Python values out of NumPy arrays
+        :param end_times: optional sequence of datetimes
+        :return: List[DataPoint]
+        """
+        if end_times is None:
+            end_times = repeat(None)
+        return list(map(cls, start_times, end_times, samples))
+
     def __str__(self):
         return str(self.start_time) + " - " + str(self.sample)
 
     def __repr__(self):
         return 'DataPoint(' + ', '.join(map(str, [self.start_time, self.end_time, self.sample]))
+
+
+_set_start_time = DataPoint.start_time.__set__
+_set_end_time = DataPoint.end_time.__set__
+_set_sample = DataPoint.sample.__set__
@@ -21,11 +21,16 @@
 # CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
 # OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+from datetime import datetime
 from typing import List
 from uuid import UUID
 
+import numpy as np
+
+from cerebralcortex.kernel.datatypes.columnardata import ColumnarData, datetime_to_epoch_us
 from cerebralcortex.kernel.datatypes.datapoint import DataPoint
 from cerebralcortex.kernel.datatypes.enumerations import StreamTypes
+from cerebralcortex.kernel.datatypes.regularsignal import RegularSignal
 from cerebralcortex.kernel.datatypes.stream import Stream
 from cerebralcortex.kernel.datatypes.subtypes import DataDescriptor, StreamReference
 from cerebralcortex.kernel.datatypes.subtypes import ExecutionContext
@@ -45,3 +50,120 @@ class DataStream(Stream):
                          data)
 
         self._datastream_type = StreamTypes.DATASTREAM
+        self.refresh_index()
+
+    @Stream.data.setter
+    def data(self, value):
+        """
+        Assign stream data (see Stream.data) and drop the time index built for the previous data
+        """
+        Stream.data.fset(self, value)
+        self.refresh_index()
+
+    def refresh_index(self):
+        """
+        Discard the cached time index. Assigning data does this automatically; call it after replacing DataPoints of
+        a list in place (ds.data[i] = dp), which the index cannot detect.
+        """
+        self._time_index = None
+        self._time_index_key = None
+        self._time_index_sorted = True
+
+    def _index(self) -> np.ndarray:
+        """
+        int64 epoch microsecond start times of the stream data, built once per data assignment and reused for every
+        time based lookup. For list data the index is also rebuilt when the list length changes (appends); points
+        replaced in place require refresh_index.
+        """
+        if isinstance(self._data, (ColumnarData, RegularSignal)):
+            return self._data.start_times
+
+        key = len(self._data)
+        if self._time_index_key != key:
+            self._time_index = np.fromiter((datetime_to_epoch_us(dp.start_time) for dp in self._data),
+                                           dtype=np.int64, count=len(self._data))
+            self._time_index_key = key
+            self._time_index_sorted = bool(np.all(self._time_index[1:] >= self._time_index[:-1]))
+        return self._time_index
+
+    @property
+    def is_sorted(self) -> bool:
+        """
+        True when the data is ordered by start time; time slicing and lookups use binary search in that case
+        """
+        if self._data is None:
+            return True
+        if isinstance(self._data, (ColumnarData, RegularSignal)):
+            return self._data.is_sorted
+        self._index()
+        return self._time_index_sorted
+
+    def time_slice(self, start_time: datetime = None, end_time: datetime = None):
+        """
+        Data points with start_time <= t < end_time in O(log n) for sorted data
+
+        :param start_time: inclusive lower bound, None for no bound
+        :param end_time: exclusive upper bound, None for no bound
+        :return: ColumnarData view for columnar data, RegularSignal for a regular signal, List[DataPoint] otherwise
+        """
+        if isinstance(self._data, (ColumnarData, RegularSignal)):
+            return self._data.time_slice(start_time, end_time)
+
+        index = self._index()
+        if not self.is_sorted:
+            low_us = None if start_time is None else datetime_to_epoch_us(start_time)
+            high_us = None if end_time is None else datetime_to_epoch_us(end_time)
+            return [dp for i, dp in enumerate(self._data)
+                    if (low_us is None or index[i] >= low_us) and (high_us is None or index[i] < high_us)]
+
+        low = 0 if start_time is None else int(np.searchsorted(index, datetime_to_epoch_us(start_time)))
+        high = len(index) if end_time is None else int(np.searchsorted(index, datetime_to_epoch_us(end_time)))
+        return self._data[low:max(low, high)]
+
+    def nearest(self, timestamp: datetime) -> DataPoint:
+        """
+        Data point whose start time is closest to timestamp
+
+        :param timestamp: datetime
+        :return: DataPoint, or None for an empty stream
+        """
+        if not self._data:
+            return None
+        if isinstance(self._data, (ColumnarData, RegularSignal)):
+            return self._data[self._data.nearest_index(timestamp)]
+
+        index = self._index()
+        target = datetime_to_epoch_us(timestamp)
+        if not self.is_sorted:
+            return self._data[int(np.argmin(np.abs(index - target)))]
+
+        position = int(np.searchsorted(index, target))
+        if position == len(index) or (position > 0 and target - index[position - 1] <= index[position] - target):
+            position -= 1
+        return self._data[position]
+
+    def __getstate__(self):
+        """
+        Pickle state used by Spark shuffles. A DataPoint list is packed into int64 time and sample buffers instead
+        of pickling every DataPoint and its timezone aware datetimes, and is restored as ColumnarData.
+        """
+        state = self.__dict__.copy()
+        state['_time_index'] = None
+        state['_time_index_key'] = None
+        state['_time_index_sorted'] = True
+
+        if isinstance(self._data, list) and len(self._data) > 0:
+            try:
+                state['_data'] = ColumnarData.from_datapoints(self._data)
+            except (AttributeError, TypeError, ValueError):
+                # Not DataPoints with datetime start times, pickle the list unchanged
+                pass
+        return state
+
+    def __getitem__(self, item):
+        """
+        stream[t0:t1] with datetime bounds is a time slice (see time_slice), any other key indexes the data
+        """
+        if isinstance(item, slice) and (isinstance(item.start, datetime) or isinstance(item.stop, datetime)):
+            return self.time_slice(item.start, item.stop)
+        return self._data[item]
@@ -0,0 +1,269 @@
+# Copyright (c) 2017, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from datetime import datetime, tzinfo
+from typing import List
+
+import numpy as np
+
+from cerebralcortex.kernel.datatypes.columnardata import ColumnarData, as_columnar, concatenate, \
+    datetime_to_epoch_us, epoch_us_to_datetime
+from cerebralcortex.kernel.datatypes.datapoint import DataPoint
+
+
+class RegularSignal:
+    def __init__(self,
+                 start_time: int,
+                 sampling_frequency: float,
+                 samples: np.ndarray,
+                 time_zone: tzinfo = None):
+        """
+        Uniformly sampled signal stored as a start time, a sampling frequency and the sample array. Sample i is at
+        start_time + round(i * 1e6 / sampling_frequency) epoch microseconds; timestamps are computed when asked for
+        and never stored. Time lookups, slicing and windowing are index arithmetic. Indexing and iteration return
+        DataPoints like ColumnarData, slicing returns a RegularSignal sharing the sample array whose timestamps are
+        exactly those of the sliced samples.
+
+        :param start_time: epoch microseconds of the first sample
+        :param sampling_frequency: Hz
+        :param samples: array whose first axis is time
+        :param time_zone: timezone used when presenting timestamps as datetimes
+        """
+        if sampling_frequency <= 0:
+            raise ValueError('sampling_frequency must be positive')
+        self._origin = int(start_time)
+        self._origin_frequency = float(sampling_frequency)
+        self._period = 1e6 / self._origin_frequency
+        self._samples = np.asarray(samples)
+        self._time_zone = time_zone
+
+        # Sample i sits at grid index offset + i * step of the origin's grid, so slices of a signal keep rounding
+        # their timestamps exactly like the signal they were taken from
+        self._offset = 0
+        self._step = 1
+
+    def _slice(self, samples: np.ndarray, first: int, step: int):
+        result = RegularSignal(self._origin, self._origin_frequency, samples, self._time_zone)
+        result._offset = self._offset + first * self._step
+        result._step = self._step * step
+        return result
+
+    @property
+    def start_time(self) -> int:
+        return self.timestamp(0)
+
+    @property
+    def end_time(self) -> int:
+        """
+        :return: epoch microseconds of the last sample, the start time for an empty signal
+        """
+        return self.timestamp(max(0, len(self) - 1))
+
+    @property
+    def sampling_frequency(self) -> float:
+        return self._origin_frequency / self._step
+
+    @property
+    def samples(self) -> np.ndarray:
+        return self._samples
+
+    @property
+    def time_zone(self) -> tzinfo:
+        return self._time_zone
+
+    @property
+    def start_times(self) -> np.ndarray:
+        """
+        :return: int64 epoch microseconds of every sample, computed on each access
+        """
+        return self.timestamp(np.arange(len(self), dtype=np.int64))
+
+    @property
+    def is_sorted(self) -> bool:
+        return True
+
+    def timestamp(self, index):
+        """
+        :param index: sample index or array of indices
+        :return: epoch microseconds, int for a single index
+        """
+        if np.ndim(index) == 0:
+            return self._origin + int(round((self._offset + int(index) * self._step) * self._period))
+        grid = self._offset + np.asarray(index, dtype=np.int64) * self._step
+        return self._origin + np.round(grid * self._period).astype(np.int64)
+
+    def searchsorted(self, timestamp, side: str = 'left'):
+        """
+        Insertion index of timestamps computed from the sampling grid, equivalent to numpy.searchsorted over
+        start_times
+
+        :param timestamp: datetime, epoch microseconds or an array of epoch microseconds
+        :param side: 'left' or 'right', as numpy.searchsorted
+        :return: insertion index or indices
+        """
+        if isinstance(timestamp, datetime):
+            timestamp = datetime_to_epoch_us(timestamp)
+        target = np.asarray(timestamp, dtype=np.int64)
+        if side == 'right':
+            target = target + 1
+
+        # Estimate from the grid, then step once to absorb the rounding of sample times
+        grid = (target - self._origin - 0.5) / self._period
+        index = np.ceil((grid - self._offset) / self._step).astype(np.int64)
+        index -= self.timestamp(index - 1) >= target
+        index += self.timestamp(index) < target
+        index = np.clip(index, 0, len(self))
+
+        if index.ndim == 0:
+            return int(index)
+        return index
+
+    def time_slice(self, start_time: datetime = None, end_time: datetime = None):
+        """
+        Samples with start_time <= t < end_time
+
+        :param start_time: inclusive lower bound, None for no bound
+        :param end_time: exclusive upper bound, None for no bound
+        :return: RegularSignal sharing this signal's samples
+        """
+        low = 0 if start_time is None else self.searchsorted(start_time)
+        high = len(self) if end_time is None else self.searchsorted(end_time)
+        return self[low:max(low, high)]
+
+    def nearest_index(self, timestamp: datetime) -> int:
+        """
+        Index of the sample whose time is closest to timestamp, ties go to the earlier sample
+
+        :param timestamp: datetime
+        :return: index, or None for an empty signal
+        """
+        if len(self) == 0:
+            return None
+        target = datetime_to_epoch_us(timestamp)
+        index = self.searchsorted(target)
+        if index == len(self):
+            return index - 1
+        if index > 0 and target - self.timestamp(index - 1) <= self.timestamp(index) - target:
+            return index - 1
+        return index
+
+    def datapoint(self, index: int) -> DataPoint:
+        sample = self._samples[index]
+        if self._samples.dtype != object:
+            sample = sample.tolist()
+        return DataPoint(epoch_us_to_datetime(self.timestamp(index), self._time_zone), None, sample)
+
+    def view(self):
+        """
+        :return: RegularSignal on the same grid whose samples are a read-only view of this signal's samples
+        """
+        samples = self._samples.view()
+        samples.flags.writeable = False
+        return self._slice(samples, 0, 1)
+
+    def to_columnar(self) -> ColumnarData:
+        """
+        :return: ColumnarData with materialized start times, sharing the sample array
+        """
+        return ColumnarData(self.start_times, self._samples, None, self._time_zone)
+
+    def to_datapoints(self) -> List[DataPoint]:
+        return self.to_columnar().to_datapoints()
+
+    def __len__(self):
+        return len(self._samples)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.datapoint(i)
+
+    def __getitem__(self, item):
+        if isinstance(item, (int, np.integer)):
+            if item < 0:
+                item += len(self)
+            if not 0 <= item < len(self):
+                raise IndexError('RegularSignal index out of range')
+            return self.datapoint(item)
+
+        if isinstance(item, slice):
+            first, _, step = item.indices(len(self))
+            if step < 0:
+                raise ValueError('RegularSignal slices must have a positive step')
+            return self._slice(self._samples[item], first, step)
+
+        # Fancy or boolean indexing loses the regular grid
+        return self.to_columnar()[item]
+
+    def __str__(self):
+        return str(self.to_datapoints())
+
+    def __repr__(self):
+        return 'RegularSignal(' + str(len(self)) + ' samples at ' + str(self.sampling_frequency) + ' Hz from ' + \
+               str(self.start_time) + ', samples ' + str(self._samples.dtype) + str(self._samples.shape[1:]) + ')'
+
+
+def regular_segments(data,
+                     sampling_frequency: float,
+                     tolerance: float = 0.25) -> List[RegularSignal]:
+    """
+    Split uniformly sampled data, e.g. the output of timestamp_correct, into RegularSignals at its gaps. A segment
+    ends before the first point whose time is more than tolerance sampling intervals away from the segment's grid,
+    so timestamps of the segments differ from the input by at most that much.
+
+    :param data: ColumnarData or List[DataPoint] sorted by start time
+    :param sampling_frequency: Hz
+    :param tolerance: allowed deviation from the grid in sampling intervals
+    :return: List[RegularSignal] in time order
+    """
+    data = as_columnar(data)
+    if len(data) == 0:
+        return []
+
+    period = 1e6 / sampling_frequency
+    limit = tolerance * period
+    start_times = data.start_times
+
+    # Gaps and irregular spacing split the data first, drift within a piece splits it further
+    breaks = np.flatnonzero(np.abs(np.diff(start_times) - period) > limit) + 1
+    bounds = np.concatenate(([0], breaks, [len(data)]))
+
+    segments = []
+    for first, end in zip(bounds[:-1], bounds[1:]):
+        while first < end:
+            offsets = start_times[first:end] - start_times[first]
+            deviation = np.abs(offsets - np.round(np.arange(end - first) * period))
+            outside = np.flatnonzero(deviation > limit)
+            stop = end if len(outside) == 0 else first + int(outside[0])
+            segments.append(RegularSignal(start_times[first], sampling_frequency, data.samples[first:stop],
+                                          data.time_zone))
+            first = stop
+    return segments
+
+
+def join_segments(segments: List[RegularSignal]) -> ColumnarData:
+    """
+    :param segments: List[RegularSignal], all with the same sample shape
+    :return: ColumnarData holding the points of all segments in order
+    """
+    return concatenate([s.to_columnar() for s in segments])
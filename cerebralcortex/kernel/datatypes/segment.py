@@ -0,0 +1,175 @@
+# Copyright (c) 2017, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import json
+import struct
+from typing import Union
+from uuid import UUID
+
+import numpy as np
+import pytz
+
+from cerebralcortex.kernel.datatypes.columnardata import ColumnarData, as_columnar
+from cerebralcortex.kernel.datatypes.datastream import DataStream
+
+MAGIC = b'CCSEG\x00\x01\x00'
+ALIGNMENT = 64
+
+# Segment layout (all integers little endian):
+#   8 bytes   MAGIC
+#   8 bytes   uint64 length of the JSON header
+#   n bytes   JSON header, padded with spaces to a multiple of ALIGNMENT
+#   int64     start times in epoch microseconds, count values
+#   int64     end times (optional), count values
+#   samples   sample_dtype values of shape (count,) + sample_shape
+# Every array starts on an ALIGNMENT byte boundary; the header stores the offsets.
+
+
+def _aligned(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def encode_identifier(value):
+    """
+    JSON representation of a stream identifier, UUIDs are stored as strings
+    """
+    if value is None or isinstance(value, (int, str)):
+        return value
+    return str(value)
+
+
+def decode_identifier(value):
+    """
+    Inverse of encode_identifier, strings that parse as UUIDs become UUIDs again
+    """
+    if isinstance(value, str):
+        try:
+            return UUID(value)
+        except ValueError:
+            return value
+    return value
+
+
+def write_segment(filename: str,
+                  datastream: DataStream,
+                  sampling_frequency: float = None):
+    """
+    Write a DataStream as a binary segment that read_segment can memory map
+
+    :param filename: output path
+    :param datastream: stream with numeric samples
+    :param sampling_frequency: nominal sampling frequency stored in the header
+    """
+    data = as_columnar(datastream.data if datastream.data is not None else [])
+    if data.samples.dtype == object:
+        raise ValueError('Segments can only store numeric samples')
+
+    samples = np.ascontiguousarray(data.samples, dtype=data.samples.dtype.newbyteorder('<'))
+    start_times = np.ascontiguousarray(data.start_times, dtype='<i8')
+    end_times = None if data.end_times is None else np.ascontiguousarray(data.end_times, dtype='<i8')
+
+    header = {'identifier': encode_identifier(datastream.identifier),
+              'owner': encode_identifier(datastream.user),
+              'name': encode_identifier(datastream.name),
+              'description': datastream.description,
+              'sampling_frequency': sampling_frequency,
+              'time_zone': getattr(data.time_zone, 'zone', None),
+              'count': len(data),
+              'sample_dtype': samples.dtype.str,
+              'sample_shape': list(samples.shape[1:])}
+
+    # Offsets depend on the header length, which depends on the offsets: reserve room for them first
+    header.update({'start_times_offset': 0, 'end_times_offset': None if end_times is None else 0,
+                   'samples_offset': 0})
+    header_length = _aligned(len(MAGIC) + 8 + len(json.dumps(header)) + 64) - len(MAGIC) - 8
+
+    offset = len(MAGIC) + 8 + header_length
+    header['start_times_offset'] = offset
+    offset = _aligned(offset + start_times.nbytes)
+    if end_times is not None:
+        header['end_times_offset'] = offset
+        offset = _aligned(offset + end_times.nbytes)
+    header['samples_offset'] = offset
+
+    encoded = json.dumps(header).encode('utf-8').ljust(header_length)
+
+    with open(filename, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<Q', header_length))
+        f.write(encoded)
+        for offset, array in [(header['start_times_offset'], start_times),
+                              (header['end_times_offset'], end_times),
+                              (header['samples_offset'], samples)]:
+            if array is None:
+                continue
+            f.write(b'\0' * (offset - f.tell()))
+            f.write(array.tobytes())
+
+
+def read_segment_header(filename: str) -> dict:
+    """
+    :param filename: segment path
+    :return: the segment's JSON header
+    """
+    with open(filename, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(filename + ' is not a DataStream segment')
+        header_length, = struct.unpack('<Q', f.read(8))
+        return json.loads(f.read(header_length).decode('utf-8'))
+
+
+def read_segment(filename: str, mmap: bool = True) -> DataStream:
+    """
+    Open a segment written by write_segment. With mmap the arrays are read-only numpy.memmap views of the file,
+    so opening is instant and processes reading the same segment share the page cache.
+
+    :param filename: segment path
+    :param mmap: memory map the arrays instead of reading them into memory
+    :return: DataStream backed by ColumnarData
+    """
+    header = read_segment_header(filename)
+    count = header['count']
+
+    def array(offset: Union[int, None], dtype, shape):
+        if offset is None:
+            return None
+        if mmap and count > 0:
+            return np.memmap(filename, dtype=dtype, mode='r', offset=offset, shape=shape)
+        with open(filename, 'rb') as f:
+            f.seek(offset)
+            return np.fromfile(f, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+
+    start_times = array(header['start_times_offset'], '<i8', (count,))
+    end_times = array(header['end_times_offset'], '<i8', (count,))
+    samples = array(header['samples_offset'], np.dtype(header['sample_dtype']),
+                    tuple([count] + header['sample_shape']))
+
+    time_zone = None if header['time_zone'] is None else pytz.timezone(header['time_zone'])
+
+    datastream = DataStream(identifier=decode_identifier(header['identifier']),
+                            owner=decode_identifier(header['owner']),
+                            name=decode_identifier(header['name']),
+                            description=header['description'])
+    datastream.data = ColumnarData(start_times, samples, end_times, time_zone)
+    return datastream
@@ -24,7 +24,9 @@
 from typing import List
 from uuid import UUID
 
+from cerebralcortex.kernel.datatypes.columnardata import ColumnarData
 from cerebralcortex.kernel.datatypes.datapoint import DataPoint
+from cerebralcortex.kernel.datatypes.regularsignal import RegularSignal
 from cerebralcortex.kernel.datatypes.subtypes import StreamReference, DataDescriptor, ExecutionContext
 
 
@@ -124,11 +126,18 @@ class Stream:
 
     @data.setter
     def data(self, value):
-        result = []
-        for dp in value:
-            result.append(DataPoint(dp.start_time, dp.end_time, dp.sample))
-            #result.append(DataPoint(self._identifier, dp.start_time, dp.end_time, dp.sample))
-        self._data = result
+        """
+        Assign stream data without copying individual DataPoints. DataPoints are read-only so a list is adopted
+        as-is (the caller hands over ownership). ColumnarData is shared through a copy-on-write view, so derived
+        streams built from another stream's data do not duplicate its arrays until one of them is modified. A
+        RegularSignal is kept as a read-only view, so its timestamps stay implicit.
+        """
+        if isinstance(value, (ColumnarData, RegularSignal)):
+            self._data = value.view()
+        elif isinstance(value, list):
+            self._data = value
+        else:
+            self._data = list(value)
 
     @classmethod
     def from_datastream(cls, input_streams: List):
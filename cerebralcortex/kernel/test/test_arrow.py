@@ -0,0 +1,145 @@
+# Copyright (c) 2017, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+import uuid
+
+import numpy as np
+import pytz
+
+from cerebralcortex.kernel.datatypes import arrow
+from cerebralcortex.kernel.datatypes.columnardata import ColumnarData, NO_TIME
+from cerebralcortex.kernel.datatypes.datapoint import DataPoint
+from cerebralcortex.kernel.datatypes.datastream import DataStream
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+@unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+class TestArrow(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.tz = pytz.timezone('US/Central')
+        self.start_times = 1484929672918273 + np.arange(1000, dtype=np.int64) * 15625
+        self.ds = DataStream(uuid.uuid4(), uuid.uuid4(), 'ecg', 'test stream')
+        self.ds.data = ColumnarData(self.start_times, np.arange(1000) * 0.5, time_zone=self.tz)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def assertStreamEqual(self, expected, result):
+        self.assertTrue(np.array_equal(expected.start_times, result.start_times))
+        self.assertTrue(np.array_equal(expected.samples, result.samples))
+        if expected.end_times is None:
+            self.assertIsNone(result.end_times)
+        else:
+            self.assertTrue(np.array_equal(expected.end_times, result.end_times))
+
+    def test_arrow_roundtrip(self):
+        table = arrow.to_arrow(self.ds)
+        self.assertEqual(table.num_rows, 1000)
+        self.assertEqual(table.schema.field('start_time').type.tz, 'US/Central')
+
+        result = arrow.from_arrow(table)
+        self.assertEqual(result.identifier, self.ds.identifier)
+        self.assertEqual(result.user, self.ds.user)
+        self.assertEqual(result.name, 'ecg')
+        self.assertStreamEqual(self.ds.data, result.data)
+        self.assertEqual(result.data[10].start_time, self.ds.data[10].start_time)
+
+    def test_datapoint_list(self):
+        start = datetime.datetime.fromtimestamp(1484929672.918273, tz=self.tz)
+        ds = DataStream(None, None)
+        ds.data = [DataPoint(start + datetime.timedelta(seconds=i), start + datetime.timedelta(seconds=i + 1), i)
+                   for i in range(10)]
+        result = arrow.from_arrow(arrow.to_arrow(ds))
+        self.assertEqual(result.data[3].start_time, ds.data[3].start_time)
+        self.assertEqual(result.data[3].end_time, ds.data[3].end_time)
+        self.assertEqual(result.data[3].sample, 3)
+
+    def test_end_times_and_matrix_samples(self):
+        end_times = self.start_times + 1000
+        end_times[5] = NO_TIME
+        self.ds.data = ColumnarData(self.start_times, np.arange(3000.0).reshape(1000, 3), end_times, self.tz)
+        table = arrow.to_arrow(self.ds)
+        self.assertEqual(table.column('end_time').null_count, 1)
+
+        result = arrow.from_arrow(table).data
+        self.assertStreamEqual(self.ds.data, result)
+        self.assertIsNone(result[5].end_time)
+
+    def test_object_samples(self):
+        ds = DataStream(None, None)
+        ds.data = [DataPoint.from_tuple(datetime.datetime.now(tz=self.tz), [1, 2, 3]),
+                   DataPoint.from_tuple(datetime.datetime.now(tz=self.tz), [4])]
+        result = arrow.from_arrow(arrow.to_arrow(ds))
+        self.assertEqual(result.data[1].sample, [4])
+
+    def test_parquet_time_filter(self):
+        filename = os.path.join(self.directory, 'ecg.parquet')
+        arrow.write_parquet(filename, self.ds, row_group_size=100)
+
+        self.assertStreamEqual(self.ds.data, arrow.read_parquet(filename).data)
+
+        start = self.ds.data[250].start_time
+        end = self.ds.data[600].start_time
+        result = arrow.read_parquet(filename, start, end)
+        self.assertStreamEqual(self.ds.data[250:600], result.data)
+        self.assertEqual(result.identifier, self.ds.identifier)
+
+    def test_features(self):
+        window_ends = self.start_times[::100] + 2000000
+        features = []
+        for i in range(3):
+            feature = DataStream(None, None)
+            feature.data = ColumnarData(self.start_times[::100], np.arange(10.0) + i, window_ends, self.tz)
+            features.append(feature)
+        names = ['mean', 'median', 'variance']
+
+        table = arrow.features_to_arrow(features, names)
+        self.assertEqual(table.num_rows, 30)
+
+        result = arrow.features_from_arrow(table)
+        self.assertEqual(sorted(result.keys()), names)
+        self.assertStreamEqual(features[1].data, result['median'].data)
+
+        filename = os.path.join(self.directory, 'features.parquet')
+        arrow.write_features_parquet(filename, features, names)
+        result = arrow.read_features_parquet(filename, ['variance'], start_time=features[0].data[5].start_time)
+        self.assertEqual(list(result.keys()), ['variance'])
+        self.assertStreamEqual(features[2].data[5:], result['variance'].data)
+
+        with self.assertRaises(ValueError):
+            arrow.features_to_arrow(features, names[:2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+# Copyright (c) 2017, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import datetime
+import unittest
+
+import numpy as np
+import pytz
+
+from cerebralcortex.kernel.datatypes.columnardata import ColumnarData, as_columnar, datetime_to_epoch_us, \
+    epoch_us_to_datetime, seconds_to_epoch_us, stack
+from cerebralcortex.kernel.datatypes.datapoint import DataPoint
+from cerebralcortex.kernel.datatypes.datastream import DataStream
+
+
+class TestColumnarData(unittest.TestCase):
+    def setUp(self):
+        self.tz = pytz.timezone('US/Central')
+        self.start = datetime.datetime.fromtimestamp(1484929672.918273, tz=self.tz)
+        self.data = [DataPoint.from_tuple(self.start + datetime.timedelta(seconds=i / 64.0), i * 2.0)
+                     for i in range(100)]
+
+    def test_epoch_conversion(self):
+        us = datetime_to_epoch_us(self.start)
+        self.assertEqual(us, 1484929672918273)
+        self.assertEqual(epoch_us_to_datetime(us, self.tz), self.start)
+
+        naive = datetime.datetime.now()
+        self.assertEqual(epoch_us_to_datetime(datetime_to_epoch_us(naive)), naive)
+
+        seconds = self.start.timestamp() + np.array([0.0, 1 / 64.0, 2.5e-6, 3.5e-6])
+        self.assertListEqual(seconds_to_epoch_us(seconds).tolist(),
+                             [datetime_to_epoch_us(datetime.datetime.fromtimestamp(s, tz=self.tz)) for s in seconds])
+
+    def test_from_datapoints(self):
+        columns = ColumnarData.from_datapoints(self.data)
+        self.assertEqual(len(columns), 100)
+        self.assertEqual(columns.start_times.dtype, np.int64)
+        self.assertIsNone(columns.end_times)
+        self.assertTrue(np.array_equal(columns.samples, np.arange(100) * 2.0))
+
+        for original, view in zip(self.data, columns):
+            self.assertEqual(original.start_time, view.start_time)
+            self.assertEqual(original.sample, view.sample)
+            self.assertIsNone(view.end_time)
+
+    def test_indexing(self):
+        columns = ColumnarData.from_datapoints(self.data)
+        self.assertIsInstance(columns[3], DataPoint)
+        self.assertEqual(columns[-1].start_time, self.data[-1].start_time)
+        self.assertRaises(IndexError, columns.__getitem__, 100)
+
+        tail = columns[10:20]
+        self.assertIsInstance(tail, ColumnarData)
+        self.assertEqual(len(tail), 10)
+        self.assertTrue(np.shares_memory(tail.samples, columns.samples))
+        self.assertEqual(tail[0].sample, 20.0)
+
+    def test_end_times_and_vectors(self):
+        data = [DataPoint.from_tuple(self.start, [1, 2, 3], self.start + datetime.timedelta(seconds=1)),
+                DataPoint.from_tuple(self.start + datetime.timedelta(seconds=1), [4, 5, 6])]
+        columns = ColumnarData.from_datapoints(data)
+        self.assertEqual(columns.samples.shape, (2, 3))
+        self.assertEqual(columns[0].end_time, data[0].end_time)
+        self.assertIsNone(columns[1].end_time)
+        self.assertEqual(columns[1].sample, [4, 5, 6])
+
+    def test_object_samples(self):
+        data = [DataPoint.from_tuple(self.start, {'Foo': 1}), DataPoint.from_tuple(self.start, None)]
+        columns = ColumnarData.from_datapoints(data)
+        self.assertEqual(columns.samples.dtype, object)
+        self.assertDictEqual(columns[0].sample, {'Foo': 1})
+        self.assertIsNone(columns[1].sample)
+
+    def test_datastream_adopts_columns(self):
+        columns = as_columnar(self.data)
+        self.assertIs(as_columnar(columns), columns)
+
+        ds = DataStream(None, None)
+        ds.data = columns
+        self.assertIsInstance(ds.data, ColumnarData)
+        self.assertTrue(np.shares_memory(ds.data.samples, columns.samples))
+
+        derived = DataStream.from_datastream([ds])
+        derived.data = ds.data
+        self.assertTrue(np.shares_memory(derived.data.samples, columns.samples))
+
+    def test_datastream_adopts_list(self):
+        ds = DataStream(None, None)
+        ds.data = self.data
+        self.assertIs(ds.data, self.data)
+
+        ds.data = (dp for dp in self.data)
+        self.assertEqual(len(ds.data), 100)
+
+    def test_copy_on_write(self):
+        columns = ColumnarData.from_datapoints(self.data)
+        view = columns[0:50]
+        self.assertFalse(view.samples.flags.writeable)
+        self.assertRaises(ValueError, view.samples.__setitem__, 0, 1.0)
+
+        view[0] = DataPoint.from_tuple(self.start, -1.0)
+        self.assertEqual(view[0].sample, -1.0)
+        self.assertEqual(columns[0].sample, 0.0)
+        self.assertFalse(np.shares_memory(view.samples, columns.samples))
+
+        columns[1] = DataPoint.from_tuple(self.start, -2.0, self.start)
+        self.assertEqual(columns[1].sample, -2.0)
+        self.assertEqual(columns[1].end_time, self.start)
+        self.assertEqual(view[1].sample, 2.0)
+
+    def test_nearest_indices(self):
+        columns = ColumnarData.from_datapoints(self.data)
+        times = columns.start_times
+        targets = np.array([times[0] - 10, times[3], times[3] + 7812, times[3] + 7813, times[-1] + 10])
+        self.assertListEqual(columns.nearest_indices(targets).tolist(), [0, 3, 3, 4, 99])
+        for target in targets:
+            self.assertEqual(columns.nearest_indices([target])[0],
+                             columns.nearest_index(epoch_us_to_datetime(target, self.tz)))
+
+        self.assertListEqual(columns[:1].nearest_indices(targets).tolist(), [0] * 5)
+        self.assertRaises(ValueError, columns[:0].nearest_indices, targets)
+
+    def test_stack_channels(self):
+        x = ColumnarData.from_datapoints(self.data)
+        y = ColumnarData.from_datapoints(self.data[::-1])
+        xy = stack([x, y])
+        self.assertEqual(xy.channels, 2)
+        self.assertEqual(x.channels, 1)
+        self.assertEqual(xy.samples.shape, (100, 2))
+        self.assertTrue(np.array_equal(xy.start_times, x.start_times))
+        self.assertEqual(xy[0].sample, [0.0, 198.0])
+
+        second = xy.channel(1)
+        self.assertTrue(np.array_equal(second.samples, y.samples))
+        self.assertTrue(np.shares_memory(second.samples, xy.samples))
+        self.assertFalse(second.samples.flags.writeable)
+
+        self.assertRaises(ValueError, stack, [])
+        self.assertRaises(ValueError, stack, [x, y[:50]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -22,7 +22,9 @@
 # OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
+import copy
 import datetime
+import pickle
 import unittest
 
 from cerebralcortex.kernel.datatypes.datapoint import DataPoint
@@ -50,5 +52,35 @@ class TestDataPoint(unittest.TestCase):
         self.assertEqual(dp.end_time, ts)
         self.assertEqual(dp.sample, [1, 2, 3])
 
+    def test_immutable(self):
+        ts = datetime.datetime.now()
+        dp = DataPoint.from_tuple(start_time=ts, sample=1)
+        self.assertFalse(hasattr(dp, '__dict__'))
+        with self.assertRaises(AttributeError):
+            dp.sample = 2
+        with self.assertRaises(AttributeError):
+            dp.foo = 2
+        self.assertEqual(dp.sample, 1)
+
+    def test_pickle(self):
+        ts = datetime.datetime.now()
+        dp = pickle.loads(pickle.dumps(DataPoint.from_tuple(start_time=ts, end_time=ts, sample=[1, 2])))
+        self.assertEqual(dp.start_time, ts)
+        self.assertEqual(dp.end_time, ts)
+        self.assertEqual(dp.sample, [1, 2])
+        self.assertEqual(copy.copy(dp).sample, [1, 2])
+
+    def test_classmethod_from_arrays(self):
+        ts = [datetime.datetime.now() + datetime.timedelta(seconds=i) for i in range(10)]
+        data = DataPoint.from_arrays(ts, range(10))
+        self.assertEqual(len(data), 10)
+        self.assertEqual(data[3].start_time, ts[3])
+        self.assertEqual(data[3].sample, 3)
+        self.assertIsNone(data[3].end_time)
+
+        data = DataPoint.from_arrays(ts, range(10), ts)
+        self.assertEqual(data[9].end_time, ts[9])
+
+
 if __name__ == '__main__':
     unittest.main()
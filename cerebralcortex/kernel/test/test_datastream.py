@@ -22,9 +22,13 @@
 # OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 import datetime
+import pickle
 import unittest
 from uuid import uuid4
 
+import pytz
+
+from cerebralcortex.kernel.datatypes.columnardata import as_columnar
 from cerebralcortex.kernel.datatypes.datapoint import DataPoint
 from cerebralcortex.kernel.datatypes.datastream import DataStream
 from cerebralcortex.kernel.datatypes.enumerations import StreamTypes
@@ -61,6 +65,90 @@ class TestDataStream(unittest.TestCase):
 
         self.assertEqual(ds.datastream_type, StreamTypes.DATASTREAM)
 
+    def test_time_slice(self):
+        start = datetime.datetime.fromtimestamp(1484929672, tz=pytz.timezone('US/Central'))
+        data = [DataPoint.from_tuple(start + datetime.timedelta(seconds=i), i) for i in range(100)]
+
+        for ds in [DataStream(None, None, data=data), DataStream(None, None, data=as_columnar(data))]:
+            with self.subTest(data=type(ds.data)):
+                self.assertTrue(ds.is_sorted)
+                window = ds[start + datetime.timedelta(seconds=10):start + datetime.timedelta(seconds=20)]
+                self.assertEqual([dp.sample for dp in window], list(range(10, 20)))
+
+                self.assertEqual(len(ds.time_slice(end_time=start)), 0)
+                self.assertEqual(len(ds.time_slice(start_time=start + datetime.timedelta(seconds=95))), 5)
+                self.assertEqual(ds[5].sample, 5)
+
+                self.assertEqual(ds.nearest(start + datetime.timedelta(seconds=41.4)).sample, 41)
+                self.assertEqual(ds.nearest(start + datetime.timedelta(seconds=41.6)).sample, 42)
+                self.assertEqual(ds.nearest(start - datetime.timedelta(seconds=10)).sample, 0)
+                self.assertEqual(ds.nearest(start + datetime.timedelta(seconds=1000)).sample, 99)
+
+    def test_time_slice_unsorted(self):
+        start = datetime.datetime.fromtimestamp(1484929672, tz=pytz.timezone('US/Central'))
+        data = [DataPoint.from_tuple(start + datetime.timedelta(seconds=i), i) for i in [5, 1, 4, 2, 3]]
+
+        for ds in [DataStream(None, None, data=data), DataStream(None, None, data=as_columnar(data))]:
+            with self.subTest(data=type(ds.data)):
+                self.assertFalse(ds.is_sorted)
+                window = ds.time_slice(start + datetime.timedelta(seconds=2), start + datetime.timedelta(seconds=5))
+                self.assertEqual([dp.sample for dp in window], [4, 2, 3])
+                self.assertEqual(ds.nearest(start + datetime.timedelta(seconds=4.2)).sample, 4)
+
+    def test_time_index_reassigned(self):
+        tz = pytz.timezone('US/Central')
+        start = datetime.datetime.fromtimestamp(1484929672.918273, tz=tz)
+
+        def points(hour):
+            offset = start + datetime.timedelta(hours=hour)
+            return [DataPoint.from_tuple(offset + datetime.timedelta(seconds=i), hour) for i in range(10)]
+
+        def samples(hour):
+            offset = start + datetime.timedelta(hours=hour)
+            return [dp.sample for dp in ds.time_slice(offset, offset + datetime.timedelta(seconds=5))]
+
+        ds = DataStream(None, None)
+        for trial in range(20):
+            ds.data = points(trial)
+            self.assertEqual(samples(trial), [trial] * 5)
+
+            # A new list of equal length can reuse the memory, and so the id, of the indexed list
+            ds.data = []
+            ds.data = points(trial + 100)
+            self.assertEqual(samples(trial + 100), [trial + 100] * 5)
+
+        # Points replaced in place are picked up after an explicit refresh
+        ds.data = [DataPoint.from_tuple(start + datetime.timedelta(seconds=i), i) for i in range(10)]
+        self.assertEqual(ds.nearest(start - datetime.timedelta(days=1)).sample, 0)
+        ds.data[0] = DataPoint.from_tuple(start - datetime.timedelta(days=1), -1)
+        ds.refresh_index()
+        self.assertEqual(ds.nearest(start - datetime.timedelta(days=1)).sample, -1)
+
+    def test_pickle(self):
+        tz = pytz.timezone('US/Central')
+        start = datetime.datetime.fromtimestamp(1484929672.918273, tz=tz)
+        ds = DataStream(uuid4(), self.user, 'ecg', 'pickled', self.dd, self.ec, self.annotations)
+        ds.data = [DataPoint(start + datetime.timedelta(seconds=i / 64.0),
+                             start + datetime.timedelta(seconds=i / 64.0 + 60) if i % 7 else None,
+                             i * 3) for i in range(1000)]
+
+        result = pickle.loads(pickle.dumps(ds))
+        self.assertEqual(result.identifier, ds.identifier)
+        self.assertEqual(result.name, 'ecg')
+        self.assertEqual(result.execution_context._processing_module, 88)
+        self.assertEqual(len(result.data), 1000)
+        for original, restored in zip(ds.data, result.data):
+            self.assertEqual(original.start_time, restored.start_time)
+            self.assertEqual(original.end_time, restored.end_time)
+            self.assertEqual(original.sample, restored.sample)
+        self.assertEqual(result.time_slice(start, start + datetime.timedelta(seconds=1))[-1].sample, 63 * 3)
+
+        ds.data = [DataPoint.from_tuple(start, {'label': 'walking'})]
+        self.assertEqual(pickle.loads(pickle.dumps(ds)).data[0].sample, {'label': 'walking'})
+
+        ds.data = []
+        self.assertEqual(len(pickle.loads(pickle.dumps(ds)).data), 0)
+
 
 if __name__ == '__main__':
     unittest.main()
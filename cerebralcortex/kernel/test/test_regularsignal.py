@@ -0,0 +1,172 @@
+# Copyright (c) 2017, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import datetime
+import pickle
+import unittest
+
+import numpy as np
+import pytz
+
+from cerebralcortex.data_processor.signalprocessing.window import WindowPlan, window_iter
+from cerebralcortex.kernel.datatypes.columnardata import ColumnarData, as_columnar, datetime_to_epoch_us
+from cerebralcortex.kernel.datatypes.datastream import DataStream
+from cerebralcortex.kernel.datatypes.regularsignal import RegularSignal, join_segments, regular_segments
+
+
+class TestRegularSignal(unittest.TestCase):
+    def setUp(self):
+        self.tz = pytz.timezone('US/Central')
+        self.start = 1484929672918273
+        self.samples = np.random.RandomState(5).randn(6400)
+        self.signal = RegularSignal(self.start, 64.0, self.samples, self.tz)
+
+    def test_timestamps(self):
+        self.assertEqual(len(self.signal), 6400)
+        self.assertListEqual(self.signal.start_times[:3].tolist(), [self.start, self.start + 15625, self.start + 31250])
+        self.assertEqual(self.signal.end_time, self.start + 6399 * 15625)
+
+        dp = self.signal[2]
+        self.assertEqual(datetime_to_epoch_us(dp.start_time), self.start + 31250)
+        self.assertEqual(dp.start_time.tzinfo.zone, 'US/Central')
+        self.assertEqual(dp.sample, self.samples[2])
+        self.assertEqual(datetime_to_epoch_us(self.signal[-1].start_time), self.signal.end_time)
+        with self.assertRaises(IndexError):
+            self.signal[6400]
+
+    def test_searchsorted(self):
+        random = np.random.RandomState(3)
+        for sampling_frequency in [64.0, 64.0 / 3, 64.0 / 6, 25.0, 7.0]:
+            signal = RegularSignal(self.start, sampling_frequency, self.samples)
+            times = signal.start_times
+            targets = np.concatenate((times, times - 1, times + 1,
+                                      random.randint(times[0] - 10 ** 7, times[-1] + 10 ** 7, 5000)))
+            for side in ['left', 'right']:
+                self.assertTrue(np.array_equal(signal.searchsorted(targets, side),
+                                               np.searchsorted(times, targets, side)))
+                self.assertEqual(signal.searchsorted(int(times[7]), side), np.searchsorted(times, times[7], side))
+
+    def test_slicing(self):
+        part = self.signal[100:200]
+        self.assertIsInstance(part, RegularSignal)
+        self.assertTrue(np.array_equal(part.start_times, self.signal.start_times[100:200]))
+        self.assertTrue(np.shares_memory(part.samples, self.samples))
+
+        decimated = self.signal[10::4]
+        self.assertEqual(decimated.sampling_frequency, 16.0)
+        self.assertTrue(np.array_equal(decimated.start_times, self.signal.start_times[10::4]))
+
+        picked = self.signal[np.array([1, 5, 9])]
+        self.assertIsInstance(picked, ColumnarData)
+        self.assertListEqual(picked.start_times.tolist(), self.signal.start_times[[1, 5, 9]].tolist())
+
+    def test_slice_timestamps(self):
+        random = np.random.RandomState(9)
+        signal = RegularSignal(self.start, 7.3, self.samples)
+        for _ in range(2000):
+            first, end, step = random.randint(0, 100), random.randint(100, 6400), random.randint(1, 8)
+            part = signal[first:end:step]
+            self.assertTrue(np.array_equal(part.start_times, signal.start_times[first:end:step]))
+
+        nested = signal[3::2][5:4000:3]
+        self.assertTrue(np.array_equal(nested.start_times, signal.start_times[3::2][5:4000:3]))
+        self.assertAlmostEqual(nested.sampling_frequency, 7.3 / 6)
+        times = nested.start_times
+        targets = np.concatenate((times, times - 1, times + 1))
+        for side in ['left', 'right']:
+            self.assertTrue(np.array_equal(nested.searchsorted(targets, side), np.searchsorted(times, targets, side)))
+
+    def test_time_slice(self):
+        columns = as_columnar(self.signal)
+        t0 = self.signal[100].start_time
+        t1 = self.signal[300].start_time + datetime.timedelta(microseconds=1)
+        part = self.signal.time_slice(t0, t1)
+        self.assertIsInstance(part, RegularSignal)
+        self.assertTrue(np.array_equal(part.samples, columns.time_slice(t0, t1).samples))
+        self.assertEqual(len(part), 201)
+
+        ds = DataStream(None, None, data=self.signal)
+        self.assertEqual(len(ds[t0:t1]), 201)
+
+        # Assigning through the setter keeps the implicit timestamps
+        ds = DataStream(None, None)
+        ds.data = self.signal
+        self.assertIsInstance(ds.data, RegularSignal)
+        self.assertTrue(np.array_equal(ds.data.start_times, self.signal.start_times))
+        self.assertTrue(np.shares_memory(ds.data.samples, self.samples))
+        self.assertIsInstance(ds[t0:t1], RegularSignal)
+        self.assertEqual(len(ds[t0:t1]), 201)
+        self.assertEqual(ds.nearest(t0 + datetime.timedelta(milliseconds=9)).sample, self.samples[101])
+
+    def test_windows(self):
+        plan = WindowPlan(self.signal[0].start_time, self.signal[-1].start_time, 10, 5)
+        regular = plan.bucket(self.signal)
+        columnar = plan.bucket(as_columnar(self.signal))
+        self.assertTrue(np.array_equal(regular[0], columnar[0]))
+        self.assertTrue(np.array_equal(regular[1], columnar[1]))
+
+        windows = list(window_iter(self.signal, 10, 10))
+        self.assertListEqual([k for k, _ in windows], [k for k, _ in window_iter(as_columnar(self.signal), 10, 10)])
+        self.assertTrue(all(isinstance(w, RegularSignal) for _, w in windows))
+
+    def test_pickle(self):
+        signal = pickle.loads(pickle.dumps(self.signal))
+        self.assertTrue(np.array_equal(signal.start_times, self.signal.start_times))
+        self.assertTrue(np.array_equal(signal.samples, self.samples))
+
+    def test_regular_segments(self):
+        start_times = self.start + np.arange(6400) * 15625
+        start_times[3000:] += 10 * 1000000
+        start_times[5000:] += 5000
+        start_times[5500:] += 1
+        columns = ColumnarData(start_times, np.column_stack((self.samples, -self.samples)), None, self.tz)
+
+        segments = regular_segments(columns, 64.0)
+        self.assertListEqual([len(s) for s in segments], [3000, 2000, 1400])
+        self.assertListEqual([s.start_time for s in segments], start_times[[0, 3000, 5000]].tolist())
+        self.assertEqual(segments[0].samples.shape, (3000, 2))
+
+        joined = join_segments(segments)
+        self.assertLessEqual(np.max(np.abs(joined.start_times - start_times)), 1)
+        self.assertTrue(np.array_equal(joined.samples, columns.samples))
+
+    def test_regular_segments_drift(self):
+        # A clock running 1% fast drifts off the grid by a quarter interval after 25 samples
+        start_times = self.start + np.round(np.arange(100) * 15625 * 1.01).astype(np.int64)
+        segments = regular_segments(ColumnarData(start_times, np.arange(100)), 64.0)
+        self.assertEqual(sum(len(s) for s in segments), 100)
+        self.assertTrue(all(len(s) <= 26 for s in segments))
+
+    def test_empty(self):
+        self.assertListEqual(regular_segments([], 64.0), [])
+        self.assertEqual(len(join_segments([])), 0)
+        empty = RegularSignal(self.start, 64.0, np.empty(0))
+        self.assertEqual(empty.searchsorted(self.start), 0)
+        self.assertIsNone(empty.nearest_index(self.signal[0].start_time))
+        with self.assertRaises(ValueError):
+            RegularSignal(self.start, 0, self.samples)
+
+
+if __name__ == '__main__':
+    unittest.main()
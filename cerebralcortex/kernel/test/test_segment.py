@@ -0,0 +1,140 @@
+# Copyright (c) 2017, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import datetime
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+import uuid
+
+import numpy as np
+import pytz
+
+from cerebralcortex import legacy
+from cerebralcortex.data_processor.preprocessor import parser
+from cerebralcortex.kernel.datatypes.columnardata import ColumnarData, NO_TIME
+from cerebralcortex.kernel.datatypes.datapoint import DataPoint
+from cerebralcortex.kernel.datatypes.datastream import DataStream
+from cerebralcortex.kernel.datatypes.segment import read_segment, read_segment_header, write_segment
+
+
+class TestSegment(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.tz = pytz.timezone('US/Central')
+        self.start_times = 1484929672918273 + np.arange(1000, dtype=np.int64) * 15625
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_roundtrip(self):
+        ds = DataStream(uuid.uuid4(), uuid.uuid4(), 'ecg', 'test stream')
+        ds.data = ColumnarData(self.start_times, np.arange(1000) * 0.5, time_zone=self.tz)
+
+        filename = os.path.join(self.directory, 'ecg.seg')
+        write_segment(filename, ds, 64.0)
+
+        header = read_segment_header(filename)
+        self.assertEqual(header['sampling_frequency'], 64.0)
+        self.assertEqual(header['count'], 1000)
+        self.assertEqual(header['samples_offset'] % 64, 0)
+
+        result = read_segment(filename)
+        self.assertEqual(result.identifier, ds.identifier)
+        self.assertEqual(result.user, ds.user)
+        self.assertEqual(result.name, 'ecg')
+        self.assertEqual(result.description, 'test stream')
+        self.assertFalse(result.data.samples.flags.owndata)
+        self.assertFalse(result.data.samples.flags.writeable)
+        self.assertTrue(np.array_equal(result.data.start_times, self.start_times))
+        self.assertTrue(np.array_equal(result.data.samples, np.arange(1000) * 0.5))
+        self.assertEqual(result.data[0].start_time, ds.data[0].start_time)
+        self.assertEqual(result.data[0].start_time.tzinfo.zone, 'US/Central')
+
+        in_memory = read_segment(filename, mmap=False)
+        self.assertTrue(np.array_equal(in_memory.data.samples, result.data.samples))
+
+    def test_copy_on_write(self):
+        ds = DataStream(None, None)
+        ds.data = ColumnarData(self.start_times, np.arange(1000) * 0.5, time_zone=self.tz)
+        filename = os.path.join(self.directory, 'ecg.seg')
+        write_segment(filename, ds)
+
+        result = read_segment(filename)
+        result.data[0] = DataPoint(result.data[0].start_time, None, -1.0)
+        self.assertEqual(result.data[0].sample, -1.0)
+        self.assertEqual(read_segment(filename).data[0].sample, 0.0)
+
+    def test_end_times_and_matrix_samples(self):
+        end_times = self.start_times + 1000
+        end_times[5] = NO_TIME
+        ds = DataStream(None, None)
+        ds.data = ColumnarData(self.start_times, np.arange(3000, dtype=np.int32).reshape(1000, 3), end_times,
+                               self.tz)
+        filename = os.path.join(self.directory, 'accel.seg')
+        write_segment(filename, ds)
+
+        result = read_segment(filename).data
+        self.assertEqual(result.samples.dtype, np.int32)
+        self.assertEqual(result.samples.shape, (1000, 3))
+        self.assertTrue(np.array_equal(result.end_times, end_times))
+        self.assertIsNone(result[5].end_time)
+
+    def test_empty(self):
+        ds = DataStream(None, None)
+        ds.data = []
+        filename = os.path.join(self.directory, 'empty.seg')
+        write_segment(filename, ds)
+        self.assertEqual(len(read_segment(filename).data), 0)
+
+    def test_object_samples(self):
+        ds = DataStream(None, None)
+        ds.data = [DataPoint.from_tuple(datetime.datetime.now(tz=self.tz), {'a': 1})]
+        with self.assertRaises(ValueError):
+            write_segment(os.path.join(self.directory, 'object.seg'), ds)
+
+    def test_legacy_convert(self):
+        os.mkdir(os.path.join(self.directory, 'SI01'))
+        metadata = {'participant': 'SI01', 'datasource': 'ecg'}
+        basedir = self.directory + '/'
+        with gzip.open(legacy.find(basedir, metadata), 'wt') as f:
+            for i in range(500):
+                f.write('%d %d\n' % (i, 1484929672918 + i * 16))
+
+        filename = legacy.convert(basedir, metadata, 64.0)
+        self.assertEqual(filename, legacy.find_segment(basedir, metadata))
+
+        converted = legacy.load(basedir, metadata).data
+        parsed = parser.read_file(legacy.find(basedir, metadata))
+        self.assertTrue(np.array_equal(converted.start_times, parsed.start_times))
+        self.assertTrue(np.array_equal(converted.samples, parsed.samples))
+
+        chunks = list(parser.iter_file_chunks(filename, duration=1.0, block_size=1024))
+        self.assertEqual(sum(len(chunk) for _, chunk in chunks), 500)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -22,7 +22,55 @@
 # OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
+import os
+
+from cerebralcortex.data_processor.preprocessor import parser
+from cerebralcortex.kernel.datatypes.datastream import DataStream
+from cerebralcortex.kernel.datatypes.segment import read_segment, write_segment
+
 
 def find(directory, metadata):
     filepath = directory + metadata['participant'] + '/' + metadata['datasource'] + '.txt.gz'
     return filepath
+
+
+def find_segment(directory, metadata):
+    filepath = directory + metadata['participant'] + '/' + metadata['datasource'] + '.seg'
+    return filepath
+
+
+def convert(directory, metadata, sampling_frequency=None, time_zone=None):
+    """
+    Convert a legacy gzipped "value timestamp" file into a memory mappable segment stored next to it
+
+    :param directory: root directory of the legacy layout
+    :param metadata: dict with 'participant' and 'datasource'
+    :param sampling_frequency: nominal sampling frequency recorded in the segment header
+    :param time_zone: timezone of the recording, the study timezone when None
+    :return: path of the written segment
+    """
+    datastream = DataStream(None, metadata['participant'], metadata['datasource'])
+    datastream.data = parser.read_file(find(directory, metadata), time_zone=time_zone)
+
+    filepath = find_segment(directory, metadata)
+    write_segment(filepath, datastream, sampling_frequency)
+    return filepath
+
+
+def load(directory, metadata, time_zone=None):
+    """
+    Open a participant's datasource, preferring a converted segment over the legacy gzipped file
+
+    :param directory: root directory of the legacy layout
+    :param metadata: dict with 'participant' and 'datasource'
+    :param time_zone: timezone of the recording when read from the legacy file, the study timezone when None;
+        segments store their own
+    :return: DataStream
+    """
+    filepath = find_segment(directory, metadata)
+    if os.path.exists(filepath):
+        return read_segment(filepath)
+
+    datastream = DataStream(None, metadata['participant'], metadata['datasource'])
+    datastream.data = parser.read_file(find(directory, metadata), time_zone=time_zone)
+    return datastream
@@ -24,7 +24,7 @@
 import os
 import unittest
 
-from cerebralcortex.configuration import Configuration
+from cerebralcortex.configuration import Configuration, study_time_zone
 
 
 class TestConfiguration(unittest.TestCase):
@@ -54,6 +54,11 @@ class TestConfiguration(unittest.TestCase):
         self.assertEqual(mysql['user_table'], 'user')
         self.assertEqual(mysql['study_table'], 'study')
 
+    def test_study_time_zone(self):
+        self.assertEqual(study_time_zone(None).zone, 'US/Central')
+        self.assertEqual(study_time_zone({'mysql': {}}).zone, 'US/Central')
+        self.assertEqual(study_time_zone({'study': {'time_zone': 'Europe/Berlin'}}).zone, 'Europe/Berlin')
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -23,21 +23,23 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 import argparse
-import gzip
 import os
 import time
 import uuid
 from pprint import pprint
 
 from cerebralcortex.CerebralCortex import CerebralCortex
+from cerebralcortex.configuration import study_time_zone
 from cerebralcortex.data_processor.cStress import cStress
 from cerebralcortex.data_processor.preprocessor import parser
-from cerebralcortex.kernel.datatypes.datapoint import DataPoint
 from cerebralcortex.kernel.datatypes.datastream import DataStream
-from cerebralcortex.legacy import find
+from cerebralcortex.legacy import find, find_segment
 
 argparser = argparse.ArgumentParser(description="Cerebral Cortex Test Application")
 argparser.add_argument('--base_directory')
+argparser.add_argument('--chunk_duration', type=float, default=3600.0, help='seconds of data per processing chunk')
+argparser.add_argument('--chunk_overlap', type=float, default=0.0,
+                       help='seconds of data repeated from the previous chunk')
 args = argparser.parse_args()
 
 # To run this program, please specific a program argument for base_directory that is the path to the test data files.
@@ -47,57 +49,44 @@ basedir = args.base_directory
 configuration_file = os.path.join(os.path.dirname(__file__), 'cerebralcortex.yml')
 
 CC = CerebralCortex(configuration_file, master="local[*]", name="Memphis cStress Development App")
-
-
-def readfile(filename):
-    data = []
-    with gzip.open(filename, 'rt') as f:
-        count = 0
-        for l in f:
-            dp = parser.data_processor(l)
-            if isinstance(dp, DataPoint):
-                data.append(dp)
-                count += 1
-            if count > 5000:
-                break
-    return data
+time_zone = study_time_zone(CC.configuration)
 
 
 def loader(identifier: int):
+    """
+    Stream one participant's recordings as aligned fixed duration chunks so that full multi-day files can be
+    processed with bounded memory
+    """
     participant = "SI%02d" % identifier
 
     participant_uuid = uuid.uuid4()
 
-    try:
-        ecg = DataStream(None, participant_uuid)
-        ecg.data = readfile(find(basedir, {"participant": participant, "datasource": "ecg"}))
-
-        rip = DataStream(None, participant_uuid)
-        rip.data = readfile(find(basedir, {"participant": participant, "datasource": "rip"}))
-
-        accelx = DataStream(None, participant_uuid)
-        accelx.data = readfile(find(basedir, {"participant": participant, "datasource": "accelx"}))
+    filenames = {}
+    for datasource in ["ecg", "rip", "accelx", "accely", "accelz"]:
+        metadata = {"participant": participant, "datasource": datasource}
+        # Prefer segments produced by cerebralcortex.legacy.convert, they open without parsing
+        filenames[datasource] = find_segment(basedir, metadata)
+        if not os.path.isfile(filenames[datasource]):
+            filenames[datasource] = find(basedir, metadata)
 
-        accely = DataStream(None, participant_uuid)
-        accely.data = readfile(find(basedir, {"participant": participant, "datasource": "accely"}))
-
-        accelz = DataStream(None, participant_uuid)
-        accelz.data = readfile(find(basedir, {"participant": participant, "datasource": "accelz"}))
-
-        return {"participant": participant, "ecg": ecg, "rip": rip, "accelx": accelx, "accely": accely,
-                "accelz": accelz}
-    except Exception as e:
+    if not all(os.path.isfile(filename) for filename in filenames.values()):
         print("File missing for %s" % participant)
+        return
 
-        return {"ERROR": 'missing data file'}
-
-
+    # Chunks in which any sensor dropped out are skipped, every stream is needed for the cStress features
+    for chunk_start, chunk in parser.iter_chunks(filenames, duration=args.chunk_duration, overlap=args.chunk_overlap,
+                                                 time_zone=time_zone, required=filenames.keys()):
+        result = {"participant": participant, "chunk": chunk_start}
+        for datasource, data in chunk.items():
+            result[datasource] = DataStream(None, participant_uuid)
+            result[datasource].data = data
+        yield result
 
 
 start_time = time.time()
 ids = CC.sparkSession.sparkContext.parallelize([i for i in range(1, 25)])
 
-data = ids.map(lambda i: loader(i)).filter(lambda x: 'participant' in x)
+data = ids.flatMap(loader)
 
 cstress_feature_vector = cStress(data)
 